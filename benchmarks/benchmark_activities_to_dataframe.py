@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the columnar activities_to_dataframe against the old row-wise version
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from src.strava_data_fetcher import StravaDataFetcher
+
+def make_activities(count, seed=42):
+    """Synthetic /athlete/activities payloads"""
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    activities = []
+    for i in range(count):
+        distance = rng.choice([0.0, rng.uniform(1000, 150000)])
+        activities.append({
+            'id': 10_000_000 + i,
+            'name': f"Activity {i}",
+            'type': rng.choice(['Ride', 'Run', 'Walk', 'Hike']),
+            'sport_type': 'Ride',
+            'start_date': (start + timedelta(hours=7 * i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'distance': distance,
+            'moving_time': rng.randint(0, 20000),
+            'elapsed_time': rng.randint(600, 25000),
+            'total_elevation_gain': rng.uniform(0, 2000),
+            'kudos_count': rng.randint(0, 60),
+            'comment_count': rng.randint(0, 5),
+            'athlete_count': rng.randint(1, 10),
+            'photo_count': 0,
+            'total_photo_count': rng.randint(0, 4),
+            'average_speed': rng.uniform(1, 12),
+            'max_speed': rng.uniform(5, 20),
+            'average_heartrate': rng.uniform(100, 170),
+            'max_heartrate': rng.uniform(150, 200),
+            'pr_count': rng.randint(0, 3),
+            'achievement_count': rng.randint(0, 10),
+            'visibility': 'everyone',
+            'commute': False,
+            'manual': False,
+            'private': False,
+            'flagged': False,
+        })
+    return activities
+
+def legacy_activities_to_dataframe(activities):
+    """The previous row-by-row implementation, kept here for comparison"""
+    if not activities:
+        return pd.DataFrame()
+
+    activity_data = []
+
+    for activity in activities:
+        data = {
+            'id': activity.get('id'),
+            'name': activity.get('name'),
+            'type': activity.get('type'),
+            'sport_type': activity.get('sport_type'),
+            'start_date': activity.get('start_date'),
+            'distance': activity.get('distance'),
+            'moving_time': activity.get('moving_time'),
+            'elapsed_time': activity.get('elapsed_time'),
+            'total_elevation_gain': activity.get('total_elevation_gain'),
+            'kudos_count': activity.get('kudos_count', 0),
+            'comment_count': activity.get('comment_count', 0),
+            'athlete_count': activity.get('athlete_count', 0),
+            'photo_count': activity.get('photo_count', 0),
+            'total_photo_count': activity.get('total_photo_count', 0),
+            'has_photos': activity.get('total_photo_count', 0) > 0,
+            'average_speed': activity.get('average_speed'),
+            'max_speed': activity.get('max_speed'),
+            'average_heartrate': activity.get('average_heartrate'),
+            'max_heartrate': activity.get('max_heartrate'),
+            'pr_count': activity.get('pr_count', 0),
+            'achievement_count': activity.get('achievement_count', 0),
+            'visibility': activity.get('visibility'),
+            'commute': activity.get('commute', False),
+            'manual': activity.get('manual', False),
+            'private': activity.get('private', False),
+            'flagged': activity.get('flagged', False)
+        }
+
+        if data['start_date']:
+            data['start_date_parsed'] = pd.to_datetime(data['start_date'])
+            data['day_of_week'] = data['start_date_parsed'].dayofweek
+            data['hour_of_day'] = data['start_date_parsed'].hour
+
+        activity_data.append(data)
+
+    df = pd.DataFrame(activity_data)
+
+    if not df.empty:
+        df['distance_km'] = df['distance'] / 1000
+        df['moving_time_hours'] = df['moving_time'] / 3600
+        df['pace_min_per_km'] = df['moving_time'] / 60 / df['distance_km']
+        df['speed_kmh'] = df['distance_km'] / df['moving_time_hours']
+
+    return df
+
+def best_of(func, activities, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(activities)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark activities_to_dataframe")
+    parser.add_argument("--activities", type=int, default=10000, help="Number of synthetic activities")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per implementation (best is reported)")
+    args = parser.parse_args()
+
+    activities = make_activities(args.activities)
+    # The conversion doesn't touch the API, so skip StravaDataFetcher.__init__ and its credentials
+    fetcher = StravaDataFetcher.__new__(StravaDataFetcher)
+
+    legacy = legacy_activities_to_dataframe(activities)
+    columnar = fetcher.activities_to_dataframe(activities)
+    assert list(legacy.columns) == list(columnar.columns), "Column layout changed"
+    assert (legacy['day_of_week'] == columnar['day_of_week']).all(), "day_of_week mismatch"
+
+    legacy_time = best_of(legacy_activities_to_dataframe, activities, args.repeats)
+    columnar_time = best_of(fetcher.activities_to_dataframe, activities, args.repeats)
+
+    print(f"Converting {args.activities} activities (best of {args.repeats}):")
+    print(f"  row-wise (legacy): {legacy_time * 1000:8.1f} ms")
+    print(f"  columnar:          {columnar_time * 1000:8.1f} ms")
+    print(f"Speedup: {legacy_time / columnar_time:.1f}x")
+
+    legacy_inf = int(legacy['pace_min_per_km'].isin([float('inf')]).sum())
+    columnar_inf = int(columnar['pace_min_per_km'].isin([float('inf')]).sum())
+    print(f"Infinite paces from zero distance: legacy {legacy_inf}, columnar {columnar_inf}")
+
+if __name__ == "__main__":
+    main()
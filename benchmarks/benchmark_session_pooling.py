@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request latency of one-off requests vs a pooled keep-alive session
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from src.http_session import create_session
+
+class KudosStandInHandler(BaseHTTPRequestHandler):
+    """Serves a tiny kudos payload like /activities/{id}/kudos"""
+    protocol_version = "HTTP/1.1"  # Needed for keep-alive
+    disable_nagle_algorithm = True  # Avoid delayed-ACK stalls on reused connections
+    handshake_delay = 0.0  # Seconds added once per connection to mimic TLS setup
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.handshake_delay)
+
+    def do_GET(self):
+        body = json.dumps([{"firstname": "Jane", "lastname": "D."}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def time_requests(get, url, count):
+    """Return the mean latency in milliseconds of ``count`` GETs"""
+    start = time.perf_counter()
+    for i in range(count):
+        response = get(f"{url}/activities/{i}/kudos")
+        response.raise_for_status()
+    return (time.perf_counter() - start) / count * 1000
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare requests.get with a pooled session")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per variant")
+    parser.add_argument("--handshake-ms", type=float, default=0.0,
+                        help="Simulated per-connection handshake cost (a TLS handshake to Strava is tens of ms)")
+    args = parser.parse_args()
+
+    KudosStandInHandler.handshake_delay = args.handshake_ms / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KudosStandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        print(f"Benchmarking {args.requests} requests against {url} "
+              f"(simulated handshake: {args.handshake_ms:.0f} ms)")
+
+        fresh_ms = time_requests(requests.get, url, args.requests)
+        print(f"  requests.get (new connection each call): {fresh_ms:.3f} ms/request")
+
+        session = create_session()
+        pooled_ms = time_requests(session.get, url, args.requests)
+        print(f"  pooled session (keep-alive):             {pooled_ms:.3f} ms/request")
+
+        print(f"Speedup: {fresh_ms / pooled_ms:.1f}x")
+        if not args.handshake_ms:
+            print("Note: plain HTTP on loopback has almost no handshake cost; rerun with")
+            print("--handshake-ms 30 to approximate TLS setup against api.strava.com.")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
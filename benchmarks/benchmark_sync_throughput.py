@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark a full activity + kudos sync against the local Strava stand-in
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from src.strava_stand_in import StravaStandIn, SyntheticStrava, Faults
+from src.strava_auth import StravaAuth
+from src.strava_data_fetcher import StravaDataFetcher, RateLimiter
+from src.http_session import create_session
+from src.token_manager import TokenManager, TokenStore
+from src.collect_strava_data import StravaDataCollector, run_collection
+
+class SimulatedClock:
+    """Wall clock that jumps forward instead of sleeping through rate-limit waits"""
+
+    def __init__(self):
+        self.offset = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def time(self):
+        return time.time() + self.offset
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.offset += seconds
+            self.waited += seconds
+
+def run_sync(args, concurrency):
+    """Sync ``args.activities`` activities into a fresh data directory; returns the measurements"""
+    clock = SimulatedClock()
+    rates = {status: rate for status, rate in ((401, args.fault_401), (403, args.fault_403),
+                                               (429, args.fault_429)) if rate}
+    faults = Faults(rates, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+    source = SyntheticStrava(activity_count=args.activities, seed=args.seed)
+
+    with StravaStandIn(source, faults, short_limit=args.short_limit, daily_limit=args.daily_limit,
+                       clock=clock.time) as stand_in:
+        session = create_session(pool_size=max(concurrency, 1))
+        auth = StravaAuth(session=session, client_id=stand_in.client_id, client_secret=stand_in.client_secret,
+                          access_token=stand_in.access_token, refresh_token=stand_in.refresh_token,
+                          oauth_url=stand_in.oauth_url)
+        data_dir = tempfile.mkdtemp(prefix="sync_benchmark_")
+        token_manager = TokenManager(auth, store=TokenStore(os.path.join(data_dir, "tokens.json")), clock=clock.time)
+        limiter = RateLimiter(short_limit=args.short_limit, daily_limit=args.daily_limit,
+                              clock=clock.time, sleep=clock.sleep)
+        fetcher = StravaDataFetcher(rate_limiter=limiter, session=session, auth=auth,
+                                    token_manager=token_manager, base_url=stand_in.base_url)
+        collector = StravaDataCollector(data_dir=data_dir, fetcher=fetcher)
+
+        log = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            run_collection(collector, details=args.details, concurrency=concurrency, kudos_batch_size=0)
+        elapsed = time.perf_counter() - start
+
+        return {
+            "elapsed": elapsed,
+            "requests": stand_in.requests_served,
+            "status_counts": dict(stand_in.status_counts),
+            "injected": dict(faults.injected),
+            "activities": len(collector.load_existing_activity_ids()),
+            "kudos": len(collector.load_existing_kudos()),
+            "simulated_wait": clock.waited,
+        }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time a 1,000-activity sync against the Strava stand-in")
+    parser.add_argument("--activities", type=int, default=1000, help="Synthetic activities to sync")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Worker counts to compare")
+    parser.add_argument("--details", action="store_true", help="Also fetch /activities/{id} details")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Server latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Random extra latency per request")
+    parser.add_argument("--short-limit", type=int, default=10000, help="Stand-in 15-minute limit")
+    parser.add_argument("--daily-limit", type=int, default=100000, help="Stand-in daily limit")
+    parser.add_argument("--fault-401", type=float, default=0.0, help="Probability of an injected 401 (token revoked)")
+    parser.add_argument("--fault-403", type=float, default=0.0, help="Probability of an injected 403")
+    parser.add_argument("--fault-429", type=float, default=0.0, help="Probability of an injected 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for data, latency and faults")
+    parser.add_argument("--verbose", action="store_true", help="Show the collector's output")
+    args = parser.parse_args()
+
+    print(f"Syncing {args.activities} activities (latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"limits {args.short_limit}/15min {args.daily_limit}/day)")
+    for concurrency in args.concurrency:
+        result = run_sync(args, concurrency)
+        rate = result["requests"] / result["elapsed"]
+        print(f"concurrency {concurrency:>2}: {result['elapsed']:7.2f}s, {result['requests']} requests, "
+              f"{rate:7.1f} req/s, {result['activities']} activities, {result['kudos']} kudos")
+        if result["injected"] or result["simulated_wait"]:
+            print(f"               injected faults {result['injected']}, "
+                  f"simulated rate-limit wait {result['simulated_wait']:.0f}s, statuses {result['status_counts']}")
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,13 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.strava_data_fetcher import StravaDataFetcher
+from src.response_cache import ResponseCache
 
 def debug_kudos():
     print("=== DEBUGGING KUDOS FETCH ===")
     
-    fetcher = StravaDataFetcher()
+    # Reruns are served from the on-disk cache instead of spending quota
+    fetcher = StravaDataFetcher(cache=ResponseCache(os.path.join("data", "api_cache")))
     
     # Get recent activities
     print("1. Fetching recent activities...")
@@ -7,25 +7,44 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.storage import open_store
+from src.schema import ANALYSIS_COLUMNS
+from src.snapshot import open_snapshot
 
 class CachedKudosAnalyzer:
     def __init__(self, data_dir="data"):
         self.data_dir = data_dir
-        self.activities_file = os.path.join(data_dir, "activities.csv")
-        self.kudos_file = os.path.join(data_dir, "kudos.csv")
+        # Same format the collector wrote (CSV or Parquet)
+        self.store = open_store(data_dir)
+        self.activities_file = self.store.activities_path
+        self.kudos_file = self.store.kudos_path
         self.df = None
         self.kudos_df = None
+        self.givers_df = None
     
     def load_data(self):
         """Load cached activity and kudos data"""
-        if not os.path.exists(self.activities_file):
+        if not self.store.has_activities():
             raise FileNotFoundError(f"Activities file not found: {self.activities_file}")
         
-        print("Loading cached data...")
-        self.df = pd.read_csv(self.activities_file)
-        
-        if os.path.exists(self.kudos_file):
-            self.kudos_df = pd.read_csv(self.kudos_file)
+        # The collector's memory-mapped snapshot, unless the datasets changed since it was published
+        snapshot = open_snapshot(self.store)
+        if snapshot is not None:
+            print(f"Loading snapshot published {snapshot.published_at}...")
+            self.df = snapshot.to_pandas("activities", ANALYSIS_COLUMNS)
+            kudos_df = snapshot.to_pandas("kudos")
+            self.givers_df = snapshot.to_pandas("givers")
+        else:
+            print("Loading cached data...")
+            # Typed read of just the columns the reports use: categoricals, small ints, parsed timestamps
+            self.df = self.store.load_activities(columns=ANALYSIS_COLUMNS)
+            kudos_df = self.store.load_kudos()
+            self.givers_df = self.store.load_givers()
+        
+        if not kudos_df.empty:
+            self.kudos_df = kudos_df
             print(f"Loaded {len(self.df)} activities and {len(self.kudos_df)} kudos records")
         else:
             print(f"Loaded {len(self.df)} activities (no kudos data available)")
@@ -179,8 +198,14 @@ class CachedKudosAnalyzer:
         
         print("\n=== TOP KUDOS GIVERS ANALYSIS ===")
         
-        # Count kudos per athlete
-        kudos_counts = self.kudos_df.groupby(['athlete_id', 'athlete_fullname']).size().reset_index(name='kudos_given')
+        # Count kudos per giver on the integer codes, then look up the names of those counted
+        if 'giver_code' in self.kudos_df.columns:
+            kudos_counts = self.kudos_df['giver_code'].value_counts().rename_axis('giver_code').reset_index(name='kudos_given')
+            givers = self.givers_df[['giver_code', 'fullname']].rename(columns={'fullname': 'athlete_fullname'})
+            kudos_counts = kudos_counts.merge(givers, on='giver_code', how='left')
+        else:
+            # Kudos collected before the givers table still carry the names
+            kudos_counts = self.kudos_df.groupby(['athlete_id', 'athlete_fullname']).size().reset_index(name='kudos_given')
         kudos_counts = kudos_counts.sort_values('kudos_given', ascending=False)
         
         print(f"Total unique kudos givers: {len(kudos_counts)}")
@@ -11,10 +11,13 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.strava_data_fetcher import StravaDataFetcher
+from src.response_cache import ResponseCache
 
 class KudosAnalyzer:
-    def __init__(self):
-        self.fetcher = StravaDataFetcher()
+    def __init__(self, cache_dir=os.path.join("data", "api_cache")):
+        # Re-running the analysis reuses cached API responses (pass cache_dir=None to disable)
+        cache = ResponseCache(cache_dir) if cache_dir else None
+        self.fetcher = StravaDataFetcher(cache=cache)
         self.df = None
         self.kudos_df = None
     
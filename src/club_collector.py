@@ -0,0 +1,236 @@
+"""
+Club Collector - Collect several athletes in parallel under one application quota
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.strava_auth import StravaAuth
+from src.strava_data_fetcher import StravaDataFetcher, RateBudgetExhausted
+from src.http_session import create_session
+from src.token_manager import TokenManager, TokenStore
+from src.collect_strava_data import StravaDataCollector, run_collection
+from src.shared_rate_limiter import SharedRateLimiter
+from src.process_lock import CollectorLock
+
+DEFAULT_REGISTRY_FILE = "athletes.json"
+DEFAULT_CLUB_DATA_DIR = os.path.join("data", "athletes")
+DEFAULT_WORKERS = 4
+
+class Athlete:
+    """One registry entry: credentials, data directory and optional daily budget"""
+
+    def __init__(self, name, refresh_token, access_token=None, data_dir=None, daily_budget=None):
+        self.name = name
+        self.refresh_token = refresh_token
+        self.access_token = access_token
+        self.data_dir = data_dir or os.path.join(DEFAULT_CLUB_DATA_DIR, name)
+        self.daily_budget = daily_budget
+
+    @property
+    def token_file(self):
+        # Refreshed tokens live next to the athlete's data, not in the registry
+        return os.path.join(self.data_dir, "tokens.json")
+
+class AthleteRegistry:
+    """Athletes to collect, read from a JSON file
+
+    The file holds ``{"athletes": [{"name": ..., "refresh_token": ...,
+    "access_token": ..., "data_dir": ..., "daily_budget": ...}]}``. Only
+    ``name`` and ``refresh_token`` are required; the application's client ID
+    and secret come from .env as usual.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_FILE):
+        self.path = path
+        self.athletes = self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r') as f:
+            entries = json.load(f).get("athletes", [])
+
+        athletes = []
+        for entry in entries:
+            if not entry.get("name") or not entry.get("refresh_token"):
+                raise ValueError(f"Registry entry needs a name and refresh_token: {entry.get('name')!r}")
+            athletes.append(Athlete(entry["name"], entry["refresh_token"],
+                                    access_token=entry.get("access_token"),
+                                    data_dir=entry.get("data_dir"),
+                                    daily_budget=entry.get("daily_budget")))
+
+        names = [athlete.name for athlete in athletes]
+        if len(set(names)) != len(names):
+            raise ValueError("Athlete names in the registry must be unique")
+        return athletes
+
+class AthleteRateBudget:
+    """One athlete's slice of the application-wide RateLimiter
+
+    Requests are paced and counted by the shared limiter; this wrapper also
+    counts the athlete's own requests and reports the smaller of the two
+    remainders, so the quota planner sizes each athlete's run to its share.
+    The share is a hard cap: once it is spent ``acquire()`` raises
+    RateBudgetExhausted rather than letting one athlete eat the others' quota.
+    """
+
+    def __init__(self, shared, daily_budget):
+        self.shared = shared
+        self.daily_budget = daily_budget
+        self.used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def short(self):
+        return self.shared.short
+
+    @property
+    def daily(self):
+        return self.shared.daily
+
+    def acquire(self):
+        with self._lock:
+            if self.used >= self.daily_budget:
+                raise RateBudgetExhausted(f"Daily budget of {self.daily_budget} requests spent")
+            self.used += 1
+        self.shared.acquire()
+
+    def update_from_headers(self, headers):
+        self.shared.update_from_headers(headers)
+
+    def record_rate_limited(self, headers):
+        self.shared.record_rate_limited(headers)
+
+    def snapshot(self):
+        return self.shared.snapshot()
+
+    def restore(self, snapshot):
+        # Application usage is the same whichever athlete saved it
+        self.shared.restore(snapshot)
+
+    def remaining(self):
+        remaining = self.shared.remaining()
+        with self._lock:
+            own = max(self.daily_budget - self.used, 0)
+        return {"short": remaining["short"], "daily": min(remaining["daily"], own)}
+
+class ClubCollector:
+    """Collect every registered athlete with a pool of workers
+
+    All athletes share one rate limiter because Strava's limits apply to the
+    application, not the athlete. Athletes without an explicit
+    ``daily_budget`` split whatever daily quota is left evenly.
+    """
+
+    def __init__(self, registry, rate_limiter=None, workers=DEFAULT_WORKERS):
+        self.registry = registry
+        # Shared with single-athlete runs and other club runs on this host
+        self.rate_limiter = rate_limiter or SharedRateLimiter()
+        self.workers = workers
+
+    def budgets(self):
+        """Daily request budget per athlete name for this run"""
+        athletes = self.registry.athletes
+        fixed = {a.name: a.daily_budget for a in athletes if a.daily_budget is not None}
+        flexible = [a.name for a in athletes if a.daily_budget is None]
+
+        available = max(self.rate_limiter.remaining()["daily"] - sum(fixed.values()), 0)
+        share = available // len(flexible) if flexible else 0
+        return {**fixed, **{name: share for name in flexible}}
+
+    def build_collector(self, athlete, daily_budget):
+        """A StravaDataCollector wired to the athlete's tokens and the shared limiter"""
+        session = create_session()
+        auth = StravaAuth(session=session, access_token=athlete.access_token, refresh_token=athlete.refresh_token)
+        # Never fall back to the .env athlete's access token
+        auth.access_token = athlete.access_token
+        os.makedirs(athlete.data_dir, exist_ok=True)
+        token_manager = TokenManager(auth, store=TokenStore(athlete.token_file))
+        if not auth.access_token:
+            # Registry only holds a refresh token - get an access token up front
+            token_manager.refresh()
+        fetcher = StravaDataFetcher(rate_limiter=AthleteRateBudget(self.rate_limiter, daily_budget),
+                                    session=session, auth=auth, token_manager=token_manager)
+        return StravaDataCollector(data_dir=athlete.data_dir, fetcher=fetcher)
+
+    def collect_athlete(self, athlete, daily_budget, **options):
+        print(f"[{athlete.name}] collecting with a budget of {daily_budget} requests")
+        with CollectorLock(athlete.data_dir):
+            collector = self.build_collector(athlete, daily_budget)
+            try:
+                run_collection(collector, **options)
+            except RateBudgetExhausted as e:
+                # Keep what was fetched; the rest waits for tomorrow's share
+                print(f"[{athlete.name}] {e}, stopping")
+                collector.replay_kudos_journal()
+                collector.save_metadata()
+        return collector.fetcher.rate_limiter.used
+
+    def collect(self, **options):
+        """Collect all athletes in parallel; returns {name: requests made or error}
+
+        ``options`` are passed to run_collection for every athlete.
+        """
+        budgets = self.budgets()
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.collect_athlete, athlete, budgets[athlete.name], **options): athlete
+                for athlete in self.registry.athletes
+                if budgets[athlete.name] > 0
+            }
+            try:
+                for future in as_completed(futures):
+                    athlete = futures[future]
+                    try:
+                        results[athlete.name] = future.result()
+                    except Exception as e:
+                        # One athlete's revoked token shouldn't stop the club
+                        print(f"[{athlete.name}] collection failed: {e}")
+                        results[athlete.name] = e
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        skipped = [a.name for a in self.registry.athletes if budgets[a.name] <= 0]
+        if skipped:
+            print(f"No quota left today for: {', '.join(skipped)}")
+        return results
+
+def main():
+    """Collect every athlete in the registry"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Collect Strava data for every athlete in a registry")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_FILE, help="Athlete registry JSON file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Athletes collected in parallel")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel requests per athlete for kudos and details")
+    parser.add_argument("--activities-only", action="store_true", help="Only fetch activities, skip kudos")
+    parser.add_argument("--kudos-only", action="store_true", help="Only fetch kudos for existing activities")
+    parser.add_argument("--details", action="store_true", help="Enrich activities missing detailed data")
+    parser.add_argument("--plan", action="store_true", help="Show each athlete's quota plan, then exit")
+
+    args = parser.parse_args()
+
+    registry = AthleteRegistry(args.registry)
+    if not registry.athletes:
+        print(f"No athletes registered in {args.registry}")
+        return
+
+    club = ClubCollector(registry, workers=args.workers)
+    results = club.collect(activities=not args.kudos_only,
+                           kudos=not args.activities_only,
+                           details=args.details,
+                           concurrency=args.concurrency,
+                           plan_only=args.plan)
+
+    print("=== CLUB SUMMARY ===")
+    for name, result in sorted(results.items()):
+        outcome = f"failed ({result})" if isinstance(result, Exception) else f"{result} requests"
+        print(f"{name}: {outcome}")
+
+if __name__ == "__main__":
+    main()
@@ -4,24 +4,69 @@ Strava Data Collector - Incrementally collect and store activity data
 import pandas as pd
 import json
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.strava_data_fetcher import StravaDataFetcher
+from src.strava_data_fetcher import StravaDataFetcher, RateBudgetExhausted
+from src.kudos_scheduler import KudosRefreshScheduler
+from src.quota_planner import QuotaPlanner
+from src.schema import KUDOS_SCHEDULER_COLUMNS, apply_activity_schema
+from src.snapshot import publish_snapshot, snapshot_dir
+from src.collection_summary import CollectionSummary
+from src.process_lock import CollectorLock, CollectorLockedError
+from src.storage import (STORAGE_BACKENDS, METADATA_FILE_NAME, CachedStore, CsvStore, open_store, migrate_store,
+                         encode_kudos, upgrade_kudos_givers)
+
+# Re-list this much history on incremental syncs to catch late uploads and edits
+INCREMENTAL_OVERLAP_HOURS = 48
+# Activities whose kudos a run fetches unless told otherwise; 0 means as many as the quota allows
+DEFAULT_KUDOS_BATCH_SIZE = 20
+# Appended rows that repeat a stored activity (refreshes, details) are merged on
+# read; past this many the activities dataset is compacted during a run
+AUTO_COMPACT_DUPLICATE_ROWS = 2000
+
+KUDOS_COLUMNS = ['activity_id', 'athlete_firstname', 'athlete_lastname', 'athlete_fullname']
 
 class StravaDataCollector:
-    def __init__(self, data_dir="data"):
-        self.fetcher = StravaDataFetcher()
+    def __init__(self, data_dir="data", fetcher=None, storage=None):
+        # The default fetcher draws from the host-wide SharedRateLimiter budget
+        self.fetcher = fetcher or StravaDataFetcher()
         self.data_dir = data_dir
-        self.activities_file = os.path.join(data_dir, "activities.csv")
-        self.kudos_file = os.path.join(data_dir, "kudos.csv")
-        self.metadata_file = os.path.join(data_dir, "collection_metadata.json")
+        self.metadata_file = os.path.join(data_dir, METADATA_FILE_NAME)
+        # Write-ahead journal of kudos fetched but not yet merged into kudos.csv
+        self.kudos_journal_file = os.path.join(data_dir, "kudos_journal.jsonl")
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
         # Load existing metadata
         self.metadata = self.load_metadata()
+        # Older runs kept every activity ID with kudos here; the summary counts them now
+        self.metadata.pop("activities_with_kudos", None)
+        
+        # CSV unless this directory was collected (or migrated) into another format
+        configured = self.metadata.get("storage") or (CsvStore.name if CsvStore(data_dir).has_activities() else None)
+        if storage and configured and storage != configured:
+            raise ValueError(f"{data_dir} is stored as {configured}; use --migrate-storage {storage} to convert it")
+        # Loaded datasets stay in memory for the run, invalidated by file fingerprint
+        self.store = CachedStore(open_store(data_dir, storage or configured))
+        self.metadata["storage"] = self.store.name
+        self.activities_file = self.store.activities_path
+        self.kudos_file = self.store.kudos_path
+        
+        # Counts for --status, updated on every write; a new directory starts from an empty summary
+        state = self.metadata.get("summary")
+        if not state and not self.store.has_activities():
+            state = CollectionSummary.empty_state()
+            state["fingerprint"] = self.store.fingerprint()
+        self.metadata["summary"] = state or {}
+        self.summary = CollectionSummary(self.metadata["summary"])
+        # Only a summary that still matches the files can be updated incrementally
+        self.summary_current = bool(state) and self.summary.is_current(self.store.fingerprint())
+        
+        # Carry rate-limit usage over from earlier runs in the same windows
+        if self.metadata.get("rate_limit"):
+            self.fetcher.rate_limiter.restore(self.metadata["rate_limit"])
     
     def load_metadata(self):
         """Load collection metadata or create default"""
@@ -32,7 +77,6 @@ class StravaDataCollector:
             return {
                 "last_activity_fetch": None,
                 "last_activity_id": None,
-                "activities_with_kudos": [],
                 "kudos_fetch_completed": False,
                 "total_activities": 0,
                 "last_updated": None
@@ -41,162 +85,575 @@ class StravaDataCollector:
     def save_metadata(self):
         """Save collection metadata"""
         self.metadata["last_updated"] = datetime.now(timezone.utc).isoformat()
+        self.metadata["rate_limit"] = self.fetcher.rate_limiter.snapshot()
+        if self.summary_current:
+            # Ties the summary to the dataset files it describes
+            self.summary.state["fingerprint"] = self.store.fingerprint()
         with open(self.metadata_file, 'w') as f:
             json.dump(self.metadata, f, indent=2)
     
-    def load_existing_activities(self):
-        """Load existing activities CSV if it exists"""
-        if os.path.exists(self.activities_file):
-            df = pd.read_csv(self.activities_file)
-            # Ensure start_date_parsed is datetime type
-            if 'start_date_parsed' in df.columns:
-                df['start_date_parsed'] = pd.to_datetime(df['start_date_parsed'])
-            return df
-        else:
-            return pd.DataFrame()
+    def load_existing_activities(self, columns=None):
+        """Load existing activities (or just ``columns``), typed, with refreshed rows merged in"""
+        return self.store.load_activities(columns)
+    
+    def load_existing_activity_ids(self):
+        """Load just the stored activity IDs without parsing the whole dataset"""
+        return self.store.load_activity_ids()
+    
+    def _append_activities(self, df):
+        """Append activity rows without rewriting what is already stored"""
+        is_new = ~df['id'].isin(self.store.known_activity_ids(df['id']))
+        self.store.append_activities(df)
+        if self.summary_current:
+            self.summary.add_activities(df[is_new])
+    
+    def compact_activities(self):
+        """Fold appended rows into the stored dataset, newest first"""
+        merged = self.store.compact_activities()
+        self.metadata["duplicate_activity_rows"] = 0
+        return merged
+    
+    def _count_duplicate_rows(self, count):
+        """Note ``count`` appended rows that repeat stored activities, compacting once too many pile up"""
+        pending = self.metadata.get("duplicate_activity_rows", 0) + count
+        self.metadata["duplicate_activity_rows"] = pending
+        if pending >= AUTO_COMPACT_DUPLICATE_ROWS:
+            print(f"{pending} activity rows appended since the last compaction - compacting")
+            self.compact_activities()
     
     def load_existing_kudos(self):
-        """Load existing kudos CSV if it exists"""
-        if os.path.exists(self.kudos_file):
-            return pd.read_csv(self.kudos_file)
-        else:
-            return pd.DataFrame()
+        """Load existing kudos, or an empty DataFrame"""
+        return self.store.load_kudos()
+    
+    def kudos_scheduler(self, activities_df, kudos_df=None):
+        """KudosRefreshScheduler over the stored data
+        
+        Stores that can answer "which activities need kudos" themselves
+        (SQLite) do so; otherwise the stored kudos are loaded and compared.
+        """
+        stale = self.store.stale_kudos_activities()
+        fetch_log = None
+        if stale is None:
+            if kudos_df is None:
+                kudos_df = self.load_existing_kudos()
+            # A log still in the metadata predates kudos_fetches and moves to the store on the next replay
+            fetch_log = self.metadata.get("kudos_fetch_log") or self.store.load_kudos_fetches()
+        return KudosRefreshScheduler(activities_df, kudos_df, fetch_log, stale=stale)
     
-    def fetch_new_activities(self, max_new_activities=None):
-        """Fetch activities that haven't been collected yet"""
+    def migrate_storage(self, backend):
+        """One-shot copy of the datasets into another storage backend"""
+        target = open_store(self.data_dir, backend)
+        if target.name == self.store.name:
+            print(f"Data is already stored as {backend}")
+            return
+        
+        # Journaled kudos are merged first so nothing is left behind in the old format
+        self.replay_kudos_journal()
+        activities, kudos = migrate_store(self.store, target)
+        self.store = CachedStore(target)
+        self.activities_file = target.activities_path
+        self.kudos_file = target.kudos_path
+        self.metadata["storage"] = target.name
+        self.save_metadata()
+        print(f"Migrated {activities} activities and {kudos} kudos records to {backend} storage")
+        self.publish_snapshot()
+    
+    def get_incremental_cursor(self, overlap_hours=INCREMENTAL_OVERLAP_HOURS):
+        """Return the epoch timestamp to sync from, or None for a full sync
+        
+        Starts ``overlap_hours`` before the newest stored activity so that
+        late uploads and edits to recent activities are picked up again.
+        """
+        last_fetch = self.metadata.get("last_activity_fetch")
+        if not last_fetch:
+            return None
+        
+        last_start = datetime.fromisoformat(str(last_fetch).replace('Z', '+00:00'))
+        if last_start.tzinfo is None:
+            last_start = last_start.replace(tzinfo=timezone.utc)
+        
+        return int((last_start - timedelta(hours=overlap_hours)).timestamp())
+    
+    def fetch_new_activities(self, max_new_activities=None, incremental=True):
+        """Fetch activities that haven't been collected yet
+        
+        Pages are converted and appended to the dataset as they arrive, so
+        memory is bounded by the page size and a crash keeps every page
+        already fetched. In incremental mode only activities newer than the
+        stored ``last_activity_fetch`` (minus an overlap window) are requested.
+        Re-listed activities are appended too and override their stored rows
+        on read; the dataset is only rewritten by ``--compact`` or once
+        AUTO_COMPACT_DUPLICATE_ROWS such rows have piled up.
+        
+        Returns the number of new activities stored.
+        """
         print("=== FETCHING ACTIVITIES ===")
         
-        existing_df = self.load_existing_activities()
-        existing_ids = set(existing_df['id'].tolist()) if not existing_df.empty else set()
+        total = self.store.count_activities()
+        print(f"Found {total} existing activities")
         
-        print(f"Found {len(existing_ids)} existing activities")
+        after = self.get_incremental_cursor() if incremental and total else None
         
-        # Fetch all activities from API
-        all_activities = self.fetcher.fetch_all_activities(max_activities=max_new_activities)
+        new_count = 0
+        refreshed_count = 0
+        latest = None
         
-        # Filter to new activities only
-        new_activities = [a for a in all_activities if a['id'] not in existing_ids]
+        # Fetch activities from API (only the recent window when incremental)
+        for page in self.fetcher.iter_activity_pages(max_activities=max_new_activities, after=after):
+            page_df = self.fetcher.activities_to_dataframe(page)
+            is_new = ~page_df['id'].isin(self.store.known_activity_ids(page_df['id']))
+            
+            if after is None:
+                # Full listing: only store activities we don't have yet
+                page_df = page_df[is_new]
+            else:
+                # Activities inside the overlap window are refreshed with the latest listing
+                refreshed_count += int((~is_new).sum())
+            new_count += int(is_new.sum())
+            
+            if page_df.empty:
+                continue
+            
+            self._append_activities(page_df)
+            
+            page_latest = page_df.loc[page_df['start_date_parsed'].idxmax()]
+            if latest is None or page_latest['start_date_parsed'] > latest['start_date_parsed']:
+                latest = page_latest
         
-        if not new_activities:
+        if new_count == 0 and refreshed_count == 0:
             print("No new activities found")
-            return existing_df
+            return 0
+        
+        print(f"Found {new_count} new activities")
+        if refreshed_count:
+            print(f"Refreshed {refreshed_count} recently listed activities")
+            self._count_duplicate_rows(refreshed_count)
         
-        print(f"Found {len(new_activities)} new activities")
+        # Update metadata
+        if latest is not None and self._is_newer_than_last_fetch(latest['start_date']):
+            self.metadata["last_activity_id"] = int(latest['id'])
+            self.metadata["last_activity_fetch"] = latest['start_date']
+        total += new_count
+        self.metadata["total_activities"] = total
+        
+        self.save_metadata()
         
-        # Convert new activities to DataFrame
-        new_df = self.fetcher.activities_to_dataframe(new_activities)
+        print(f"Activities saved to {self.activities_file}")
+        print(f"Total activities in dataset: {total}")
         
-        # Combine with existing data
-        if existing_df.empty:
-            combined_df = new_df
+        return new_count
+    
+    def backfill_history(self, max_pages=None):
+        """List the full activity history across as many runs as it takes
+        
+        Pages are walked newest to oldest with a ``before`` cursor that is
+        saved in collection_metadata.json after every page is stored, so an
+        interrupted backfill resumes exactly where it stopped - in another
+        process or on another day. The cursor overlaps the stored pages by a
+        second, and re-listed activities are dropped by ID. Once the history
+        is exhausted this falls back to an incremental sync.
+        
+        Returns the number of new activities stored.
+        """
+        state = self.metadata.setdefault("backfill", {"before": None, "completed": False, "pages_fetched": 0})
+        if state.get("completed"):
+            print("Backfill already complete - running an incremental sync instead")
+            return self.fetch_new_activities()
+        
+        print("=== BACKFILLING ACTIVITY HISTORY ===")
+        if state.get("before"):
+            resume_from = datetime.fromtimestamp(state["before"], timezone.utc).isoformat()
+            print(f"Resuming backfill before {resume_from} ({state['pages_fetched']} pages fetched so far)")
+        
+        total = self.store.count_activities()
+        new_count = 0
+        pages = 0
+        exhausted = True
+        
+        for page in self.fetcher.iter_activity_pages(before=state.get("before")):
+            page_df = self.fetcher.activities_to_dataframe(page).drop_duplicates(subset='id')
+            new_df = page_df[~page_df['id'].isin(self.store.known_activity_ids(page_df['id']))]
+            
+            if not new_df.empty:
+                self._append_activities(new_df)
+                new_count += len(new_df)
+                total += len(new_df)
+            
+            # The page is stored - move the cursor past it and persist. ``before`` is exclusive,
+            # so stop a second after the oldest start: activities sharing that second that did
+            # not fit on this page are listed again on resume instead of skipped
+            oldest = page_df['start_date_parsed'].min()
+            state["before"] = int(oldest.timestamp()) + 1
+            state["pages_fetched"] += 1
+            pages += 1
+            
+            newest = page_df.loc[page_df['start_date_parsed'].idxmax()]
+            if self._is_newer_than_last_fetch(newest['start_date']):
+                self.metadata["last_activity_id"] = int(newest['id'])
+                self.metadata["last_activity_fetch"] = newest['start_date']
+            self.metadata["total_activities"] = total
+            self.save_metadata()
+            
+            if max_pages is not None and pages >= max_pages:
+                exhausted = False
+                break
+        
+        if exhausted:
+            state["completed"] = True
+            self.save_metadata()
+            print("Backfill complete - reached the oldest activity")
         else:
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            # Remove duplicates just in case
-            combined_df = combined_df.drop_duplicates(subset=['id'])
+            print(f"Backfill paused after {pages} pages; the next run resumes from the saved cursor")
         
-        # Sort by start date (newest first)
-        if 'start_date_parsed' in combined_df.columns:
-            combined_df = combined_df.sort_values('start_date_parsed', ascending=False)
+        print(f"Stored {new_count} new activities. Total activities in dataset: {total}")
+        return new_count
+    
+    def _is_newer_than_last_fetch(self, start_date):
+        last_fetch = self.metadata.get("last_activity_fetch")
+        return not last_fetch or pd.Timestamp(start_date) > pd.Timestamp(last_fetch)
+    
+    def enrich_activity_details(self, max_activities=50, concurrency=4, chunk_size=25):
+        """Fetch /activities/{id} for activities without details and merge them in
         
-        # Save updated activities
-        combined_df.to_csv(self.activities_file, index=False)
+        Only activities missing ``details_fetched_at`` are requested, newest
+        first. The dataset is saved after every chunk, so an interrupted run
+        resumes where it stopped. Activities the API refuses for good (403
+        private, 404 deleted) get ``details_fetched_at`` plus the status in
+        ``details_error``, so later runs don't spend quota on them again.
         
-        # Update metadata
-        if not combined_df.empty:
-            latest_activity = combined_df.iloc[0]
-            self.metadata["last_activity_id"] = int(latest_activity['id'])
-            self.metadata["last_activity_fetch"] = latest_activity['start_date']
-            self.metadata["total_activities"] = len(combined_df)
+        Returns the number of activities enriched.
+        """
+        print("=== ENRICHING ACTIVITY DETAILS ===")
         
-        self.save_metadata()
+        activities_df = self.load_existing_activities(columns=['id', 'start_date_parsed', 'details_fetched_at'])
+        if activities_df.empty:
+            print("No activities found. Run fetch_new_activities first.")
+            return 0
         
-        print(f"Activities saved to {self.activities_file}")
-        print(f"Total activities in dataset: {len(combined_df)}")
+        if 'details_fetched_at' in activities_df.columns:
+            missing_df = activities_df[activities_df['details_fetched_at'].isna()]
+        else:
+            missing_df = activities_df
+        
+        if 'start_date_parsed' in missing_df.columns:
+            missing_df = missing_df.sort_values('start_date_parsed', ascending=False)
+        
+        activity_ids = missing_df['id'].tolist()
+        print(f"{len(activity_ids)} activities missing details")
+        if max_activities is not None:
+            activity_ids = activity_ids[:max_activities]
+        
+        enriched = 0
+        unavailable = 0
+        for start in range(0, len(activity_ids), chunk_size):
+            chunk_ids = activity_ids[start:start + chunk_size]
+            failed = {}
+            exhausted = None
+            try:
+                details = self.fetcher.fetch_detailed_activities(
+                    chunk_ids, concurrency=concurrency,
+                    on_activity_failed=lambda activity_id, status: failed.__setitem__(activity_id, status))
+            except RateBudgetExhausted as e:
+                # Store what the spent budget already fetched before stopping
+                details, exhausted = e.details, e
+            
+            records = [self.fetcher.detail_to_record(d) for d in details]
+            failed_at = datetime.now(timezone.utc).isoformat()
+            records += [{'id': activity_id, 'details_fetched_at': failed_at, 'details_error': status}
+                        for activity_id, status in failed.items()]
+            if records:
+                # Only the detail columns are appended (plus the start date the stores partition and sort by);
+                # reads merge them into the stored rows
+                details_df = activities_df[['id', 'start_date_parsed']].merge(pd.DataFrame(records), on='id')
+                
+                # Persist each chunk so quota already spent survives an interruption
+                self._append_activities(apply_activity_schema(details_df))
+                self._count_duplicate_rows(len(details_df))
+                enriched += len(details)
+                unavailable += len(failed)
+                print(f"Enriched {enriched}/{len(activity_ids)} activities")
+            
+            if exhausted is not None:
+                self.save_metadata()
+                raise exhausted
+        
+        if unavailable:
+            print(f"{unavailable} activities are private or deleted; their details won't be requested again")
+        if enriched or unavailable:
+            self.save_metadata()
+        print(f"Details enrichment complete: {enriched} activities updated")
+        return enriched
+    
+    def _journal_kudos(self, journal, activity_id, rows, kudos_count=None):
+        """Durably record one activity's kudos before moving on to the next"""
+        entry = {
+            "activity_id": int(activity_id),
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "kudos_count": None if pd.isna(kudos_count) else int(kudos_count),
+            "kudos": rows
+        }
+        journal.write(json.dumps(entry, default=int) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+    
+    def read_kudos_journal(self):
+        """Return journaled entries, keeping the latest fetch of each activity"""
+        entries = {}
+        if not os.path.exists(self.kudos_journal_file):
+            return entries
+        
+        with open(self.kudos_journal_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves at most one torn trailing line
+                    continue
+                entries[entry["activity_id"]] = entry
+        return entries
+    
+    def replay_kudos_journal(self):
+        """Merge journaled kudos into the kudos dataset, then clear the journal
+        
+        Each journaled activity's rows replace whatever was stored for it
+        before. Only the journaled rows are written (appended, for CSV), so
+        the cost follows the batch rather than the stored history. Returns
+        the number of activities merged.
+        """
+        # Kudos from before the givers table are re-encoded before anything is added to them
+        self.upgrade_kudos_encoding()
+        self.move_kudos_fetch_log()
+        entries = self.read_kudos_journal()
+        if not entries:
+            return 0
+        
+        print(f"Merging kudos for {len(entries)} journaled activities into {self.kudos_file}")
+        
+        # Givers are interned once; the kudos dataset only stores (activity_id, giver_code)
+        new_rows = [row for entry in entries.values() for row in entry["kudos"]]
+        new_kudos_df = encode_kudos(self.store, pd.DataFrame(new_rows, columns=KUDOS_COLUMNS))
+        
+        # Journaled activities' rows replace what was stored for them, then the journal goes
+        old_counts = self.store.kudos_counts(entries.keys()) if self.summary_current else None
+        self.store.replace_kudos(entries.keys(), new_kudos_df)
+        if self.summary_current:
+            self.summary.replace_kudos(entries.keys(), new_kudos_df, old_counts)
+        
+        # Remember when and at what kudos_count each activity was fetched
+        self.store.record_kudos_fetches({
+            activity_id: {"fetched_at": entry["fetched_at"], "kudos_count": entry.get("kudos_count")}
+            for activity_id, entry in entries.items()
+        })
+        os.remove(self.kudos_journal_file)
+        self.save_metadata()
         
-        return combined_df
+        return len(entries)
+    
+    def upgrade_kudos_encoding(self):
+        """Convert kudos stored with giver names into giver codes, once"""
+        converted = upgrade_kudos_givers(self.store)
+        if converted:
+            print(f"Re-encoded {converted} kudos records as (activity_id, giver_code) pairs")
+            if self.summary_current:
+                # Same-name rows of an activity collapse into one, so recount
+                self.summary.set_kudos(self.load_existing_kudos())
+            self.save_metadata()
+        return converted
     
-    def fetch_kudos_for_activities(self, activity_ids=None, batch_size=20):
-        """Fetch kudos data for specified activities or continue from where we left off"""
+    def move_kudos_fetch_log(self):
+        """Move a fetch log kept in the metadata by earlier versions into the store, once"""
+        fetch_log = self.metadata.get("kudos_fetch_log")
+        if fetch_log is None:
+            return
+        self.store.record_kudos_fetches(fetch_log)
+        del self.metadata["kudos_fetch_log"]
+        self.save_metadata()
+    
+    def compact(self):
+        """Fold appended rows away offline: refreshed activities and superseded kudos"""
+        self.replay_kudos_journal()
+        print(f"Compacting {self.store.name} storage in {self.data_dir}...")
+        activities_df = self.compact_activities()
+        self.store.compact_kudos()
+        kudos_df = self.load_existing_kudos()
+        # Both datasets are in memory anyway, so recount the summary exactly
+        CollectionSummary.build(self.summary.state, activities_df, kudos_df)
+        self.summary_current = True
+        self.save_metadata()
+        print(f"Compacted {len(activities_df)} activities and {len(kudos_df)} kudos records")
+        self.publish_snapshot()
+    
+    def publish_snapshot(self):
+        """Publish the datasets as a memory-mapped Arrow snapshot for the analyzers"""
+        manifest = publish_snapshot(self.store)
+        if manifest is None:
+            print("pyarrow not installed - analyzers will read the stored datasets directly")
+            return None
+        rows = manifest["rows"]
+        print(f"Published analysis snapshot ({rows['activities']} activities, {rows['kudos']} kudos) "
+              f"to {snapshot_dir(self.data_dir)}")
+        return manifest
+    
+    def fetch_kudos_for_activities(self, activity_ids=None, batch_size=20, concurrency=1, max_requests=None):
+        """Fetch kudos data for specified activities or continue from where we left off
+        
+        ``concurrency`` > 1 fetches activities in parallel within the shared rate budget.
+        ``max_requests`` caps the requests the scheduled batch may spend.
+        Every activity's kudos are journaled as soon as they arrive and merged
+        into kudos.csv at the end of the batch (or on the next run after a
+        crash), so no request is wasted.
+        """
         print("=== FETCHING KUDOS ===")
         
-        activities_df = self.load_existing_activities()
+        # Recover anything a previous interrupted run fetched
+        self.replay_kudos_journal()
+        
+        activities_df = self.load_existing_activities(columns=KUDOS_SCHEDULER_COLUMNS)
         if activities_df.empty:
             print("No activities found. Run fetch_new_activities first.")
             return pd.DataFrame()
         
-        existing_kudos_df = self.load_existing_kudos()
-        activities_with_kudos = set(existing_kudos_df['activity_id'].tolist()) if not existing_kudos_df.empty else set()
-        
         if activity_ids is None:
-            # Get activities that don't have kudos data yet, prioritize by kudos_count
-            activities_needing_kudos = activities_df[~activities_df['id'].isin(activities_with_kudos)]
-            
-            if activities_needing_kudos.empty:
-                print("All activities already have kudos data")
-                return existing_kudos_df
-            
-            # Sort by kudos_count descending to prioritize high-engagement activities
-            activities_needing_kudos = activities_needing_kudos.sort_values('kudos_count', ascending=False)
-            activity_ids = activities_needing_kudos['id'].tolist()[:batch_size]
+            # Only activities whose stored kudos lag their kudos_count, most stale first
+            scheduler = self.kudos_scheduler(activities_df)
+            activity_ids = scheduler.next_batch(max_activities=batch_size, max_requests=max_requests)
+        
+        if not activity_ids:
+            print("No stale kudos to fetch within this run's budget")
+            return self.load_existing_kudos()
         
         print(f"Fetching kudos for {len(activity_ids)} activities")
         print(f"Activity IDs: {activity_ids[:5]}{'...' if len(activity_ids) > 5 else ''}")
         
-        # Fetch kudos data
-        kudos_data = self.fetcher.fetch_kudos_givers(activity_ids, max_activities_for_kudos=len(activity_ids))
+        # Fetch kudos data, journaling each activity as it completes
+        kudos_counts = dict(zip(activities_df['id'], activities_df['kudos_count']))
+        with open(self.kudos_journal_file, 'a') as journal:
+            kudos_data = self.fetcher.fetch_kudos_givers(
+                activity_ids, max_activities_for_kudos=len(activity_ids),
+                concurrency=concurrency, kudos_counts=kudos_counts,
+                on_activity_fetched=lambda activity_id, rows: self._journal_kudos(
+                    journal, activity_id, rows, kudos_counts.get(activity_id))
+            )
         
         if not kudos_data:
             print("No kudos data retrieved")
-            return existing_kudos_df
-        
-        # Convert to DataFrame
-        new_kudos_df = pd.DataFrame(kudos_data)
-        
-        # Combine with existing kudos data
-        if existing_kudos_df.empty:
-            combined_kudos_df = new_kudos_df
-        else:
-            combined_kudos_df = pd.concat([existing_kudos_df, new_kudos_df], ignore_index=True)
-            # Remove duplicates
-            combined_kudos_df = combined_kudos_df.drop_duplicates(subset=['activity_id', 'athlete_id'])
         
-        # Save updated kudos data
-        combined_kudos_df.to_csv(self.kudos_file, index=False)
-        
-        # Update metadata
-        self.metadata["activities_with_kudos"] = list(set(combined_kudos_df['activity_id'].tolist()))
-        self.save_metadata()
+        # Merge the journal into the main store
+        self.replay_kudos_journal()
+        combined_kudos_df = self.load_existing_kudos()
         
         print(f"Kudos data saved to {self.kudos_file}")
         print(f"Total kudos records: {len(combined_kudos_df)}")
-        print(f"Activities with kudos data: {len(self.metadata['activities_with_kudos'])}")
+        with_kudos = combined_kudos_df['activity_id'].nunique() if not combined_kudos_df.empty else 0
+        print(f"Activities with kudos data: {with_kudos}")
         
         return combined_kudos_df
     
+    def _build_summary(self):
+        activities_df = self.load_existing_activities(columns=['id', 'start_date', 'type'])
+        CollectionSummary.build(self.summary.state, activities_df, self.load_existing_kudos())
+        self.summary_current = True
+    
+    def ensure_summary(self):
+        """Rebuild the status summary from one full read if it no longer matches the datasets
+        
+        Only needed once for a directory collected before the summary existed,
+        or after a run died between writing data and saving the metadata.
+        The caller must hold the directory's CollectorLock.
+        """
+        if self.summary_current:
+            return
+        print("Rebuilding the collection summary from the stored datasets...")
+        self._build_summary()
+        self.save_metadata()
+    
     def get_collection_status(self):
-        """Display current collection status"""
+        """Display current collection status from the summary, without reading the datasets"""
         print("=== COLLECTION STATUS ===")
         
-        activities_df = self.load_existing_activities()
-        kudos_df = self.load_existing_kudos()
+        if not self.summary_current:
+            if self.summary.state:
+                # Another process is mid-run; its last save is the best cheap answer
+                print(f"(As of {self.metadata.get('last_updated')}; the datasets have changed since)")
+            else:
+                self._build_summary()
+        summary = self.summary.state
         
-        print(f"Total activities: {len(activities_df)}")
-        print(f"Activities with kudos data: {len(set(kudos_df['activity_id'].tolist())) if not kudos_df.empty else 0}")
-        print(f"Total kudos records: {len(kudos_df)}")
+        print(f"Total activities: {summary['activities']}")
+        print(f"Activities with kudos data: {summary['activities_with_kudos']}")
+        print(f"Total kudos records: {summary['kudos']}")
         
-        if not activities_df.empty:
-            print(f"Date range: {activities_df['start_date'].min()} to {activities_df['start_date'].max()}")
-            print(f"Activity types: {', '.join(activities_df['type'].value_counts().head().index.tolist())}")
+        if summary['activities']:
+            print(f"Date range: {summary['first_start_date']} to {summary['last_start_date']}")
+            print(f"Activity types: {', '.join(self.summary.top_types())}")
         
         print(f"Last updated: {self.metadata.get('last_updated', 'Never')}")
         
         return {
-            "total_activities": len(activities_df),
-            "activities_with_kudos": len(set(kudos_df['activity_id'].tolist())) if not kudos_df.empty else 0,
-            "total_kudos": len(kudos_df),
+            "total_activities": summary['activities'],
+            "activities_with_kudos": summary['activities_with_kudos'],
+            "total_kudos": summary['kudos'],
             "metadata": self.metadata
         }
 
+def run_collection(collector, activities=True, kudos=True, details=False, backfill=False, full_sync=False,
+                   max_activities=None, kudos_batch_size=DEFAULT_KUDOS_BATCH_SIZE, details_batch_size=None,
+                   concurrency=1, plan_only=False):
+    """Plan one run against the remaining quota and collect each enabled stage
+    
+    The kudos and details stages fetch exactly what the plan lists. If the
+    listing stores new activities, those two stages are planned again
+    against what is left of the quota.
+    """
+    if not plan_only:
+        # Writes below keep the status summary current, provided it starts out current
+        collector.ensure_summary()
+        # Merge an interrupted run's kudos (and re-encode legacy kudos) before planning around them
+        collector.replay_kudos_journal()
+        # The snapshot at the end reads every column; loading them now serves each stage's projection from memory
+        collector.load_existing_activities()
+    
+    # Split the remaining daily quota between the stages
+    planner = QuotaPlanner(collector,
+                           include_listing=activities,
+                           include_kudos=kudos,
+                           include_details=details,
+                           backfill=backfill,
+                           kudos_batch_size=kudos_batch_size or None,
+                           details_batch_size=details_batch_size)
+    plan = planner.build_plan()
+    plan.describe()
+    
+    if plan_only:
+        return plan
+    
+    if activities:
+        # Fetch activities
+        if backfill:
+            new_count = collector.backfill_history(max_pages=max(plan.listing_requests, 1))
+        else:
+            new_count = collector.fetch_new_activities(max_new_activities=max_activities, incremental=not full_sync)
+        if new_count and (kudos or details):
+            print(f"Planning kudos and details again to include {new_count} new activities")
+            plan = planner.plan_after_listing()
+            plan.describe()
+    
+    if kudos:
+        collector.fetch_kudos_for_activities(activity_ids=plan.kudos_activity_ids, concurrency=concurrency)
+    
+    if details and plan.detail_activities:
+        # Enrich activities with /activities/{id} details
+        collector.enrich_activity_details(max_activities=plan.detail_activities,
+                                          concurrency=concurrency)
+    
+    # Hand the run's datasets to the analyzers
+    collector.publish_snapshot()
+    
+    # Show final status
+    collector.get_collection_status()
+    print(f"Dataset loads this run: {collector.store.describe_cache()}")
+    return plan
+
 def main():
     """Main collection script"""
     import argparse
@@ -204,28 +661,67 @@ def main():
     parser = argparse.ArgumentParser(description="Collect Strava data incrementally")
     parser.add_argument("--activities-only", action="store_true", help="Only fetch activities, skip kudos")
     parser.add_argument("--kudos-only", action="store_true", help="Only fetch kudos for existing activities")
-    parser.add_argument("--kudos-batch-size", type=int, default=20, help="Number of activities to fetch kudos for")
+    parser.add_argument("--kudos-batch-size", type=int, default=DEFAULT_KUDOS_BATCH_SIZE, help=f"Maximum number of activities to fetch kudos for (default: {DEFAULT_KUDOS_BATCH_SIZE}; 0 = as many as the quota allows)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of parallel workers for kudos and details fetching")
+    parser.add_argument("--details", action="store_true", help="Enrich activities missing detailed data (description, device, calories...)")
+    parser.add_argument("--details-batch-size", type=int, help="Maximum number of activities to fetch details for (default: as many as the quota allows)")
     parser.add_argument("--max-activities", type=int, help="Maximum number of activities to fetch")
+    parser.add_argument("--full-sync", action="store_true", help="Re-list the full activity history instead of syncing from the last fetch")
+    parser.add_argument("--backfill", action="store_true", help="List the full history page by page, resuming from the saved cursor across runs")
+    parser.add_argument("--plan", action="store_true", help="Show the quota plan and how many runs a full backfill needs, then exit")
     parser.add_argument("--status", action="store_true", help="Show collection status and exit")
+    parser.add_argument("--storage", choices=sorted(STORAGE_BACKENDS), help="Storage format for a new data directory (default: csv, or whatever the directory already uses)")
+    parser.add_argument("--compact", action="store_true", help="Fold appended activity refreshes and superseded kudos into the stored datasets, then exit (e.g. from a weekly cron job)")
+    parser.add_argument("--migrate-storage", choices=sorted(STORAGE_BACKENDS), help="Convert the stored datasets to another format and exit")
     
     args = parser.parse_args()
     
-    collector = StravaDataCollector()
+    try:
+        collector = StravaDataCollector(storage=args.storage)
+    except ValueError as e:
+        # --storage naming a format other than the directory's
+        print(e)
+        sys.exit(1)
     
     if args.status:
+        try:
+            with CollectorLock(collector.data_dir):
+                collector.ensure_summary()
+        except CollectorLockedError:
+            # A run is writing; report the summary from its last save
+            pass
         collector.get_collection_status()
         return
     
-    if not args.kudos_only:
-        # Fetch activities
-        collector.fetch_new_activities(max_new_activities=args.max_activities)
+    if args.migrate_storage:
+        with CollectorLock(collector.data_dir):
+            collector.migrate_storage(args.migrate_storage)
+        return
     
-    if not args.activities_only:
-        # Fetch kudos
-        collector.fetch_kudos_for_activities(batch_size=args.kudos_batch_size)
+    if args.compact:
+        with CollectorLock(collector.data_dir):
+            collector.compact()
+        return
     
-    # Show final status
-    collector.get_collection_status()
+    # One collector per data directory; others (e.g. an overlapping cron run) exit
+    try:
+        lock = CollectorLock(collector.data_dir).acquire()
+    except CollectorLockedError as e:
+        print(e)
+        sys.exit(1)
+    
+    with lock:
+        run_collection(collector,
+                       activities=not args.kudos_only,
+                       kudos=not args.activities_only,
+                       details=args.details,
+                       backfill=args.backfill,
+                       full_sync=args.full_sync,
+                       max_activities=args.max_activities,
+                       kudos_batch_size=args.kudos_batch_size,
+                       details_batch_size=args.details_batch_size,
+                       concurrency=args.concurrency,
+                       plan_only=args.plan)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
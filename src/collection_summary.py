@@ -0,0 +1,89 @@
+"""
+Collection Summary - Counts for --status, maintained as the collector writes
+"""
+import pandas as pd
+
+class CollectionSummary:
+    """Row counts, date range and activity types of the stored datasets
+
+    The state is a plain dict kept in collection_metadata.json under
+    ``"summary"``. Every write the collector makes updates it with just the
+    rows written, so ``--status`` answers without reading the datasets. The
+    store's fingerprint is recorded each time the metadata is saved. If the
+    files changed afterwards (e.g. a crash between a write and the save), the
+    summary is no longer trusted and the next status check rebuilds it from
+    one full read.
+    """
+
+    def __init__(self, state):
+        # The metadata's dict itself, so saving the metadata saves the summary
+        self.state = state
+        # Per-activity counts kept here by earlier versions; the store has them
+        self.state.pop("kudos_per_activity", None)
+
+    @staticmethod
+    def empty_state():
+        return {
+            "activities": 0,
+            "first_start_date": None,
+            "last_start_date": None,
+            "activity_types": {},
+            "kudos": 0,
+            "activities_with_kudos": 0,
+            "fingerprint": None,
+        }
+
+    @classmethod
+    def build(cls, state, activities_df, kudos_df):
+        """Reset ``state`` from full datasets"""
+        state.clear()
+        state.update(cls.empty_state())
+        summary = cls(state)
+        summary.add_activities(activities_df)
+        summary.set_kudos(kudos_df)
+        return summary
+
+    def is_current(self, fingerprint):
+        return self.state.get("fingerprint") == fingerprint
+
+    def add_activities(self, new_df):
+        """Count activities stored for the first time (refreshed rows are not new)"""
+        if new_df.empty:
+            return
+        new_df = new_df.drop_duplicates(subset='id')
+        self.state["activities"] += len(new_df)
+
+        if 'start_date' in new_df.columns:
+            dates = [date for date in (new_df['start_date'].min(), new_df['start_date'].max()) if pd.notna(date)]
+            known = [date for date in (self.state["first_start_date"], self.state["last_start_date"]) if date]
+            if dates:
+                self.state["first_start_date"] = min(dates + known)
+                self.state["last_start_date"] = max(dates + known)
+
+        if 'type' in new_df.columns:
+            types = self.state["activity_types"]
+            for activity_type, count in new_df['type'].value_counts().items():
+                types[str(activity_type)] = types.get(str(activity_type), 0) + int(count)
+
+    def replace_kudos(self, activity_ids, kudos_df, old_counts):
+        """``kudos_df`` became the complete kudos of ``activity_ids``
+
+        ``old_counts`` holds each activity's stored kudos rows before the
+        replacement (the store's ``kudos_counts``).
+        """
+        counts = kudos_df.groupby('activity_id').size() if not kudos_df.empty else pd.Series(dtype='int64')
+        for activity_id in activity_ids:
+            old = old_counts.get(int(activity_id), 0)
+            new = int(counts.get(activity_id, 0))
+            self.state["kudos"] += new - old
+            self.state["activities_with_kudos"] += (new > 0) - (old > 0)
+
+    def set_kudos(self, kudos_df):
+        """Recount kudos from the full kudos dataset"""
+        counts = kudos_df.groupby('activity_id').size() if not kudos_df.empty else pd.Series(dtype='int64')
+        self.state["kudos"] = int(counts.sum())
+        self.state["activities_with_kudos"] = len(counts)
+
+    def top_types(self, n=5):
+        types = self.state["activity_types"]
+        return sorted(types, key=lambda activity_type: -types[activity_type])[:n]
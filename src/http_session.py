@@ -0,0 +1,35 @@
+"""
+HTTP Session - Pooled keep-alive sessions shared by the Strava API clients
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, max_retries=DEFAULT_MAX_RETRIES,
+                   backoff_factor=DEFAULT_BACKOFF_FACTOR):
+    """Create a requests session with connection pooling and retry/backoff
+
+    Connections to the same host are kept alive and reused, so a batch of
+    small API calls pays the TCP+TLS handshake once instead of per request.
+    Transient 5xx errors and connection failures are retried with exponential
+    backoff; 429s are left to the rate limiter, which knows when the window
+    resets. Only GET and HEAD are retried: replaying the OAuth refresh POST
+    could invalidate the refresh token it just issued.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
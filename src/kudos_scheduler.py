@@ -0,0 +1,90 @@
+"""
+Kudos Scheduler - Decide which activities' kudos are worth (re)fetching
+"""
+import heapq
+import math
+import os
+import sys
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.strava_data_fetcher import KUDOS_PAGE_SIZE
+
+class KudosRefreshScheduler:
+    """Priority queue of activities whose stored kudos lag the listing
+
+    An activity is stale when the listing's ``kudos_count`` exceeds the
+    number of stored kudos rows, unless it was already fetched at that same
+    kudos_count (the endpoint can't return more - e.g. hidden athletes).
+    Stale activities are ordered by missing kudos (most first), then by
+    start date (newest first), then by last fetch (oldest first).
+    """
+
+    def __init__(self, activities_df, kudos_df, fetch_log=None, stale=None):
+        self.activities_df = activities_df
+        self.kudos_df = kudos_df
+        # {activity_id (str): {"fetched_at": iso, "kudos_count": n}}
+        self.fetch_log = fetch_log or {}
+        # Stale set already worked out by the store (e.g. one SQLite query)
+        self.stale = stale
+
+    def stale_activities(self):
+        """DataFrame of stale activities with their missing-kudos delta"""
+        if self.stale is not None:
+            return self.stale
+        if self.activities_df.empty:
+            return pd.DataFrame(columns=['id', 'kudos_count', 'stored_kudos', 'missing_kudos'])
+
+        df = self.activities_df[['id', 'kudos_count', 'start_date']].copy()
+        df['kudos_count'] = df['kudos_count'].fillna(0).astype(int)
+
+        if self.kudos_df is not None and not self.kudos_df.empty:
+            stored = self.kudos_df.groupby('activity_id').size()
+            df['stored_kudos'] = df['id'].map(stored).fillna(0).astype(int)
+        else:
+            df['stored_kudos'] = 0
+        df['missing_kudos'] = df['kudos_count'] - df['stored_kudos']
+
+        fetched_count = df['id'].map(lambda activity_id: self.fetch_log.get(str(activity_id), {}).get('kudos_count'))
+        fetched_at = df['id'].map(lambda activity_id: self.fetch_log.get(str(activity_id), {}).get('fetched_at'))
+        df['last_fetched'] = pd.to_datetime(fetched_at, utc=True)
+
+        # Nothing new to get if kudos_count hasn't moved since the last fetch
+        unchanged = fetched_count.notna() & (df['kudos_count'] <= fetched_count.fillna(0))
+        return df[(df['missing_kudos'] > 0) & ~unchanged]
+
+    def next_batch(self, max_activities=None, max_requests=None):
+        """Pop the most stale activities that fit the activity and request budgets
+
+        Returns a list of activity IDs in priority order.
+        """
+        stale = self.stale_activities()
+        if stale.empty:
+            return []
+
+        start_ts = pd.to_datetime(stale['start_date'], utc=True).map(lambda ts: ts.timestamp() if pd.notna(ts) else 0)
+        last_ts = stale['last_fetched'].map(lambda ts: ts.timestamp() if pd.notna(ts) else 0)
+
+        heap = [
+            (-missing, -start, last, activity_id, kudos_count)
+            for missing, start, last, activity_id, kudos_count in zip(
+                stale['missing_kudos'], start_ts, last_ts, stale['id'], stale['kudos_count'])
+        ]
+        heapq.heapify(heap)
+
+        batch = []
+        requests_planned = 0
+        while heap:
+            if max_activities is not None and len(batch) >= max_activities:
+                break
+            _, _, _, activity_id, kudos_count = heapq.heappop(heap)
+            cost = self.request_cost(kudos_count)
+            if max_requests is not None and requests_planned + cost > max_requests:
+                continue
+            batch.append(int(activity_id))
+            requests_planned += cost
+        return batch
+
+    @staticmethod
+    def request_cost(kudos_count):
+        """Requests needed to page through ``kudos_count`` kudos"""
+        return max(1, math.ceil(kudos_count / KUDOS_PAGE_SIZE))
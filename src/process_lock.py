@@ -0,0 +1,63 @@
+"""
+Process Lock - Keep two collectors from writing the same data directory
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the lock is best-effort
+    fcntl = None
+
+LOCK_FILE_NAME = ".collector.lock"
+
+class CollectorLockedError(RuntimeError):
+    """Another collector process already holds the data directory"""
+
+class CollectorLock:
+    """Exclusive, non-blocking flock on ``<data_dir>/.collector.lock``
+
+    The kernel drops the lock when the process exits, so a crashed run never
+    leaves a stale lock behind. Use as a context manager.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, LOCK_FILE_NAME)
+        self._file = None
+
+    def acquire(self):
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._file = open(self.path, 'a+')
+        if fcntl is None:
+            return self
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.seek(0)
+            holder = self._file.read().strip()
+            self._file.close()
+            self._file = None
+            raise CollectorLockedError(
+                f"Another collector is already running on {self.data_dir}" + (f" (pid {holder})" if holder else ""))
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return self
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            self._file.seek(0)
+            self._file.truncate()
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
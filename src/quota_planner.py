@@ -0,0 +1,181 @@
+"""
+Quota Planner - Budget API requests across listing, kudos and detail collection
+"""
+import math
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.schema import KUDOS_SCHEDULER_COLUMNS
+from src.strava_data_fetcher import ACTIVITIES_PAGE_SIZE
+
+# Requests held back for retries and ad-hoc calls
+DEFAULT_RESERVE = 5
+
+class CollectionPlan:
+    """Requests allocated to each stage of one collection run"""
+
+    def __init__(self, budget, remaining, limits, listing_requests, kudos_activity_ids, kudos_requests,
+                 detail_activities, pending, pending_kudos_activities=0, batch_sizes=None):
+        self.budget = budget
+        self.remaining = remaining
+        self.limits = limits
+        self.listing_requests = listing_requests
+        self.kudos_activity_ids = kudos_activity_ids
+        self.kudos_requests = kudos_requests
+        self.detail_activities = detail_activities
+        # {"listing": n, "kudos": n, "details": n} requests still outstanding
+        self.pending = pending
+        self.pending_kudos_activities = pending_kudos_activities
+        # {"kudos": n, "details": n} activities a run may take on; None leaves it to the quota
+        self.batch_sizes = batch_sizes or {}
+
+    @property
+    def planned_requests(self):
+        return self.listing_requests + self.kudos_requests + self.detail_activities
+
+    @property
+    def total_pending(self):
+        return sum(self.pending.values())
+
+    def runs_to_complete(self):
+        """Daily runs needed to clear every queue, this one included
+
+        Bounded by the daily quota and by the kudos and details batch sizes,
+        whichever takes more runs.
+        """
+        runs = 1
+        if self.total_pending > self.budget:
+            per_run = max(self.limits["daily"] - DEFAULT_RESERVE, 1)
+            runs = 1 + math.ceil((self.total_pending - self.budget) / per_run)
+        capped = (("kudos", self.pending_kudos_activities), ("details", self.pending["details"]))
+        for stage, pending_activities in capped:
+            batch_size = self.batch_sizes.get(stage)
+            if batch_size:
+                runs = max(runs, math.ceil(pending_activities / batch_size))
+        return runs
+
+    def short_window_waits(self):
+        """15-minute window resets this run will sit through"""
+        overflow = self.planned_requests - self.remaining["short"]
+        if overflow <= 0:
+            return 0
+        return math.ceil(overflow / max(self.limits["short"], 1))
+
+    def describe(self):
+        """Print the plan and the backfill estimate"""
+        print("=== COLLECTION PLAN ===")
+        print(f"Remaining quota: {self.remaining['daily']}/{self.limits['daily']} today, "
+              f"{self.remaining['short']}/{self.limits['short']} this 15-minute window")
+        print(f"Budget for this run: {self.budget} requests")
+        print(f"  Activity listing: {self.listing_requests} requests (pending: {self.pending['listing']})")
+        print(f"  Kudos: {self.kudos_requests} requests for {len(self.kudos_activity_ids)} activities "
+              f"(pending: {self.pending['kudos']})")
+        print(f"  Details: {self.detail_activities} requests (pending: {self.pending['details']})")
+        print(f"Planned: {self.planned_requests} requests")
+
+        waits = self.short_window_waits()
+        if waits:
+            print(f"Will wait for {waits} 15-minute window reset(s) (~{waits * 15} minutes)")
+
+        runs = self.runs_to_complete()
+        print(f"Outstanding work: {self.total_pending} requests - "
+              f"{'finishes this run' if runs == 1 else f'about {runs} daily runs to complete'}")
+
+class QuotaPlanner:
+    """Split the remaining daily quota between the collection stages
+
+    Listing runs first because new activities feed the other queues, then
+    stale kudos (most stale first), then missing activity details.
+    """
+
+    def __init__(self, collector, include_listing=True, include_kudos=True, include_details=False,
+                 kudos_batch_size=None, details_batch_size=None, reserve=DEFAULT_RESERVE, backfill=False):
+        self.collector = collector
+        self.include_listing = include_listing
+        self.backfill = backfill
+        self.include_kudos = include_kudos
+        self.include_details = include_details
+        self.kudos_batch_size = kudos_batch_size
+        self.details_batch_size = details_batch_size
+        self.reserve = reserve
+
+    def pending_listing_requests(self, activities_df):
+        """Estimated requests to list activities not yet stored"""
+        metadata = self.collector.metadata
+        backfill = metadata.get("backfill") or {}
+        if self.backfill and not backfill.get("completed"):
+            if backfill.get("estimated_total") is None:
+                print("Estimating history size for the backfill from athlete stats...")
+                backfill["estimated_total"] = self.collector.fetcher.estimate_activity_total()
+                metadata["backfill"] = {"before": None, "completed": False, "pages_fetched": 0, **backfill}
+            remaining = max(backfill["estimated_total"] - len(activities_df), 0)
+            return math.ceil(remaining / ACTIVITIES_PAGE_SIZE) + 1
+
+        if not activities_df.empty:
+            # Incremental sync from the last fetch: normally a single page
+            return 1
+
+        print("No activities stored yet - estimating history size from athlete stats...")
+        total = self.collector.fetcher.estimate_activity_total()
+        print(f"Athlete stats report roughly {total} activities")
+        return math.ceil(total / ACTIVITIES_PAGE_SIZE) + 1
+
+    def build_plan(self):
+        """Build the plan for one run from current data and quota"""
+        fetcher = self.collector.fetcher
+        activities_df = self.collector.load_existing_activities(
+            columns=KUDOS_SCHEDULER_COLUMNS + ['details_fetched_at'])
+
+        listing_pending = self.pending_listing_requests(activities_df) if self.include_listing else 0
+
+        # Quota is read after any estimation calls so they are accounted for
+        remaining = fetcher.rate_limiter.remaining()
+        limits = {"short": fetcher.rate_limiter.short.limit, "daily": fetcher.rate_limiter.daily.limit}
+        budget = max(remaining["daily"] - self.reserve, 0)
+        left = budget
+
+        listing_requests = min(listing_pending, left)
+        left -= listing_requests
+
+        kudos_pending = 0
+        kudos_pending_activities = 0
+        kudos_ids = []
+        kudos_requests = 0
+        if self.include_kudos:
+            scheduler = self.collector.kudos_scheduler(activities_df)
+            stale = scheduler.stale_activities()
+            kudos_pending = int(sum(scheduler.request_cost(count) for count in stale['kudos_count']))
+            kudos_pending_activities = len(stale)
+            if activities_df.empty:
+                # Unknown until listed - assume one kudos request per listed activity
+                kudos_pending = kudos_pending_activities = max(listing_pending - 1, 0) * ACTIVITIES_PAGE_SIZE
+            kudos_ids = scheduler.next_batch(max_activities=self.kudos_batch_size, max_requests=left)
+            kudos_counts = dict(zip(activities_df['id'], activities_df['kudos_count'])) if kudos_ids else {}
+            kudos_requests = int(sum(scheduler.request_cost(kudos_counts[i]) for i in kudos_ids))
+            left -= kudos_requests
+
+        details_pending = 0
+        detail_activities = 0
+        if self.include_details:
+            if activities_df.empty:
+                details_pending = max(listing_pending - 1, 0) * ACTIVITIES_PAGE_SIZE
+            elif 'details_fetched_at' in activities_df.columns:
+                details_pending = int(activities_df['details_fetched_at'].isna().sum())
+            else:
+                details_pending = len(activities_df)
+            detail_activities = min(details_pending, left)
+            if self.details_batch_size is not None:
+                detail_activities = min(detail_activities, self.details_batch_size)
+
+        pending = {"listing": listing_pending, "kudos": kudos_pending, "details": details_pending}
+        batch_sizes = {"kudos": self.kudos_batch_size, "details": self.details_batch_size}
+        return CollectionPlan(budget, remaining, limits, listing_requests, kudos_ids, kudos_requests,
+                              detail_activities, pending, kudos_pending_activities, batch_sizes)
+
+    def plan_after_listing(self):
+        """Plan the kudos and details stages again once the listing has stored new activities"""
+        include_listing, self.include_listing = self.include_listing, False
+        try:
+            return self.build_plan()
+        finally:
+            self.include_listing = include_listing
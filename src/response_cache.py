@@ -0,0 +1,151 @@
+"""
+Response Cache - On-disk cache of raw Strava API JSON responses
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+# Time-to-live per endpoint, checked in order; the first matching pattern wins
+DEFAULT_TTLS = [
+    (re.compile(r'/athlete/activities$'), 15 * 60),
+    (re.compile(r'/activities/\d+/kudos$'), 60 * 60),
+    (re.compile(r'/activities/\d+$'), 24 * 60 * 60),
+]
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+# Eviction trims the cache to this fraction of max_bytes, so it runs once per many writes
+EVICT_TO_FRACTION = 0.8
+
+class ResponseCache:
+    """Raw JSON responses on disk keyed by athlete, endpoint and params
+
+    Fresh entries are served without touching the API. Stale entries that
+    carry an ETag are revalidated with If-None-Match, so an unchanged
+    resource costs a 304 instead of a full download. The athlete is part of
+    the key because ``/athlete/...`` URLs answer for whoever owns the token,
+    so athletes sharing a cache directory never see each other's responses.
+
+    The cache directory is kept under ``max_bytes`` by evicting least
+    recently used entries. Its total size is tracked as entries are written;
+    the directory is only scanned once to start the count and again when an
+    eviction is due. The concurrent kudos workers share one cache, so the
+    size count and eviction are serialized by a lock, and an entry evicted
+    while it is being read is a miss.
+    """
+
+    def __init__(self, cache_dir, ttls=None, default_ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES,
+                 clock=time.time):
+        self.cache_dir = cache_dir
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # Bytes of entries on disk, counted on the first write
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, params, athlete_id=None):
+        key_source = json.dumps([athlete_id, url, sorted((params or {}).items())], default=str)
+        key = hashlib.sha256(key_source.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def ttl_for(self, url):
+        """Seconds a response from ``url`` stays fresh"""
+        path = url.split('?', 1)[0]
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url, params=None, athlete_id=None):
+        """Return ``athlete_id``'s cached entry for a request, fresh or stale, or None"""
+        path = self._path(url, params, athlete_id)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            # Reads count as use for LRU eviction
+            os.utime(path, None)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def is_fresh(self, entry):
+        return self.clock() - entry['stored_at'] < self.ttl_for(entry['url'])
+
+    def put(self, url, params, body, etag=None, athlete_id=None):
+        """Store a response body, evicting old entries if over the size limit"""
+        entry = {
+            'athlete_id': athlete_id,
+            'url': url,
+            'params': params or {},
+            'etag': etag,
+            'stored_at': self.clock(),
+            'body': body
+        }
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            self._write(self._path(url, params, athlete_id), entry)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def revalidated(self, entry):
+        """Mark an entry fresh again after the server answered 304 Not Modified"""
+        entry['stored_at'] = self.clock()
+        with self._lock:
+            self._write(self._path(entry['url'], entry['params'], entry.get('athlete_id')), entry)
+
+    def _write(self, path, entry):
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+            written = f.tell()
+        os.replace(tmp_path, path)
+        if self._total_bytes is not None:
+            self._total_bytes += written - replaced
+
+    def _scan(self):
+        """(mtime, size, path) of every entry on disk"""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if item.name.endswith('.json'):
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        # Evicted by another process since the listing
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        return entries
+
+    def _evict(self):
+        # Rescan rather than trust the running count: other processes may share the directory
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO_FRACTION
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_bytes = total
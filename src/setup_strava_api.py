@@ -5,6 +5,7 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.strava_auth import StravaAuth
+from src.token_manager import TokenManager
 
 def setup_strava_credentials():
     """Guide user through setting up Strava API credentials"""
@@ -68,6 +69,9 @@ def setup_strava_credentials():
                 else:
                     f.write(line)
         
+        # The collectors keep refreshed tokens (with their expiry) in the token store
+        TokenManager(auth).save(token_data)
+        
         print("\nSuccess! Your Strava API is now configured.")
         print("You can now run the analysis with: python analyze_kudos.py")
         
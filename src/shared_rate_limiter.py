@@ -0,0 +1,82 @@
+"""
+Shared Rate Limiter - One Strava request budget for every process on the host
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.strava_data_fetcher import RateLimiter
+
+# One database per host, next to the code rather than the working directory; STRAVA_RATE_LIMIT_DB overrides it
+DEFAULT_RATE_LIMIT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                                     "rate_limit.sqlite")
+# How long a process waits for another one holding the database lock
+BUSY_TIMEOUT_SECONDS = 30
+
+class _SqliteWindowLock:
+    """Lock that loads the windows from SQLite on entry and saves them on exit
+
+    ``BEGIN IMMEDIATE`` takes SQLite's write lock, so the read-modify-write
+    of the buckets is atomic across processes, and the thread lock does the
+    same for threads sharing the connection.
+    """
+
+    def __init__(self, limiter, connection):
+        self.limiter = limiter
+        self.connection = connection
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self.connection.execute("BEGIN IMMEDIATE")
+            rows = self.connection.execute("SELECT name, window_start, used, rate_limit FROM windows").fetchall()
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        stored = {name: (window_start, used, rate_limit) for name, window_start, used, rate_limit in rows}
+        for window in self.limiter.windows:
+            if window.name in stored:
+                window.window_start, window.used, window.limit = stored[window.name]
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO windows (name, window_start, used, rate_limit) VALUES (?, ?, ?, ?)",
+                    [(w.name, w.window_start, w.used, w.limit) for w in self.limiter.windows])
+                self.connection.execute("COMMIT")
+            else:
+                self.connection.execute("ROLLBACK")
+        finally:
+            self._thread_lock.release()
+        return False
+
+class SharedRateLimiter(RateLimiter):
+    """RateLimiter whose buckets live in a SQLite database
+
+    Every collector process (cron runs overlapping a sleeping run, kudos-only
+    and activities-only side by side, club workers) opens the same database
+    and draws from one budget. Usage seen in response headers is merged into
+    it too, so one process's 429 makes the others wait as well.
+    """
+
+    def __init__(self, path=None, short_limit=100, daily_limit=1000, clock=time.time,
+                 sleep=time.sleep):
+        super().__init__(short_limit=short_limit, daily_limit=daily_limit, clock=clock, sleep=sleep)
+        self.path = path = path or os.getenv('STRAVA_RATE_LIMIT_DB') or DEFAULT_RATE_LIMIT_DB
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are managed explicitly by the lock
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS windows ("
+            "name TEXT PRIMARY KEY, window_start REAL, used INTEGER NOT NULL, rate_limit INTEGER NOT NULL)")
+        self._lock = _SqliteWindowLock(self, self.connection)
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,105 @@
+"""
+Dataset Snapshot - Memory-mapped Arrow copy of the datasets for the analyzers
+
+After each run the collector publishes the merged activities, kudos and
+givers as uncompressed Arrow IPC files under ``<data_dir>/snapshot/``.
+Analyzers memory-map them instead of re-parsing the stored datasets: opening
+a table reads only its footer, columns are views onto the mapped pages, and
+every analysis process shares those pages through the OS page cache.
+"""
+import json
+import os
+import sys
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.schema import apply_activity_schema, project
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Snapshots are optional; analyzers fall back to the store
+    pa = None
+
+SNAPSHOT_DIR_NAME = "snapshot"
+MANIFEST_FILE_NAME = "manifest.json"
+
+def snapshot_dir(data_dir):
+    return os.path.join(data_dir, SNAPSHOT_DIR_NAME)
+
+def _write_table(path, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Uncompressed IPC file format, so readers can map buffers without decoding
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # Readers that still have the previous file mapped keep its inode
+    os.replace(path + ".tmp", path)
+
+def publish_snapshot(store):
+    """Write the store's datasets as Arrow IPC files; returns the manifest, or None without pyarrow
+
+    The manifest records the store's fingerprint from before the datasets
+    were read, so a write that races the publish leaves the snapshot stale
+    rather than silently behind.
+    """
+    if pa is None:
+        return None
+    directory = snapshot_dir(store.data_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    fingerprint = store.fingerprint()
+    frames = {
+        "activities": store.load_activities(),
+        "kudos": store.load_kudos(),
+        "givers": store.load_givers(),
+    }
+    for name, df in frames.items():
+        _write_table(os.path.join(directory, f"{name}.arrow"), df)
+
+    manifest = {
+        "storage": store.name,
+        "fingerprint": fingerprint,
+        "published_at": datetime.now(timezone.utc).isoformat(),
+        "rows": {name: len(df) for name, df in frames.items()},
+    }
+    # The manifest goes last: until it is replaced, readers see the old fingerprint
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+class Snapshot:
+    """Tables of a published snapshot, memory-mapped on demand"""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self.published_at = manifest.get("published_at")
+
+    def table(self, name, columns=None):
+        """Arrow table ``name`` (just ``columns`` if given) backed by the mapped file"""
+        source = pa.memory_map(os.path.join(self.directory, f"{name}.arrow"), "r")
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(project(table.column_names, columns))
+        return table
+
+    def to_pandas(self, name, columns=None):
+        """DataFrame of table ``name``, converting only the selected columns"""
+        df = self.table(name, columns).to_pandas()
+        return apply_activity_schema(df) if name == "activities" else df
+
+def open_snapshot(store):
+    """The published snapshot if it still matches ``store``'s files, else None"""
+    if pa is None:
+        return None
+    directory = snapshot_dir(store.data_dir)
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("storage") != store.name or manifest.get("fingerprint") != store.fingerprint():
+        return None
+    return Snapshot(directory, manifest)
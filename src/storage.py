@@ -0,0 +1,951 @@
+"""
+Storage - Pluggable on-disk formats for the activities and kudos datasets
+"""
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.schema import KEY_COLUMNS, apply_activity_schema, csv_dtypes, project
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet storage is optional
+    pa = None
+    pq = None
+
+DEFAULT_STORAGE = "csv"
+METADATA_FILE_NAME = "collection_metadata.json"
+# A kudos row is one (activity, giver) pair; giver names live in the givers table
+KUDOS_KEY = ['activity_id', 'giver_code']
+GIVER_COLUMNS = ['giver_code', 'firstname', 'lastname', 'fullname']
+KUDOS_FETCH_COLUMNS = ['activity_id', 'fetched_at', 'kudos_count']
+
+def merge_duplicate_activities(df):
+    """Collapse repeated activity rows, letting later rows override earlier ones
+
+    Columns a later row doesn't carry (e.g. enriched details) keep the
+    earlier value.
+    """
+    duplicated = df['id'].duplicated(keep=False)
+    if not duplicated.any():
+        return df
+    merged = df[duplicated].groupby('id', sort=False).last().reset_index()
+    return pd.concat([df[~duplicated], merged], ignore_index=True)[df.columns]
+
+def file_fingerprint(paths):
+    """Digest of each existing file's mtime and size; changes whenever one is written"""
+    entries = []
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            entries.append([os.path.basename(path), stat.st_mtime_ns, stat.st_size])
+    return hashlib.sha1(json.dumps(entries).encode()).hexdigest()
+
+def _replace_csv(df, path):
+    """Write ``df`` as the whole of ``path`` through a temp file, so a crash never leaves it half written"""
+    df.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+def count_kudos(kudos_df, activity_ids):
+    """{activity_id: stored kudos rows} for ``activity_ids``, 0 for those without any"""
+    counts = kudos_df.groupby('activity_id').size() if not kudos_df.empty else pd.Series(dtype='int64')
+    return {int(activity_id): int(counts.get(int(activity_id), 0)) for activity_id in activity_ids}
+
+def _sort_newest_first(df):
+    if 'start_date_parsed' in df.columns:
+        return df.sort_values('start_date_parsed', ascending=False)
+    return df
+
+class _FileStore:
+    """ID lookups shared by the file-based stores
+
+    The stored IDs are read once and then kept current by the store's own
+    writes, so per-page membership checks don't re-read the dataset.
+    """
+
+    _ids = None
+    _givers = None
+
+    @property
+    def givers_path(self):
+        return os.path.join(self.data_dir, "givers.csv")
+
+    def load_givers(self):
+        """Giver dimension table: giver_code, firstname, lastname, fullname"""
+        if not os.path.exists(self.givers_path):
+            return pd.DataFrame(columns=GIVER_COLUMNS)
+        # Names like "NA" are names, not missing values
+        return pd.read_csv(self.givers_path, keep_default_na=False, dtype={'firstname': str, 'lastname': str,
+                                                                            'fullname': str})
+
+    def intern_givers(self, firstnames, lastnames):
+        """Stable integer codes for giver names, adding unseen givers to givers.csv"""
+        if self._givers is None:
+            givers = self.load_givers()
+            self._givers = dict(zip(zip(givers['firstname'], givers['lastname']), givers['giver_code']))
+
+        names = list(zip(firstnames, lastnames))
+        new_givers = []
+        for first, last in dict.fromkeys(names):
+            if (first, last) not in self._givers:
+                code = len(self._givers) + 1
+                self._givers[(first, last)] = code
+                new_givers.append((code, first, last, f"{first} {last}".strip()))
+
+        if new_givers:
+            new_df = pd.DataFrame(new_givers, columns=GIVER_COLUMNS)
+            new_df.to_csv(self.givers_path, mode='a', header=not os.path.exists(self.givers_path), index=False)
+        return [int(self._givers[name]) for name in names]
+
+    def dataset_files(self):
+        raise NotImplementedError
+
+    def fingerprint(self):
+        """Changes whenever any file of the datasets is written"""
+        return file_fingerprint(self.dataset_files())
+
+    def _read_activity_ids(self):
+        raise NotImplementedError
+
+    def load_activity_ids(self):
+        """Stored activity IDs without parsing the whole dataset"""
+        if self._ids is None:
+            self._ids = self._read_activity_ids()
+        return set(self._ids)
+
+    def known_activity_ids(self, activity_ids):
+        """The subset of ``activity_ids`` already stored"""
+        self.load_activity_ids()
+        return self._ids.intersection(int(i) for i in activity_ids)
+
+    def count_activities(self):
+        self.load_activity_ids()
+        return len(self._ids)
+
+    def _stored_ids(self, df, replace=False):
+        if replace:
+            self._ids = None
+        elif self._ids is not None:
+            self._ids.update(int(i) for i in df['id'])
+
+    @property
+    def kudos_fetches_path(self):
+        return os.path.join(self.data_dir, "kudos_fetches.csv")
+
+    def record_kudos_fetches(self, fetch_log):
+        """Append ``{activity_id: {"fetched_at", "kudos_count"}}`` to kudos_fetches.csv"""
+        if not fetch_log:
+            return
+        rows = pd.DataFrame([(int(activity_id), entry.get("fetched_at"), entry.get("kudos_count"))
+                             for activity_id, entry in fetch_log.items()], columns=KUDOS_FETCH_COLUMNS)
+        rows.to_csv(self.kudos_fetches_path, mode='a', header=not os.path.exists(self.kudos_fetches_path),
+                    index=False)
+
+    def _read_kudos_fetches(self):
+        if not os.path.exists(self.kudos_fetches_path):
+            return pd.DataFrame(columns=KUDOS_FETCH_COLUMNS)
+        # Each refetch appends a row; the last one per activity is current
+        df = pd.read_csv(self.kudos_fetches_path, dtype={'fetched_at': str, 'kudos_count': 'Int64'})
+        return df.drop_duplicates(subset='activity_id', keep='last')
+
+    def load_kudos_fetches(self):
+        """The fetch log as ``{activity_id (str): {"fetched_at", "kudos_count"}}``"""
+        df = self._read_kudos_fetches()
+        return {str(int(activity_id)): {"fetched_at": fetched_at, "kudos_count": None if pd.isna(count) else int(count)}
+                for activity_id, fetched_at, count in zip(df['activity_id'], df['fetched_at'], df['kudos_count'])}
+
+    def compact_kudos_fetches(self):
+        """Rewrite kudos_fetches.csv with one row per activity"""
+        if os.path.exists(self.kudos_fetches_path):
+            _replace_csv(self._read_kudos_fetches(), self.kudos_fetches_path)
+
+    def kudos_counts(self, activity_ids):
+        """Stored kudos rows per activity in ``activity_ids``"""
+        return count_kudos(self.load_kudos(), activity_ids)
+
+    def stale_kudos_activities(self):
+        """None - KudosRefreshScheduler works the stale set out in pandas"""
+        return None
+
+class CsvStore(_FileStore):
+    """activities.csv and kudos.csv in the data directory (the original format)"""
+
+    name = "csv"
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.activities_path = os.path.join(data_dir, "activities.csv")
+        self.kudos_path = os.path.join(data_dir, "kudos.csv")
+
+    def has_activities(self):
+        return os.path.exists(self.activities_path)
+
+    def dataset_files(self):
+        return [self.activities_path, self.kudos_path, self.givers_path]
+
+    def load_activities(self, columns=None):
+        """All activities (or just ``columns``), duplicates merged, typed by the activity schema"""
+        if not os.path.exists(self.activities_path):
+            return pd.DataFrame()
+        # CSV loses dtypes - read them back from the schema rather than inferring them
+        usecols = project(pd.read_csv(self.activities_path, nrows=0).columns, columns)
+        df = pd.read_csv(self.activities_path, usecols=usecols, dtype=csv_dtypes(usecols))
+        # Refreshed rows are appended until the next compaction
+        return apply_activity_schema(merge_duplicate_activities(df))
+
+    def _read_activity_ids(self):
+        if os.path.exists(self.activities_path):
+            return set(pd.read_csv(self.activities_path, usecols=['id'])['id'].tolist())
+        return set()
+
+    def append_activities(self, df):
+        """Append activity rows without rewriting what is already stored"""
+        self._stored_ids(df)
+        if not os.path.exists(self.activities_path):
+            _replace_csv(df, self.activities_path)
+            return
+
+        header = pd.read_csv(self.activities_path, nrows=0).columns.tolist()
+        if any(column not in header for column in df.columns):
+            # New columns need a wider header, which means one full rewrite
+            combined = pd.concat([pd.read_csv(self.activities_path), df], ignore_index=True)
+            _replace_csv(combined, self.activities_path)
+            return
+
+        df.reindex(columns=header).to_csv(self.activities_path, mode='a', header=False, index=False)
+
+    def write_activities(self, df):
+        """Replace the whole activities dataset"""
+        _replace_csv(df, self.activities_path)
+        self._stored_ids(df, replace=True)
+
+    def compact_activities(self, merged=None):
+        """Rewrite activities.csv deduplicated and sorted newest first
+
+        ``merged`` is the current load_activities() result, if the caller
+        already has it.
+        """
+        df = self.load_activities() if merged is None else merged
+        if df.empty:
+            return df
+        df = _sort_newest_first(df)
+        self.write_activities(df)
+        return df
+
+    def load_kudos(self):
+        """Kudos rows, keeping only each activity's latest fetch"""
+        if not os.path.exists(self.kudos_path):
+            return pd.DataFrame()
+        # Only empty fields are missing; legacy name columns may hold a literal "NA"
+        df = pd.read_csv(self.kudos_path, keep_default_na=False, na_values=[''])
+        if df.empty or 'fetched_at' not in df.columns:
+            return df
+
+        # Rows written before fetched_at existed count as the oldest fetch
+        fetched_at = df['fetched_at'].fillna('')
+        latest = fetched_at.groupby(df['activity_id']).transform('max')
+        df = df[fetched_at == latest]
+        # Marker rows (no giver) record a fetch that found no kudos; files
+        # from before giver codes identify givers by athlete_id
+        giver = 'giver_code' if 'giver_code' in df.columns else 'athlete_id'
+        df = df[df[giver].notna()]
+        df = df.drop_duplicates(subset=['activity_id', giver])
+        return df.astype({giver: 'int64'}).reset_index(drop=True)
+
+    def kudos_columns(self):
+        if not os.path.exists(self.kudos_path):
+            return []
+        return pd.read_csv(self.kudos_path, nrows=0).columns.tolist()
+
+    def write_kudos(self, df):
+        """Replace the whole kudos dataset"""
+        _replace_csv(df, self.kudos_path)
+
+    def replace_kudos(self, activity_ids, kudos_df, fetched_at=None):
+        """Store ``kudos_df`` as the complete kudos of ``activity_ids``
+
+        Rows are appended with their ``fetched_at``; reads keep each
+        activity's latest fetch, so nothing already stored is rewritten.
+        Activities with no rows get a marker row so their older kudos stop
+        counting. compact_kudos() folds the history away.
+        """
+        fetched_at = fetched_at or pd.Timestamp.now(tz='UTC').isoformat()
+        kudos_df = kudos_df.assign(fetched_at=fetched_at)
+        emptied = set(int(i) for i in activity_ids) - set(kudos_df['activity_id'].astype(int))
+        if emptied:
+            markers = pd.DataFrame({'activity_id': sorted(emptied), 'fetched_at': fetched_at})
+            kudos_df = pd.concat([kudos_df, markers], ignore_index=True)
+        if kudos_df.empty:
+            return
+
+        if not os.path.exists(self.kudos_path):
+            _replace_csv(kudos_df, self.kudos_path)
+            return
+
+        header = pd.read_csv(self.kudos_path, nrows=0).columns.tolist()
+        if any(column not in header for column in kudos_df.columns):
+            # Files from before append-only writes need fetched_at added once
+            combined = pd.concat([pd.read_csv(self.kudos_path), kudos_df], ignore_index=True)
+            _replace_csv(combined, self.kudos_path)
+            return
+        kudos_df.reindex(columns=header).to_csv(self.kudos_path, mode='a', header=False, index=False)
+
+    def compact_kudos(self, merged=None):
+        """Rewrite kudos.csv with only each activity's latest fetch (``merged``, if already loaded)"""
+        if os.path.exists(self.kudos_path):
+            self.write_kudos(self.load_kudos() if merged is None else merged)
+        self.compact_kudos_fetches()
+
+    def remove(self):
+        """Move the dataset files aside after a migration"""
+        for path in (self.activities_path, self.kudos_path):
+            if os.path.exists(path):
+                os.replace(path, path + ".migrated")
+        self._ids = None
+
+class ParquetStore(_FileStore):
+    """Partitioned Parquet datasets under ``activities/`` and ``kudos/``
+
+    Activities are partitioned by start year (``activities/year=2024/``) and
+    every write adds a new part file, so storing a page never touches older
+    data. Reads concatenate the parts in write order and let later rows win,
+    like the CSV appends. Kudos parts record which activities they cover, so a
+    newer part replaces those activities' older rows without a rewrite.
+    Dtypes, including parsed timestamps, survive the round trip.
+    """
+
+    name = "parquet"
+
+    def __init__(self, data_dir):
+        if pq is None:
+            raise ImportError("Parquet storage needs pyarrow: pip install pyarrow")
+        self.data_dir = data_dir
+        self.activities_path = os.path.join(data_dir, "activities")
+        self.kudos_path = os.path.join(data_dir, "kudos")
+        self._sequence = 0
+
+    def _part_name(self):
+        # Part names sort in write order, which is what "later rows win" relies on
+        self._sequence += 1
+        return f"part-{time.time_ns():020d}-{os.getpid()}-{self._sequence:04d}.parquet"
+
+    def _write_part(self, directory, df, metadata=None):
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        path = os.path.join(directory, self._part_name())
+        # Written under a temp name so readers never pick up a partial part
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return path
+
+    @staticmethod
+    def _parts(directory):
+        paths = glob.glob(os.path.join(directory, "**", "part-*.parquet"), recursive=True)
+        return sorted(paths, key=os.path.basename)
+
+    def has_activities(self):
+        return bool(self._parts(self.activities_path))
+
+    def dataset_files(self):
+        return self._parts(self.activities_path) + self._parts(self.kudos_path) + [self.givers_path]
+
+    def _partitions(self, df):
+        if 'start_date_parsed' in df.columns:
+            dates = pd.to_datetime(df['start_date_parsed'], utc=True)
+        else:
+            dates = pd.to_datetime(df['start_date'], utc=True)
+        years = dates.dt.year.astype('Int64').astype(str).replace('<NA>', 'unknown')
+        return df.groupby(years.values, sort=False)
+
+    def load_activities(self, columns=None):
+        parts = self._parts(self.activities_path)
+        if not parts:
+            return pd.DataFrame()
+        frames = [pd.read_parquet(path, columns=None if columns is None else project(pq.read_schema(path).names,
+                                                                                      columns))
+                  for path in parts]
+        # Parts with different categories concatenate as objects; the schema casts them back
+        return apply_activity_schema(merge_duplicate_activities(pd.concat(frames, ignore_index=True)))
+
+    def _read_activity_ids(self):
+        return {activity_id for path in self._parts(self.activities_path)
+                for activity_id in pd.read_parquet(path, columns=['id'])['id'].tolist()}
+
+    def append_activities(self, df):
+        """Write each year's rows as a new part of that year's partition"""
+        self._stored_ids(df)
+        for year, year_df in self._partitions(df):
+            self._write_part(os.path.join(self.activities_path, f"year={year}"), year_df)
+
+    def write_activities(self, df):
+        """Replace the whole activities dataset"""
+        old_parts = self._parts(self.activities_path)
+        self.append_activities(df)
+        # The new parts sort after the old ones, so a crash here only leaves duplicates
+        for path in old_parts:
+            os.remove(path)
+        self._stored_ids(df, replace=True)
+
+    def compact_activities(self, merged=None):
+        """Merge each partition that has more than one part into a single file
+
+        Only partitions touched since the last compaction are rewritten, so
+        the cost follows recent writes rather than the whole history.
+        Returns ``merged`` (the caller's current load) or a fresh load.
+        """
+        by_partition = {}
+        for path in self._parts(self.activities_path):
+            by_partition.setdefault(os.path.dirname(path), []).append(path)
+
+        for directory, parts in by_partition.items():
+            if len(parts) < 2:
+                continue
+            df = pd.concat([pd.read_parquet(path) for path in parts], ignore_index=True)
+            df = _sort_newest_first(merge_duplicate_activities(df))
+            self._write_part(directory, df)
+            for path in parts:
+                os.remove(path)
+        return self.load_activities() if merged is None else merged
+
+    def _read_kudos_parts(self, parts):
+        """Kudos rows, keeping each activity's rows from the newest part covering it"""
+        frames = []
+        covered = set()
+        for path in reversed(parts):
+            table = pq.read_table(path)
+            part_activity_ids = set(json.loads((table.schema.metadata or {}).get(b"activity_ids", b"[]")))
+            df = table.to_pandas()
+            if covered and not df.empty:
+                df = df[~df['activity_id'].isin(covered)]
+            frames.append(df)
+            covered |= part_activity_ids | set(df['activity_id'].tolist() if not df.empty else [])
+        frames.reverse()
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def load_kudos(self):
+        parts = self._parts(self.kudos_path)
+        if not parts:
+            return pd.DataFrame()
+        return self._read_kudos_parts(parts)
+
+    def kudos_columns(self):
+        parts = self._parts(self.kudos_path)
+        return pq.read_schema(parts[0]).names if parts else []
+
+    def write_kudos(self, df):
+        """Replace the whole kudos dataset with a single part"""
+        old_parts = self._parts(self.kudos_path)
+        activity_ids = sorted({int(i) for i in df['activity_id']}) if not df.empty else []
+        self._write_part(self.kudos_path, df, {b"activity_ids": json.dumps(activity_ids).encode()})
+        for path in old_parts:
+            os.remove(path)
+
+    def replace_kudos(self, activity_ids, kudos_df, fetched_at=None):
+        """Append ``kudos_df`` as a part covering ``activity_ids``"""
+        kudos_df = kudos_df.drop_duplicates(subset=KUDOS_KEY)
+        covered = json.dumps(sorted(int(i) for i in activity_ids)).encode()
+        self._write_part(self.kudos_path, kudos_df, {b"activity_ids": covered})
+
+    def compact_kudos(self, merged=None):
+        """Fold all kudos parts into one"""
+        if len(self._parts(self.kudos_path)) > 1:
+            self.write_kudos(self.load_kudos() if merged is None else merged)
+        self.compact_kudos_fetches()
+
+    def remove(self):
+        """Move the dataset directories aside after a migration"""
+        for path in (self.activities_path, self.kudos_path):
+            if os.path.exists(path):
+                os.replace(path, path + ".migrated")
+        self._ids = None
+
+def _sql_type(series):
+    """SQLite column type for a DataFrame column; read back by SqliteStore._typed"""
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(series):
+        return "TIMESTAMP"
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    return {"boolean": "BOOLEAN", "integer": "INTEGER", "floating": "REAL",
+            "mixed-integer-float": "REAL", "datetime": "TIMESTAMP"}.get(inferred, "TEXT")
+
+def _sql_value(value):
+    if value is None or (not isinstance(value, (list, dict, str)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # numpy scalars -> Python
+        return value.item()
+    return value
+
+class SqliteStore:
+    """Activities and kudos as indexed tables in ``strava.sqlite``
+
+    Writes are ``INSERT ... ON CONFLICT`` upserts keyed on ``activities.id``
+    and ``kudos(activity_id, giver_code)``, so storing a page costs the page,
+    not the history. A column missing from an upsert (or NULL in it) keeps
+    its stored value, matching how the file stores merge refreshed rows.
+    Columns are added as new fields appear. Also keeps the kudos fetch log,
+    so the stale-kudos check is one indexed query.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, "strava.sqlite")
+        self.activities_path = self.path
+        self.kudos_path = self.path
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS activities (id INTEGER PRIMARY KEY)")
+            self._create_kudos_table()
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS givers (giver_code INTEGER PRIMARY KEY, firstname TEXT NOT NULL, "
+                "lastname TEXT NOT NULL, fullname TEXT NOT NULL, UNIQUE (firstname, lastname))")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS kudos_fetches (activity_id INTEGER PRIMARY KEY, fetched_at TEXT, "
+                "kudos_count INTEGER)")
+
+    def _create_kudos_table(self):
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS kudos (activity_id INTEGER NOT NULL, giver_code INTEGER NOT NULL, "
+            "PRIMARY KEY (activity_id, giver_code)) WITHOUT ROWID")
+
+    def _columns(self, table):
+        return {name: declared for _, name, declared, *_ in self.connection.execute(f"PRAGMA table_info({table})")}
+
+    def _ensure_columns(self, table, df):
+        existing = self._columns(table)
+        for column in df.columns:
+            if column not in existing:
+                self.connection.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" {_sql_type(df[column])}')
+        if table == "activities" and "start_date" in df.columns:
+            self.connection.execute("CREATE INDEX IF NOT EXISTS activities_start_date ON activities (start_date)")
+
+    def _upsert(self, table, df, key, coalesce=True):
+        if df.empty:
+            return
+        self._ensure_columns(table, df)
+        columns = list(df.columns)
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        updates = [c for c in columns if c not in key]
+        if updates and coalesce:
+            action = "DO UPDATE SET " + ", ".join(f'"{c}" = COALESCE(excluded."{c}", {table}."{c}")' for c in updates)
+        elif updates:
+            action = "DO UPDATE SET " + ", ".join(f'"{c}" = excluded."{c}"' for c in updates)
+        else:
+            action = "DO NOTHING"
+        sql = (f"INSERT INTO {table} ({quoted}) VALUES ({', '.join('?' * len(columns))}) "
+               f"ON CONFLICT ({', '.join(key)}) {action}")
+        rows = ([_sql_value(v) for v in row] for row in df.itertuples(index=False, name=None))
+        self.connection.executemany(sql, rows)
+
+    def _typed(self, table, df):
+        for column, declared in self._columns(table).items():
+            if column not in df.columns:
+                continue
+            if declared == "TIMESTAMP":
+                df[column] = pd.to_datetime(df[column], utc=True)
+            elif declared == "BOOLEAN":
+                df[column] = df[column].astype("boolean")
+        return df
+
+    def has_activities(self):
+        return self.count_activities() > 0
+
+    def fingerprint(self):
+        """Changes whenever the database file is written"""
+        return file_fingerprint([self.path])
+
+    def count_activities(self):
+        return self.connection.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+
+    def load_activities(self, columns=None):
+        if not self.has_activities():
+            return pd.DataFrame()
+        selected = ", ".join(f'"{column}"' for column in project(self._columns("activities"), columns))
+        df = pd.read_sql_query(f"SELECT {selected} FROM activities ORDER BY start_date DESC", self.connection)
+        return apply_activity_schema(self._typed("activities", df))
+
+    def load_activity_ids(self):
+        return {row[0] for row in self.connection.execute("SELECT id FROM activities")}
+
+    def known_activity_ids(self, activity_ids):
+        """The subset of ``activity_ids`` already stored (primary-key lookups)"""
+        ids = [int(i) for i in activity_ids]
+        if not ids:
+            return set()
+        sql = f"SELECT id FROM activities WHERE id IN ({', '.join('?' * len(ids))})"
+        return {row[0] for row in self.connection.execute(sql, ids)}
+
+    def append_activities(self, df):
+        with self.connection:
+            self._upsert("activities", df, ["id"])
+
+    def write_activities(self, df):
+        with self.connection:
+            self.connection.execute("DELETE FROM activities")
+            self._upsert("activities", df, ["id"])
+
+    def compact_activities(self, merged=None):
+        # Upserts never leave duplicates behind
+        return self.load_activities() if merged is None else merged
+
+    def load_kudos(self):
+        df = pd.read_sql_query("SELECT * FROM kudos", self.connection)
+        return df if not df.empty else pd.DataFrame()
+
+    def kudos_columns(self):
+        return list(self._columns("kudos"))
+
+    def write_kudos(self, df):
+        with self.connection:
+            if "giver_code" not in self._columns("kudos"):
+                # A kudos table keyed on athlete_id, from before giver codes
+                self.connection.execute("DROP TABLE kudos")
+                self._create_kudos_table()
+            self.connection.execute("DELETE FROM kudos")
+            self._upsert("kudos", df, KUDOS_KEY, coalesce=False)
+
+    def replace_kudos(self, activity_ids, kudos_df, fetched_at=None):
+        ids = [(int(i),) for i in activity_ids]
+        with self.connection:
+            self.connection.executemany("DELETE FROM kudos WHERE activity_id = ?", ids)
+            self._upsert("kudos", kudos_df, KUDOS_KEY, coalesce=False)
+
+    def kudos_counts(self, activity_ids):
+        """Stored kudos rows per activity in ``activity_ids``, counted by the primary-key index"""
+        ids = [int(i) for i in activity_ids]
+        counts = dict.fromkeys(ids, 0)
+        if ids:
+            sql = (f"SELECT activity_id, COUNT(*) FROM kudos WHERE activity_id IN ({', '.join('?' * len(ids))}) "
+                   "GROUP BY activity_id")
+            counts.update(self.connection.execute(sql, ids).fetchall())
+        return counts
+
+    def compact_kudos(self, merged=None):
+        # Rows are replaced in place; nothing accumulates
+        pass
+
+    def load_givers(self):
+        return pd.read_sql_query(f"SELECT {', '.join(GIVER_COLUMNS)} FROM givers ORDER BY giver_code",
+                                 self.connection)
+
+    def intern_givers(self, firstnames, lastnames):
+        """Stable integer codes for giver names, adding unseen givers to the givers table"""
+        names = list(zip(firstnames, lastnames))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO givers (firstname, lastname, fullname) VALUES (?, ?, ?) "
+                "ON CONFLICT (firstname, lastname) DO NOTHING",
+                [(first, last, f"{first} {last}".strip()) for first, last in dict.fromkeys(names)])
+        codes = {}
+        for first, last in dict.fromkeys(names):
+            codes[(first, last)] = self.connection.execute(
+                "SELECT giver_code FROM givers WHERE firstname = ? AND lastname = ?", (first, last)).fetchone()[0]
+        return [codes[name] for name in names]
+
+    def record_kudos_fetches(self, fetch_log):
+        """Mirror ``{activity_id: {"fetched_at", "kudos_count"}}`` for stale_kudos_activities"""
+        rows = [(int(activity_id), entry.get("fetched_at"), entry.get("kudos_count"))
+                for activity_id, entry in fetch_log.items()]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO kudos_fetches (activity_id, fetched_at, kudos_count) VALUES (?, ?, ?) "
+                "ON CONFLICT (activity_id) DO UPDATE SET fetched_at = excluded.fetched_at, "
+                "kudos_count = excluded.kudos_count", rows)
+
+    def load_kudos_fetches(self):
+        """The fetch log as ``{activity_id (str): {"fetched_at", "kudos_count"}}``"""
+        rows = self.connection.execute("SELECT activity_id, fetched_at, kudos_count FROM kudos_fetches")
+        return {str(activity_id): {"fetched_at": fetched_at, "kudos_count": kudos_count}
+                for activity_id, fetched_at, kudos_count in rows}
+
+    def stale_kudos_activities(self):
+        """Activities whose kudos_count is ahead of their stored kudos, in one query
+
+        Same rule as KudosRefreshScheduler.stale_activities: activities
+        already fetched at their current kudos_count are left out.
+        """
+        if "kudos_count" not in self._columns("activities"):
+            return pd.DataFrame(columns=['id', 'kudos_count', 'start_date', 'stored_kudos', 'missing_kudos',
+                                         'last_fetched'])
+        df = pd.read_sql_query(
+            "SELECT a.id, a.kudos_count, a.start_date, "
+            "       COUNT(k.giver_code) AS stored_kudos, "
+            "       a.kudos_count - COUNT(k.giver_code) AS missing_kudos, "
+            "       f.fetched_at AS last_fetched "
+            "FROM activities a "
+            "LEFT JOIN kudos k ON k.activity_id = a.id "
+            "LEFT JOIN kudos_fetches f ON f.activity_id = a.id "
+            "WHERE a.kudos_count > 0 AND (f.kudos_count IS NULL OR a.kudos_count > f.kudos_count) "
+            "GROUP BY a.id "
+            "HAVING a.kudos_count > COUNT(k.giver_code)",
+            self.connection)
+        df['last_fetched'] = pd.to_datetime(df['last_fetched'], utc=True)
+        return df
+
+    def remove(self):
+        self.connection.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, self.path + ".migrated")
+
+STORAGE_BACKENDS = {
+    CsvStore.name: CsvStore,
+    ParquetStore.name: ParquetStore,
+    SqliteStore.name: SqliteStore,
+}
+
+def configured_storage(data_dir):
+    """Backend name recorded in the data directory's collection metadata"""
+    metadata_file = os.path.join(data_dir, METADATA_FILE_NAME)
+    if os.path.exists(metadata_file):
+        with open(metadata_file, 'r') as f:
+            return json.load(f).get("storage", DEFAULT_STORAGE)
+    return DEFAULT_STORAGE
+
+def open_store(data_dir, backend=None):
+    """Store for ``data_dir`` using ``backend`` or the one it was collected with"""
+    backend = backend or configured_storage(data_dir)
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r} (choose from {', '.join(STORAGE_BACKENDS)})")
+    return STORAGE_BACKENDS[backend](data_dir)
+
+def encode_kudos(store, kudos_df):
+    """(activity_id, giver_code) pairs for kudos rows that name their givers"""
+    if kudos_df.empty:
+        return pd.DataFrame({'activity_id': pd.Series(dtype='int64'), 'giver_code': pd.Series(dtype='int64')})
+    codes = store.intern_givers(kudos_df['athlete_firstname'].fillna('').astype(str),
+                                kudos_df['athlete_lastname'].fillna('').astype(str))
+    encoded = pd.DataFrame({'activity_id': kudos_df['activity_id'].astype('int64').values,
+                            'giver_code': pd.array(codes, dtype='int64')})
+    return encoded.drop_duplicates().reset_index(drop=True)
+
+def upgrade_kudos_givers(store):
+    """Re-encode kudos stored with giver names as (activity_id, giver_code) pairs
+
+    Kudos collected before the givers table carry a per-process
+    ``hash(fullname)`` athlete_id and the names on every row. Their names are
+    interned once and the kudos rewritten. Returns the number of kudos rows
+    converted, 0 when the store is already encoded.
+    """
+    columns = store.kudos_columns()
+    if not columns or 'giver_code' in columns:
+        return 0
+    kudos_df = store.load_kudos()
+    store.write_kudos(encode_kudos(store, kudos_df))
+    return len(kudos_df)
+
+def migrate_store(source, target):
+    """Copy every activity and kudos row, and the kudos fetch log, from one store to another
+
+    The source files are moved aside (``*.migrated``) only after the target
+    has been written. Returns (activities, kudos) row counts.
+    """
+    activities_df = source.load_activities()
+    kudos_df = source.load_kudos()
+    givers_df = source.load_givers()
+    if not givers_df.empty:
+        # Codes are assigned in order, so interning in code order keeps them
+        givers_df = givers_df.sort_values('giver_code')
+        target.intern_givers(givers_df['firstname'], givers_df['lastname'])
+    if not activities_df.empty:
+        target.write_activities(_sort_newest_first(activities_df))
+    if not kudos_df.empty:
+        target.write_kudos(kudos_df)
+    # File stores in one directory share kudos_fetches.csv, like givers.csv
+    if getattr(source, 'kudos_fetches_path', None) != getattr(target, 'kudos_fetches_path', None):
+        target.record_kudos_fetches(source.load_kudos_fetches())
+    source.remove()
+    return len(activities_df), len(kudos_df)
+
+# Appended activity rows CachedStore queues before merging them into its cached frame
+MAX_PENDING_ACTIVITY_ROWS = 1000
+
+class CachedStore:
+    """A store whose loaded activities and kudos stay in memory between loads
+
+    Entries are keyed by the store's fingerprint (mtime and size of its
+    files). Writes made through this wrapper keep the cached frames current
+    and re-stamp them with the new fingerprint, so one run parses each
+    dataset at most once. A write by anything else changes the fingerprint
+    and the next load parses again. Activities are cached as loaded: a
+    projection is read as a projection, and serves later loads of the same
+    or fewer columns. Appended activity pages are queued and merged into the
+    cached frame in one pass, on the next load or once
+    MAX_PENDING_ACTIVITY_ROWS have queued up, so a long sync holds at most
+    that many rows beyond the cached frame. ``hits`` and ``misses`` count loads
+    per dataset. Everything else is the wrapped store's.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._frames = {}
+        self._fingerprints = {}
+        # Columns the cached activities were loaded with (None: all of them)
+        self._activity_columns = None
+        # Activity pages appended since the cached frame was last merged
+        self._pending_activities = []
+        self._pending_rows = 0
+        self.hits = {"activities": 0, "kudos": 0}
+        self.misses = {"activities": 0, "kudos": 0}
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def _drop(self, name):
+        self._frames.pop(name, None)
+        if name == "activities":
+            self._pending_activities = []
+            self._pending_rows = 0
+
+    def _is_current(self, name, fingerprint):
+        return name in self._frames and self._fingerprints[name] == fingerprint
+
+    def _load(self, name, loader):
+        fingerprint = self.store.fingerprint()
+        if self._is_current(name, fingerprint):
+            self.hits[name] += 1
+        else:
+            self.misses[name] += 1
+            self._frames[name] = loader()
+            self._fingerprints[name] = fingerprint
+        # Shallow copy: callers adding columns don't change the cached frame
+        return self._frames[name].copy(deep=False)
+
+    def _covers(self, columns):
+        """Whether the cached activities hold every column of a load of ``columns``"""
+        if self._activity_columns is None:
+            return True
+        return columns is not None and set(columns) <= self._activity_columns
+
+    def _merged_activities(self):
+        """The cached activities with the queued pages merged in, as a fresh load would"""
+        df = self._frames["activities"]
+        if self._pending_activities:
+            pages = self._pending_activities
+            if self._activity_columns is not None:
+                pages = [page[project(page.columns, self._activity_columns)] for page in pages]
+            combined = pd.concat([df, *pages], ignore_index=True)
+            df = self._frames["activities"] = apply_activity_schema(merge_duplicate_activities(combined))
+            self._pending_activities = []
+            self._pending_rows = 0
+        return df
+
+    def load_activities(self, columns=None):
+        """Activities (or just ``columns``), parsed once and then served from memory"""
+        fingerprint = self.store.fingerprint()
+        current = self._is_current("activities", fingerprint)
+        if current and self._covers(columns):
+            self.hits["activities"] += 1
+            df = self._merged_activities()
+        else:
+            self.misses["activities"] += 1
+            load = columns
+            if current and columns is not None:
+                # Widen the cached projection rather than swap one for another
+                load = sorted(self._activity_columns | set(columns))
+            self._drop("activities")
+            df = self._frames["activities"] = self.store.load_activities(load)
+            self._fingerprints["activities"] = fingerprint
+            # project() adds the key columns, and columns not stored yet can't be in a fresh load either
+            self._activity_columns = None if load is None else set(load) | set(df.columns) | set(KEY_COLUMNS)
+        df = df.copy(deep=False)
+        return df if columns is None else df[project(df.columns, columns)]
+
+    def load_kudos(self):
+        return self._load("kudos", self.store.load_kudos)
+
+    @contextmanager
+    def _writing(self):
+        """Around a write: yields the names still current, re-stamped afterwards
+
+        The body updates those frames to match what it wrote (or adds names
+        whose full content it knows); stale frames are dropped.
+        """
+        fingerprint = self.store.fingerprint()
+        current = {name for name in self._frames if self._fingerprints[name] == fingerprint}
+        for name in set(self._frames) - current:
+            self._drop(name)
+        yield current
+        fingerprint = self.store.fingerprint()
+        for name in current:
+            if name in self._frames:
+                self._fingerprints[name] = fingerprint
+
+    def append_activities(self, df):
+        with self._writing() as current:
+            self.store.append_activities(df)
+            if "activities" in current:
+                self._pending_activities.append(df)
+                self._pending_rows += len(df)
+                if self._pending_rows >= MAX_PENDING_ACTIVITY_ROWS:
+                    self._merged_activities()
+
+    def compact_activities(self):
+        with self._writing() as current:
+            # Only a frame of every column can stand in for a fresh load
+            merged = self._merged_activities() if "activities" in current and self._activity_columns is None else None
+            df = self.store.compact_activities(merged)
+            self._drop("activities")
+            self._frames["activities"] = df
+            self._activity_columns = None
+            current.add("activities")
+        return df.copy(deep=False)
+
+    def write_activities(self, df):
+        with self._writing() as current:
+            self.store.write_activities(df)
+            self._drop("activities")
+            current.discard("activities")
+
+    def replace_kudos(self, activity_ids, kudos_df, fetched_at=None):
+        with self._writing() as current:
+            self.store.replace_kudos(activity_ids, kudos_df, fetched_at)
+            if "kudos" in current:
+                kudos = self._frames["kudos"]
+                if not kudos.empty:
+                    kudos = kudos[~kudos['activity_id'].isin([int(i) for i in activity_ids])]
+                self._frames["kudos"] = pd.concat([kudos, kudos_df.drop_duplicates(subset=KUDOS_KEY)],
+                                                  ignore_index=True)
+
+    def write_kudos(self, df):
+        with self._writing() as current:
+            self.store.write_kudos(df)
+            self._drop("kudos")
+            current.discard("kudos")
+
+    # Writes that leave the loaded activities and kudos as they were
+
+    def compact_kudos(self):
+        with self._writing():
+            self.store.compact_kudos(self._frames.get("kudos"))
+
+    def intern_givers(self, firstnames, lastnames):
+        with self._writing():
+            return self.store.intern_givers(firstnames, lastnames)
+
+    def record_kudos_fetches(self, fetch_log):
+        with self._writing():
+            self.store.record_kudos_fetches(fetch_log)
+
+    def kudos_counts(self, activity_ids):
+        if isinstance(self.store, _FileStore):
+            # Counted from the cached kudos rather than a second parse
+            return count_kudos(self.load_kudos(), activity_ids)
+        return self.store.kudos_counts(activity_ids)
+
+    def describe_cache(self):
+        """One line of hit/miss counts, e.g. for the end of a run"""
+        return ", ".join(f"{name} parsed {self.misses[name]}x ({self.hits[name]} cache hits)" for name in self.hits)
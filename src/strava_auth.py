@@ -7,12 +7,20 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_OAUTH_URL = "https://www.strava.com/oauth"
+
 class StravaAuth:
-    def __init__(self):
-        self.client_id = os.getenv('STRAVA_CLIENT_ID')
-        self.client_secret = os.getenv('STRAVA_CLIENT_SECRET')
-        self.access_token = os.getenv('STRAVA_ACCESS_TOKEN')
-        self.refresh_token = os.getenv('STRAVA_REFRESH_TOKEN')
+    def __init__(self, session=None, client_id=None, client_secret=None, access_token=None, refresh_token=None,
+                 oauth_url=None):
+        # Anything with requests' post() interface - a pooled Session in practice
+        self.http = session or requests
+        # Explicit credentials (e.g. one athlete of a club) take precedence over .env
+        self.client_id = client_id or os.getenv('STRAVA_CLIENT_ID')
+        self.client_secret = client_secret or os.getenv('STRAVA_CLIENT_SECRET')
+        self.access_token = access_token or os.getenv('STRAVA_ACCESS_TOKEN')
+        self.refresh_token = refresh_token or os.getenv('STRAVA_REFRESH_TOKEN')
+        # STRAVA_OAUTH_URL points token calls at a local stand-in
+        self.oauth_url = (oauth_url or os.getenv('STRAVA_OAUTH_URL') or DEFAULT_OAUTH_URL).rstrip('/')
         
         if not all([self.client_id, self.client_secret]):
             raise ValueError("Please set STRAVA_CLIENT_ID and STRAVA_CLIENT_SECRET in your .env file")
@@ -23,7 +31,7 @@ class StravaAuth:
         redirect_uri = "http://localhost"  # This will fail but show the code in URL
         
         auth_url = (
-            f"https://www.strava.com/oauth/authorize?"
+            f"{self.oauth_url}/authorize?"
             f"client_id={self.client_id}&"
             f"response_type=code&"
             f"redirect_uri={redirect_uri}&"
@@ -33,7 +41,7 @@ class StravaAuth:
     
     def exchange_code_for_token(self, authorization_code):
         """Exchange authorization code for access token"""
-        token_url = "https://www.strava.com/oauth/token"
+        token_url = f"{self.oauth_url}/token"
         
         data = {
             'client_id': self.client_id,
@@ -42,7 +50,7 @@ class StravaAuth:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         response.raise_for_status()
         
         token_data = response.json()
@@ -53,7 +61,7 @@ class StravaAuth:
         if not self.refresh_token:
             raise ValueError("No refresh token available")
         
-        token_url = "https://www.strava.com/oauth/token"
+        token_url = f"{self.oauth_url}/token"
         
         data = {
             'client_id': self.client_id,
@@ -62,7 +70,7 @@ class StravaAuth:
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         response.raise_for_status()
         
         token_data = response.json()
@@ -5,268 +5,597 @@ import requests
 import pandas as pd
 import time
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.strava_auth import StravaAuth
+from src.http_session import create_session, DEFAULT_POOL_SIZE, DEFAULT_MAX_RETRIES
+from src.token_manager import TokenManager
+from src.schema import apply_activity_schema
+
+DEFAULT_BASE_URL = "https://www.strava.com/api/v3"
+
+# Largest page size the Strava API accepts, used for every paged endpoint
+ACTIVITIES_PAGE_SIZE = 200
+KUDOS_PAGE_SIZE = 200
+
+# Statuses that will not change on retry: private (403) or deleted (404) activities
+PERMANENT_HTTP_ERRORS = frozenset([403, 404])
+
+# Activity listing fields stored in the dataset, with defaults for missing keys
+ACTIVITY_FIELDS = [
+    ('id', None),
+    ('name', None),
+    ('type', None),
+    ('sport_type', None),
+    ('start_date', None),
+    ('distance', None),
+    ('moving_time', None),
+    ('elapsed_time', None),
+    ('total_elevation_gain', None),
+    ('kudos_count', 0),
+    ('comment_count', 0),
+    ('athlete_count', 0),
+    ('photo_count', 0),
+    ('total_photo_count', 0),
+    ('average_speed', None),
+    ('max_speed', None),
+    ('average_heartrate', None),
+    ('max_heartrate', None),
+    ('pr_count', 0),
+    ('achievement_count', 0),
+    ('visibility', None),
+    ('commute', False),
+    ('manual', False),
+    ('private', False),
+    ('flagged', False),
+]
+
+class RateBudgetExhausted(Exception):
+    """Raised by a rate limiter with a hard cap (e.g. one athlete's share) instead of waiting"""
+    
+    # What a batch fetched before the budget ran out, attached by fetch_detailed_activities
+    details = ()
+
+
+class _RateWindow:
+    """Request budget for one Strava rate-limit window"""
+    
+    def __init__(self, name, seconds, limit):
+        self.name = name
+        self.seconds = seconds
+        self.limit = limit
+        self.used = 0
+        self.window_start = None
+    
+    def roll(self, now):
+        """Refill the bucket when a window boundary has passed"""
+        start = now - (now % self.seconds)
+        if start != self.window_start:
+            self.window_start = start
+            self.used = 0
+    
+    def remaining(self):
+        return max(self.limit - self.used, 0)
+    
+    def resets_at(self):
+        return self.window_start + self.seconds
+
+
+class RateLimiter:
+    """Token buckets for Strava's 15-minute and daily request windows
+    
+    Windows refill on the boundaries Strava uses (quarter hours and midnight
+    UTC). Usage is counted locally and re-synchronised from the
+    X-RateLimit-Limit / X-RateLimit-Usage headers on every response, so
+    callers only sleep when the budget is actually spent. Safe to share
+    between worker threads.
+    """
+    
+    def __init__(self, short_limit=100, daily_limit=1000, clock=time.time, sleep=time.sleep):
+        self.short = _RateWindow("15-minute", 15 * 60, short_limit)
+        self.daily = _RateWindow("daily", 24 * 60 * 60, daily_limit)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+    
+    @property
+    def windows(self):
+        return (self.short, self.daily)
+    
+    def acquire(self):
+        """Take one request from both buckets, sleeping until a boundary if empty"""
+        while True:
+            with self._lock:
+                now = self.clock()
+                for window in self.windows:
+                    window.roll(now)
+                
+                exhausted = [w for w in self.windows if w.remaining() == 0]
+                if not exhausted:
+                    for window in self.windows:
+                        window.used += 1
+                    return
+                
+                wait_until = max(w.resets_at() for w in exhausted)
+            
+            # A second of slack so we land safely inside the new window
+            wait = max(wait_until - now, 0) + 1
+            names = ", ".join(w.name for w in exhausted)
+            print(f"Rate limit budget spent ({names}). Waiting {wait:.0f}s for the window to reset...")
+            self.sleep(wait)
+    
+    def update_from_headers(self, headers):
+        """Synchronise limits and usage with Strava's rate-limit headers"""
+        limits = self._parse_header(headers.get('X-RateLimit-Limit'))
+        usage = self._parse_header(headers.get('X-RateLimit-Usage'))
+        
+        with self._lock:
+            now = self.clock()
+            for i, window in enumerate(self.windows):
+                window.roll(now)
+                if limits and i < len(limits):
+                    window.limit = limits[i]
+                if usage and i < len(usage):
+                    # Usage only grows within a window; other clients may have spent some
+                    window.used = max(window.used, usage[i])
+    
+    def record_rate_limited(self, headers):
+        """Handle a 429 so the next acquire waits for the right boundary"""
+        self.update_from_headers(headers)
+        with self._lock:
+            if all(w.remaining() > 0 for w in self.windows):
+                # No usable headers - assume the short window is spent
+                self.short.used = self.short.limit
+    
+    def snapshot(self):
+        """Current limits and usage, for persisting between runs"""
+        with self._lock:
+            now = self.clock()
+            for window in self.windows:
+                window.roll(now)
+            return {
+                "observed_at": now,
+                "short_limit": self.short.limit,
+                "short_used": self.short.used,
+                "daily_limit": self.daily.limit,
+                "daily_used": self.daily.used
+            }
+    
+    def restore(self, snapshot):
+        """Resume usage from a snapshot taken earlier in the same windows"""
+        with self._lock:
+            now = self.clock()
+            for prefix, window in (("short", self.short), ("daily", self.daily)):
+                window.roll(now)
+                window.limit = snapshot.get(f"{prefix}_limit", window.limit)
+                observed_at = snapshot.get("observed_at", 0)
+                if observed_at - (observed_at % window.seconds) == window.window_start:
+                    window.used = max(window.used, snapshot.get(f"{prefix}_used", 0))
+    
+    def remaining(self):
+        """Requests left in each window right now"""
+        with self._lock:
+            now = self.clock()
+            for window in self.windows:
+                window.roll(now)
+            return {"short": self.short.remaining(), "daily": self.daily.remaining()}
+    
+    @staticmethod
+    def _parse_header(value):
+        if not value:
+            return None
+        try:
+            return [int(part.strip()) for part in value.split(',')]
+        except ValueError:
+            return None
+
 
 class StravaDataFetcher:
-    def __init__(self):
-        self.auth = StravaAuth()
-        self.base_url = "https://www.strava.com/api/v3"
+    def __init__(self, rate_limiter=None, session=None, pool_size=DEFAULT_POOL_SIZE,
+                 max_retries=DEFAULT_MAX_RETRIES, cache=None, token_manager=None, auth=None, base_url=None,
+                 athlete_id=None):
+        # One keep-alive session for every API and token call
+        self.session = session or create_session(pool_size=pool_size, max_retries=max_retries)
+        self.auth = auth or StravaAuth(session=self.session)
+        # Refreshes proactively before expiry and persists tokens outside .env
+        self.token_manager = token_manager or TokenManager(self.auth)
+        # STRAVA_API_BASE_URL points the fetcher at a local stand-in
+        self.base_url = (base_url or os.getenv('STRAVA_API_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        if rate_limiter is None:
+            # Strava's limits are per application, so every fetcher on the host draws from one budget.
+            # Imported here because SharedRateLimiter builds on RateLimiter below
+            from src.shared_rate_limiter import SharedRateLimiter
+            rate_limiter = SharedRateLimiter()
+        self.rate_limiter = rate_limiter
+        # Optional ResponseCache; None always hits the live API
+        self.cache = cache
+        # Scopes cached responses to the token's athlete; looked up on first use if not given
+        self.athlete_id = athlete_id
+        self._athlete_lock = threading.Lock()
     
     def refresh_and_update_token(self):
-        """Refresh access token and update .env file"""
+        """Refresh the access token now and save it to the token store"""
         try:
-            token_data = self.auth.refresh_access_token()
-            
-            # Update .env file
-            env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-            with open(env_path, 'r') as f:
-                lines = f.readlines()
-            
-            with open(env_path, 'w') as f:
-                for line in lines:
-                    if line.startswith('STRAVA_ACCESS_TOKEN='):
-                        f.write(f'STRAVA_ACCESS_TOKEN={token_data["access_token"]}\n')
-                    elif line.startswith('STRAVA_REFRESH_TOKEN='):
-                        f.write(f'STRAVA_REFRESH_TOKEN={token_data["refresh_token"]}\n')
-                    else:
-                        f.write(line)
-            
-            print("Token refreshed and .env updated")
+            self.token_manager.refresh()
         except Exception as e:
             print(f"Token refresh failed: {e}")
             raise
         
-    def get_athlete_activities(self, per_page=50, page=1):
-        """Fetch athlete activities"""
+    def _request(self, url, params=None, headers=None):
+        """GET ``url`` inside the rate budget, refreshing the token once on 401"""
+        self.rate_limiter.acquire()
+        token = self.token_manager.access_token()
+        response = self.session.get(url, headers={**self.auth.get_headers(), **(headers or {})}, params=params)
+        self.rate_limiter.update_from_headers(response.headers)
+        
+        # Handle token expiry; concurrent 401s share one refresh
+        if response.status_code == 401:
+            print("Token rejected, refreshing...")
+            self.token_manager.refresh(stale_token=token)
+            self.rate_limiter.acquire()
+            response = self.session.get(url, headers={**self.auth.get_headers(), **(headers or {})}, params=params)
+            self.rate_limiter.update_from_headers(response.headers)
+        
+        if response.status_code == 429:
+            self.rate_limiter.record_rate_limited(response.headers)
+        
+        return response
+    
+    def cache_athlete_id(self):
+        """ID of the athlete whose token this fetcher uses, fetched once (uncached)"""
+        with self._athlete_lock:
+            if self.athlete_id is None:
+                response = self._request(f"{self.base_url}/athlete")
+                response.raise_for_status()
+                self.athlete_id = response.json()['id']
+            return self.athlete_id
+    
+    def _get_json(self, url, params=None):
+        """GET a JSON resource, served from or revalidated against the cache if configured"""
+        athlete_id = self.cache_athlete_id() if self.cache else None
+        entry = self.cache.get(url, params, athlete_id=athlete_id) if self.cache else None
+        if entry is not None and self.cache.is_fresh(entry):
+            return entry['body']
+        
+        conditional = {'If-None-Match': entry['etag']} if entry and entry.get('etag') else None
+        response = self._request(url, params=params, headers=conditional)
+        
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated(entry)
+            return entry['body']
+        
+        response.raise_for_status()
+        body = response.json()
+        if self.cache:
+            self.cache.put(url, params, body, etag=response.headers.get('ETag'), athlete_id=athlete_id)
+        return body
+    
+    def get_athlete_activities(self, per_page=ACTIVITIES_PAGE_SIZE, page=1, after=None, before=None):
+        """Fetch athlete activities, optionally bounded by epoch timestamps"""
         url = f"{self.base_url}/athlete/activities"
-        headers = self.auth.get_headers()
         
         params = {
             'per_page': per_page,
             'page': page
         }
+        if after is not None:
+            params['after'] = int(after)
+        if before is not None:
+            params['before'] = int(before)
         
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Handle token expiry
-        if response.status_code == 401:
-            print("Token expired, refreshing...")
-            self.refresh_and_update_token()
-            headers = self.auth.get_headers()
-            response = requests.get(url, headers=headers, params=params)
+        return self._get_json(url, params=params)
+    
+    def estimate_activity_total(self):
+        """Approximate lifetime activity count from athlete stats (costs 2 requests)
         
-        response.raise_for_status()
-        return response.json()
+        Strava only reports ride, run and swim totals, so other sport types
+        are not counted.
+        """
+        athlete = self._get_json(f"{self.base_url}/athlete")
+        stats = self._get_json(f"{self.base_url}/athletes/{athlete['id']}/stats")
+        return sum((stats.get(key) or {}).get('count', 0)
+                   for key in ('all_ride_totals', 'all_run_totals', 'all_swim_totals'))
     
     def get_activity_details(self, activity_id):
         """Get detailed information about a specific activity"""
         url = f"{self.base_url}/activities/{activity_id}"
-        headers = self.auth.get_headers()
         
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        return response.json()
+        return self._get_json(url)
     
-    def get_activity_kudos(self, activity_id):
-        """Get list of athletes who gave kudos to an activity"""
-        url = f"{self.base_url}/activities/{activity_id}/kudos"
-        headers = self.auth.get_headers()
+    def get_activity_kudos(self, activity_id, expected_count=None):
+        """Get list of athletes who gave kudos to an activity
         
-        response = requests.get(url, headers=headers)
+        Pages through the endpoint with the largest page size. When the
+        listing's ``kudos_count`` is passed as ``expected_count`` the call is
+        skipped for zero and paging stops once that many have been received.
+        """
+        if expected_count == 0:
+            return []
         
-        # Handle token expiry
-        if response.status_code == 401:
-            print("Token expired, refreshing...")
-            self.refresh_and_update_token()
-            headers = self.auth.get_headers()
-            response = requests.get(url, headers=headers)
-        
-        print(f"Kudos API call for activity {activity_id}: Status {response.status_code}")
-        
-        if response.status_code == 200:
-            kudos_data = response.json()
-            print(f"  -> Got {len(kudos_data)} kudos")
-            if kudos_data and len(kudos_data) > 0:
-                print(f"  -> Sample kudos data keys: {list(kudos_data[0].keys()) if kudos_data else 'No data'}")
-            return kudos_data
-        else:
-            print(f"  -> Error: {response.text}")
-            response.raise_for_status()
+        url = f"{self.base_url}/activities/{activity_id}/kudos"
+        kudos_data = []
+        page = 1
+        
+        while True:
+            params = {'page': page, 'per_page': KUDOS_PAGE_SIZE}
+            try:
+                page_data = self._get_json(url, params=params)
+            except requests.exceptions.HTTPError as e:
+                print(f"Kudos API call for activity {activity_id} (page {page}): Status {e.response.status_code}")
+                print(f"  -> Error: {e.response.text}")
+                raise
+            
+            kudos_data.extend(page_data)
+            
+            if len(page_data) < KUDOS_PAGE_SIZE:
+                break
+            if expected_count is not None and len(kudos_data) >= expected_count:
+                break
+            page += 1
         
-        return []
+        print(f"Kudos API call for activity {activity_id}: got {len(kudos_data)} kudos in {page} page(s)")
+        if kudos_data:
+            print(f"  -> Sample kudos data keys: {list(kudos_data[0].keys())}")
+        return kudos_data
     
-    def fetch_all_activities(self, max_activities=None):
-        """Fetch all activities with rate limiting"""
-        all_activities = []
+    def iter_activity_pages(self, max_activities=None, after=None, before=None, per_page=ACTIVITIES_PAGE_SIZE):
+        """Yield pages of activities as they arrive
+        
+        Lets callers convert and persist each page before the next is
+        requested, so memory stays bounded by the page size.
+        """
         page = 1
+        fetched = 0
         
-        print("Fetching activities...")
+        if after is not None:
+            print(f"Fetching activities after {datetime.fromtimestamp(after, timezone.utc).isoformat()}...")
+        elif before is not None:
+            print(f"Fetching activities before {datetime.fromtimestamp(before, timezone.utc).isoformat()}...")
+        else:
+            print("Fetching activities...")
         
         while True:
             try:
-                activities = self.get_athlete_activities(per_page=50, page=page)
-                
-                if not activities:
-                    break
-                
-                all_activities.extend(activities)
-                print(f"Fetched page {page}, total activities: {len(all_activities)}")
-                
-                if max_activities and len(all_activities) >= max_activities:
-                    all_activities = all_activities[:max_activities]
-                    break
-                
-                page += 1
-                time.sleep(0.5)  # Rate limiting
-                
+                activities = self.get_athlete_activities(per_page=per_page, page=page, after=after, before=before)
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:
-                    print("Rate limited. Waiting 15 minutes...")
-                    time.sleep(900)  # Wait 15 minutes
+                    # The rate limiter waits for the window reset before the retry
+                    print("Rate limited. Retrying once the window resets...")
                     continue
-                else:
-                    raise
+                raise
+            
+            if not activities:
+                return
+            
+            if max_activities:
+                activities = activities[:max_activities - fetched]
+            fetched += len(activities)
+            print(f"Fetched page {page}, total activities: {fetched}")
+            
+            yield activities
+            
+            if max_activities and fetched >= max_activities:
+                return
+            
+            # A short page is the last one - skip the empty follow-up request
+            if len(activities) < per_page:
+                return
+            
+            page += 1
+    
+    def fetch_all_activities(self, max_activities=None, after=None):
+        """Fetch all activities with rate limiting
         
+        When ``after`` (epoch seconds) is given only activities starting after
+        that time are listed, so an incremental sync costs a page or two.
+        """
+        all_activities = []
+        for activities in self.iter_activity_pages(max_activities=max_activities, after=after):
+            all_activities.extend(activities)
         return all_activities
     
-    def fetch_detailed_activities(self, activity_ids):
-        """Fetch detailed data for specific activities"""
-        detailed_activities = []
+    def _fetch_activity_detail(self, activity_id, max_attempts=3):
+        """Fetch one activity's details, retrying after rate-limit waits
         
-        for i, activity_id in enumerate(activity_ids):
+        Returns ``(detail, None)``, or ``(None, status)`` where status is the
+        HTTP status of a permanent failure and None for transient ones.
+        """
+        for attempt in range(max_attempts):
             try:
-                detail = self.get_activity_details(activity_id)
-                detailed_activities.append(detail)
-                
-                if (i + 1) % 10 == 0:
-                    print(f"Fetched details for {i + 1}/{len(activity_ids)} activities")
-                
-                time.sleep(0.5)  # Rate limiting
-                
+                return self.get_activity_details(activity_id), None
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:
-                    print("Rate limited. Waiting 15 minutes...")
-                    time.sleep(900)
+                    # The rate limiter waits for the window reset before the retry
+                    print(f"Rate limited fetching activity {activity_id}, retrying once the window resets...")
                     continue
-                else:
-                    print(f"Error fetching activity {activity_id}: {e}")
+                print(f"Error fetching activity {activity_id}: {e}")
+                status = e.response.status_code
+                return None, status if status in PERMANENT_HTTP_ERRORS else None
+            except requests.exceptions.RequestException as e:
+                print(f"Error fetching activity {activity_id}: {e}")
+                return None, None
+        
+        print(f"Giving up on activity {activity_id} after {max_attempts} rate-limited attempts")
+        return None, None
+    
+    def fetch_detailed_activities(self, activity_ids, concurrency=1, on_activity_failed=None):
+        """Fetch detailed data for specific activities
+        
+        Uses a pool of ``concurrency`` workers sharing the rate limiter.
+        Activities that could not be fetched are left out of the result.
+        ``on_activity_failed(activity_id, status)`` is called from the calling
+        thread for each activity that failed permanently (403 or 404), so
+        callers can stop requesting it. If a capped budget runs out part way,
+        RateBudgetExhausted is raised once the other workers finish, carrying
+        the details already fetched in ``details``.
+        """
+        detailed_activities = []
+        exhausted = None
+        
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(self._fetch_activity_detail, activity_id) for activity_id in activity_ids]
+            for i, (activity_id, future) in enumerate(zip(activity_ids, futures)):
+                try:
+                    detail, failed_status = future.result()
+                except RateBudgetExhausted as e:
+                    # Other workers' requests are already paid for - keep collecting them
+                    exhausted = e
                     continue
+                if detail is not None:
+                    detailed_activities.append(detail)
+                elif failed_status is not None and on_activity_failed:
+                    on_activity_failed(activity_id, failed_status)
+                
+                if (i + 1) % 10 == 0:
+                    print(f"Fetched details for {i + 1}/{len(activity_ids)} activities")
         
+        if exhausted is not None:
+            exhausted.details = detailed_activities
+            raise exhausted
         return detailed_activities
     
-    def fetch_kudos_givers(self, activity_ids, max_activities_for_kudos=20):
-        """Fetch who gave kudos to activities (limited to avoid rate limits)"""
+    def detail_to_record(self, detail):
+        """Extract the fields we store from a detailed activity response"""
+        photos = detail.get('photos') or {}
+        return {
+            'id': detail.get('id'),
+            'description': detail.get('description'),
+            'device_name': detail.get('device_name'),
+            'calories': detail.get('calories'),
+            'detail_photo_count': photos.get('count', 0),
+            'segment_effort_count': len(detail.get('segment_efforts') or []),
+            'details_fetched_at': datetime.now(timezone.utc).isoformat()
+        }
+    
+    def _fetch_activity_kudos_rows(self, activity_id, expected_count=None):
+        """Fetch kudos rows for one activity, logging and returning None on errors"""
+        try:
+            kudos_list = self.get_activity_kudos(activity_id, expected_count=expected_count)
+        except RateBudgetExhausted:
+            # Not this activity's fault - stop the batch
+            raise
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 429:
+                print(f"Rate limited fetching kudos for activity {activity_id}, skipping")
+            elif e.response.status_code == 403:
+                print(f"Access forbidden for activity {activity_id} (may be private)")
+            else:
+                print(f"HTTP Error {e.response.status_code} for activity {activity_id}: {e}")
+            return None
+        except Exception as e:
+            print(f"Unexpected error fetching kudos for activity {activity_id}: {e}")
+            return None
+        
+        rows = []
+        for kudos in kudos_list or []:
+            # Strava gives no athlete IDs here; storage interns the names into giver codes
+            fullname = f"{kudos.get('firstname', '')} {kudos.get('lastname', '')}".strip()
+            rows.append({
+                'activity_id': activity_id,
+                'athlete_firstname': kudos.get('firstname', ''),
+                'athlete_lastname': kudos.get('lastname', ''),
+                'athlete_fullname': fullname
+            })
+        return rows
+    
+    def fetch_kudos_givers(self, activity_ids, max_activities_for_kudos=20, concurrency=1, kudos_counts=None,
+                           on_activity_fetched=None):
+        """Fetch who gave kudos to activities (limited to avoid rate limits)
+        
+        With ``concurrency`` > 1 activities are fetched by a thread pool that
+        shares this fetcher's rate limiter, so workers never overspend the
+        budget. Results keep the order of ``activity_ids``. ``kudos_counts``
+        maps activity IDs to the listing's kudos_count so zero-kudos
+        activities cost no request and paging stops early.
+        
+        ``on_activity_fetched(activity_id, rows)`` is called from the calling
+        thread as soon as each activity succeeds, so callers can persist
+        results before the whole batch finishes.
+        """
         kudos_data = []
+        kudos_counts = kudos_counts or {}
         
         # Limit to most recent activities to avoid hitting rate limits
         limited_ids = activity_ids[:max_activities_for_kudos]
+        expected_counts = [kudos_counts.get(activity_id) for activity_id in limited_ids]
         
         print(f"Fetching kudos data for {len(limited_ids)} most recent activities...")
         print(f"Activity IDs to process: {limited_ids[:5]}...")  # Show first 5 IDs
+        skipped = sum(1 for count in expected_counts if count == 0)
+        if skipped:
+            print(f"Skipping {skipped} activities with no kudos")
+        if concurrency > 1:
+            print(f"Using {concurrency} concurrent workers")
         
-        for i, activity_id in enumerate(limited_ids):
-            try:
-                kudos_list = self.get_activity_kudos(activity_id)
-                
-                if kudos_list:  # Only process if we got data
-                    for j, kudos in enumerate(kudos_list):
-                        # Debug: print the actual structure for the first kudos
-                        if len(kudos_data) == 0:  # Only print for very first kudos to avoid spam
-                            print(f"  -> Debug: Kudos object keys: {list(kudos.keys())}")
-                            print(f"  -> Debug: Sample kudos object: {kudos}")
-                        
-                        # Generate a synthetic athlete ID based on name since Strava doesn't provide IDs in kudos endpoint
-                        fullname = f"{kudos.get('firstname', '')} {kudos.get('lastname', '')}".strip()
-                        synthetic_id = hash(fullname) % (10**8)  # Generate consistent ID from name
-                        
-                        kudos_data.append({
-                            'activity_id': activity_id,
-                            'athlete_id': synthetic_id,
-                            'athlete_firstname': kudos.get('firstname', ''),
-                            'athlete_lastname': kudos.get('lastname', ''),
-                            'athlete_fullname': fullname
-                        })
-                
-                if (i + 1) % 5 == 0:  # More frequent updates
-                    print(f"Processed {i + 1}/{len(limited_ids)} activities for kudos, found {len(kudos_data)} total kudos")
+        results = [None] * len(limited_ids)
+        found = 0
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        try:
+            futures = {
+                executor.submit(self._fetch_activity_kudos_rows, activity_id, expected): i
+                for i, (activity_id, expected) in enumerate(zip(limited_ids, expected_counts))
+            }
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                rows = future.result()
+                results[i] = rows
                 
-                time.sleep(1.0)  # Longer delay between requests
+                if rows is not None:
+                    found += len(rows)
+                    if on_activity_fetched:
+                        on_activity_fetched(limited_ids[i], rows)
                 
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    print("Rate limited. Waiting 15 minutes...")
-                    time.sleep(900)
-                    continue
-                elif e.response.status_code == 403:
-                    print(f"Access forbidden for activity {activity_id} (may be private)")
-                    continue
-                else:
-                    print(f"HTTP Error {e.response.status_code} for activity {activity_id}: {e}")
-                    continue
-            except Exception as e:
-                print(f"Unexpected error fetching kudos for activity {activity_id}: {e}")
-                continue
+                if done % 5 == 0:  # More frequent updates
+                    print(f"Processed {done}/{len(limited_ids)} activities for kudos, found {found} total kudos")
+        except BaseException:
+            # Don't keep spending quota on queued activities after Ctrl-C or a failure
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
+        
+        # Reassemble in the order of activity_ids
+        for rows in results:
+            if rows:
+                # Debug: print the actual structure for the very first kudos
+                if not kudos_data:
+                    print(f"  -> Debug: Sample kudos row: {rows[0]}")
+                kudos_data.extend(rows)
         
         print(f"\nKudos fetch complete. Total kudos found: {len(kudos_data)}")
         return kudos_data
     
     def activities_to_dataframe(self, activities):
-        """Convert activities list to pandas DataFrame"""
+        """Convert activities list to pandas DataFrame
+        
+        Builds each column in one pass over the page payloads and parses
+        ``start_date`` in a single vectorized call instead of per row.
+        """
         if not activities:
             return pd.DataFrame()
         
-        # Extract key fields
-        activity_data = []
-        
-        for activity in activities:
-            data = {
-                'id': activity.get('id'),
-                'name': activity.get('name'),
-                'type': activity.get('type'),
-                'sport_type': activity.get('sport_type'),
-                'start_date': activity.get('start_date'),
-                'distance': activity.get('distance'),
-                'moving_time': activity.get('moving_time'),
-                'elapsed_time': activity.get('elapsed_time'),
-                'total_elevation_gain': activity.get('total_elevation_gain'),
-                'kudos_count': activity.get('kudos_count', 0),
-                'comment_count': activity.get('comment_count', 0),
-                'athlete_count': activity.get('athlete_count', 0),
-                'photo_count': activity.get('photo_count', 0),
-                'total_photo_count': activity.get('total_photo_count', 0),
-                'has_photos': activity.get('total_photo_count', 0) > 0,
-                'average_speed': activity.get('average_speed'),
-                'max_speed': activity.get('max_speed'),
-                'average_heartrate': activity.get('average_heartrate'),
-                'max_heartrate': activity.get('max_heartrate'),
-                'pr_count': activity.get('pr_count', 0),
-                'achievement_count': activity.get('achievement_count', 0),
-                'visibility': activity.get('visibility'),
-                'commute': activity.get('commute', False),
-                'manual': activity.get('manual', False),
-                'private': activity.get('private', False),
-                'flagged': activity.get('flagged', False)
-            }
-            
-            # Parse start date
-            if data['start_date']:
-                data['start_date_parsed'] = pd.to_datetime(data['start_date'])
-                data['day_of_week'] = data['start_date_parsed'].dayofweek
-                data['hour_of_day'] = data['start_date_parsed'].hour
-            
-            activity_data.append(data)
+        # Extract key fields column by column
+        columns = {
+            column: [activity.get(column, default) for activity in activities]
+            for column, default in ACTIVITY_FIELDS
+        }
+        df = pd.DataFrame(columns)
+        df.insert(df.columns.get_loc('total_photo_count') + 1, 'has_photos',
+                  df['total_photo_count'].fillna(0) > 0)
         
-        df = pd.DataFrame(activity_data)
+        # Parse start date
+        df['start_date_parsed'] = pd.to_datetime(df['start_date'], utc=True)
+        df['day_of_week'] = df['start_date_parsed'].dt.dayofweek
+        df['hour_of_day'] = df['start_date_parsed'].dt.hour
         
-        # Calculate derived metrics
-        if not df.empty:
-            df['distance_km'] = df['distance'] / 1000
-            df['moving_time_hours'] = df['moving_time'] / 3600
-            df['pace_min_per_km'] = df['moving_time'] / 60 / df['distance_km']
-            df['speed_kmh'] = df['distance_km'] / df['moving_time_hours']
+        # Calculate derived metrics; zero distance or time gives NaN rather than inf
+        df['distance_km'] = df['distance'] / 1000
+        df['moving_time_hours'] = df['moving_time'] / 3600
+        df['pace_min_per_km'] = df['moving_time'] / 60 / df['distance_km'].where(df['distance_km'] > 0)
+        df['speed_kmh'] = df['distance_km'] / df['moving_time_hours'].where(df['moving_time_hours'] > 0)
         
-        return df
\ No newline at end of file
+        # Compact dtypes (categoricals, small ints, float32) shared with every stored load
+        return apply_activity_schema(df)
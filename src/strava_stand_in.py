@@ -0,0 +1,429 @@
+"""
+Strava Stand-In - Local HTTP server imitating the Strava API for tests and benchmarks
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from src.strava_data_fetcher import RateLimiter
+
+API_PREFIX = "/api/v3"
+OAUTH_PREFIX = "/oauth"
+UPSTREAM_URL = "https://www.strava.com"
+TOKEN_LIFETIME_SECONDS = 6 * 60 * 60
+# Upstream headers kept in recordings
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'X-RateLimit-Limit', 'X-RateLimit-Usage')
+
+FIRST_NAMES = ["Jane", "John", "Maria", "Ahmed", "Li", "Sofia", "Lucas", "Emma", "Noah", "Olivia",
+               "Mateo", "Aisha", "Kenji", "Ingrid", "Pierre", "Zanele", "Tomás", "Priya", "Oskar", "Chloe"]
+LAST_INITIALS = [f"{letter}." for letter in "ABCDEFGHIJKLMNOPRSTVW"]
+SPORT_TYPES = [("Run", 0.5), ("Ride", 0.3), ("Walk", 0.1), ("Swim", 0.05), ("Hike", 0.05)]
+
+class SyntheticStrava:
+    """Deterministic athlete with ``activity_count`` generated activities
+
+    Activities are one a day going back from ``newest``. A few percent have
+    more kudos than one page holds so paging gets exercised.
+    """
+
+    def __init__(self, activity_count=1000, seed=0, athlete_id=1234567,
+                 newest=datetime(2024, 1, 1, 7, 30, tzinfo=timezone.utc)):
+        self.athlete_id = athlete_id
+        rng = random.Random(seed)
+        self.givers = [{"firstname": first, "lastname": last} for first in FIRST_NAMES for last in LAST_INITIALS]
+
+        self.activities = []
+        for i in range(activity_count):
+            activity_id = 10_000_000_000 + i
+            sport = rng.choices([s for s, _ in SPORT_TYPES], weights=[w for _, w in SPORT_TYPES])[0]
+            moving_time = rng.randint(900, 7200)
+            distance = round(moving_time * rng.uniform(2.0, 8.0), 1)
+            photo_count = rng.choice([0, 0, 0, 1, 2, 5])
+            kudos_count = rng.randint(250, 320) if rng.random() < 0.02 else int(rng.expovariate(1 / 12))
+            self.activities.append({
+                "id": activity_id,
+                "name": f"{sport} #{activity_count - i}",
+                "type": sport,
+                "sport_type": sport,
+                "start_date": (newest - timedelta(days=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "distance": distance,
+                "moving_time": moving_time,
+                "elapsed_time": moving_time + rng.randint(0, 600),
+                "total_elevation_gain": round(rng.uniform(0, 800), 1),
+                "kudos_count": kudos_count,
+                "comment_count": rng.randint(0, 5),
+                "athlete_count": rng.randint(1, 4),
+                "photo_count": photo_count,
+                "total_photo_count": photo_count,
+                "average_speed": round(distance / moving_time, 3),
+                "max_speed": round(distance / moving_time * 1.6, 3),
+                "average_heartrate": round(rng.uniform(120, 165), 1),
+                "max_heartrate": float(rng.randint(165, 195)),
+                "pr_count": rng.randint(0, 3),
+                "achievement_count": rng.randint(0, 6),
+                "visibility": "everyone",
+                "commute": rng.random() < 0.1,
+                "manual": False,
+                "private": False,
+                "flagged": False,
+            })
+        self.by_id = {activity["id"]: activity for activity in self.activities}
+        self.start_ts = {activity["id"]: int(datetime.strptime(activity["start_date"], "%Y-%m-%dT%H:%M:%SZ")
+                                             .replace(tzinfo=timezone.utc).timestamp())
+                         for activity in self.activities}
+
+    def handle(self, method, path, query, headers):
+        """Return (status, body) for an API request path below /api/v3"""
+        if path == "/athlete":
+            return 200, {"id": self.athlete_id, "firstname": "Stand", "lastname": "In"}
+        if path == f"/athletes/{self.athlete_id}/stats":
+            counts = {}
+            for activity in self.activities:
+                counts[activity["type"]] = counts.get(activity["type"], 0) + 1
+            return 200, {f"all_{key}_totals": {"count": counts.get(sport, 0)}
+                         for key, sport in (("ride", "Ride"), ("run", "Run"), ("swim", "Swim"))}
+        if path == "/athlete/activities":
+            return 200, self.list_activities(query)
+
+        match = re.fullmatch(r"/activities/(\d+)(/kudos)?", path)
+        if not match or int(match.group(1)) not in self.by_id:
+            return 404, {"message": "Record Not Found", "errors": [{"resource": "Activity", "code": "not found"}]}
+        activity = self.by_id[int(match.group(1))]
+        if match.group(2):
+            return 200, self.kudos(activity, query)
+        return 200, self.detail(activity)
+
+    def list_activities(self, query):
+        page = int(query.get("page", 1))
+        per_page = min(int(query.get("per_page", 30)), 200)
+        after = int(query["after"]) if "after" in query else None
+        before = int(query["before"]) if "before" in query else None
+
+        selected = [a for a in self.activities
+                    if (after is None or self.start_ts[a["id"]] > after)
+                    and (before is None or self.start_ts[a["id"]] < before)]
+        # Like Strava: oldest first when listing ``after`` a time, newest first otherwise
+        if after is not None:
+            selected.reverse()
+        return selected[(page - 1) * per_page:page * per_page]
+
+    def kudos(self, activity, query):
+        page = int(query.get("page", 1))
+        per_page = min(int(query.get("per_page", 30)), 200)
+        rng = random.Random(activity["id"])
+        givers = [self.givers[rng.randrange(len(self.givers))] for _ in range(activity["kudos_count"])]
+        return givers[(page - 1) * per_page:page * per_page]
+
+    def detail(self, activity):
+        rng = random.Random(activity["id"])
+        return {
+            **activity,
+            "description": rng.choice([None, "", "Easy one", "Felt great today"]),
+            "device_name": rng.choice(["Garmin Forerunner 255", "Wahoo ELEMNT BOLT", "Strava App"]),
+            "calories": round(activity["moving_time"] * rng.uniform(0.1, 0.25), 1),
+            "photos": {"count": activity["total_photo_count"]},
+            "segment_efforts": [{"id": activity["id"] * 100 + n} for n in range(rng.randint(0, 8))],
+        }
+
+class RecordedStrava:
+    """Replays responses saved by RecordingProxy, 404 for anything not recorded"""
+
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            self.responses = json.load(f)
+
+    def handle(self, method, path, query, headers):
+        entry = self.responses.get(recording_key(path, query))
+        if entry is None:
+            return 404, {"message": "Not recorded"}
+        return entry["status"], entry["body"]
+
+class RecordingProxy:
+    """Forwards requests to the real API and saves each response to ``path``
+
+    The client's Authorization header is passed through, so recording needs
+    a real token. Strava's own rate-limit headers are kept.
+    """
+
+    def __init__(self, path, upstream=UPSTREAM_URL):
+        self.path = path
+        self.upstream = upstream.rstrip('/')
+        self.session = requests.Session()
+        self.responses = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.responses = json.load(f)
+
+    def handle(self, method, path, query, headers):
+        response = self.session.get(f"{self.upstream}{API_PREFIX}{path}", params=query,
+                                    headers={'Authorization': headers.get('Authorization', '')})
+        body = response.json() if response.content else None
+        kept = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        with self._lock:
+            self.responses[recording_key(path, query)] = {"status": response.status_code, "body": body, "headers": kept}
+            with open(self.path, 'w') as f:
+                json.dump(self.responses, f, indent=1)
+        return response.status_code, body, kept
+
+def recording_key(path, query):
+    return path + "?" + "&".join(f"{k}={v}" for k, v in sorted(query.items()))
+
+class Faults:
+    """Random failures and latency injected in front of the API
+
+    ``rates`` maps a status code (401, 403, 429, 500...) to the probability
+    a request fails with it. An injected 401 also revokes the current access
+    token, like an expiry would, so clients must refresh to continue.
+    """
+
+    def __init__(self, rates=None, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.rates = rates or {}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rng = random.Random(seed)
+        self.injected = {status: 0 for status in self.rates}
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                jitter = self.rng.uniform(0, self.jitter_ms)
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+    def pick(self):
+        """Status code to fail the current request with, or None"""
+        with self._lock:
+            roll = self.rng.random()
+            for status, rate in self.rates.items():
+                if roll < rate:
+                    self.injected[status] += 1
+                    return status
+                roll -= rate
+        return None
+
+class StravaStandIn:
+    """Threaded local server answering like api.strava.com and its OAuth endpoint
+
+    ``source`` (SyntheticStrava, RecordedStrava or RecordingProxy) supplies
+    the bodies; the stand-in adds bearer-token checks, rate-limit windows and
+    headers, ETags, and injected faults. Pass the same ``clock`` the client's
+    RateLimiter uses to let simulated window waits roll the server too.
+    """
+
+    def __init__(self, source=None, faults=None, short_limit=100, daily_limit=1000, host="127.0.0.1", port=0,
+                 clock=time.time, token_lifetime=TOKEN_LIFETIME_SECONDS):
+        self.source = source or SyntheticStrava()
+        self.faults = faults or Faults()
+        self.clock = clock
+        self.token_lifetime = token_lifetime
+        # The server's view of usage - never sleeps, only answers 429 when spent
+        self.usage = RateLimiter(short_limit=short_limit, daily_limit=daily_limit, clock=clock)
+        self.requests_served = 0
+        self.status_counts = {}
+        self._lock = threading.Lock()
+        self.client_id = "stand-in"
+        self.client_secret = "stand-in-secret"
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = None
+        self.issue_tokens()
+
+        self.server = ThreadingHTTPServer((host, port), _StandInHandler)
+        self.server.daemon_threads = True
+        self.server.stand_in = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        return self.url + API_PREFIX
+
+    @property
+    def oauth_url(self):
+        return self.url + OAUTH_PREFIX
+
+    def issue_tokens(self):
+        """Rotate both tokens, as Strava does on every refresh"""
+        self.access_token = secrets.token_hex(20)
+        self.refresh_token = secrets.token_hex(20)
+        self.expires_at = int(self.clock()) + self.token_lifetime
+        return {"token_type": "Bearer", "access_token": self.access_token, "refresh_token": self.refresh_token,
+                "expires_at": self.expires_at, "expires_in": self.token_lifetime}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def rate_headers(self):
+        limiter = self.usage
+        return {
+            "X-RateLimit-Limit": f"{limiter.short.limit},{limiter.daily.limit}",
+            "X-RateLimit-Usage": f"{limiter.short.used},{limiter.daily.used}",
+        }
+
+    def count(self, status):
+        with self._lock:
+            self.requests_served += 1
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def handle_api(self, method, path, query, headers):
+        """Return (status, body, headers) for one API request"""
+        self.faults.delay()
+        proxied = isinstance(self.source, RecordingProxy)
+
+        if not proxied:
+            with self._lock:
+                spent = any(v == 0 for v in self.usage.remaining().values())
+                if not spent:
+                    self.usage.acquire()
+            if spent:
+                return 429, {"message": "Rate Limit Exceeded"}, self.rate_headers()
+            if headers.get("Authorization") != f"Bearer {self.access_token}" or self.clock() >= self.expires_at:
+                return 401, {"message": "Authorization Error", "errors": [{"code": "invalid"}]}, self.rate_headers()
+
+        fault = self.faults.pick()
+        if fault == 401:
+            # Behave like an expiry: the token stays invalid until refreshed
+            self.access_token = None
+        if fault == 429:
+            with self._lock:
+                self.usage.short.used = self.usage.short.limit
+            return 429, {"message": "Rate Limit Exceeded"}, self.rate_headers()
+        if fault is not None:
+            return fault, {"message": f"Injected {fault}"}, self.rate_headers()
+
+        result = self.source.handle(method, path, query, headers)
+        if proxied:
+            return result
+        status, body = result
+        return status, body, self.rate_headers()
+
+    def handle_oauth(self, path, form):
+        if path != "/token":
+            return 404, {"message": "Not Found"}
+        if form.get("client_id") != self.client_id or form.get("client_secret") != self.client_secret:
+            return 401, {"message": "Bad Request", "errors": [{"field": "client_id", "code": "invalid"}]}
+        grant = form.get("grant_type")
+        if grant == "refresh_token" and form.get("refresh_token") != self.refresh_token:
+            return 400, {"message": "Bad Request", "errors": [{"field": "refresh_token", "code": "invalid"}]}
+        if grant not in ("refresh_token", "authorization_code"):
+            return 400, {"message": "Bad Request"}
+        with self._lock:
+            return 200, self.issue_tokens()
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        stand_in = self.server.stand_in
+        if not parts.path.startswith(API_PREFIX):
+            return self.respond(404, {"message": "Not Found"}, {})
+
+        status, body, headers = stand_in.handle_api("GET", parts.path[len(API_PREFIX):], query, self.headers)
+        headers = dict(headers)
+        if status == 200 and "ETag" not in headers:
+            headers["ETag"] = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+        if status == 200 and self.headers.get("If-None-Match") == headers.get("ETag"):
+            status, body = 304, None
+        stand_in.count(status)
+        self.respond(status, body, headers)
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {key: values[-1] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+        if not parts.path.startswith(OAUTH_PREFIX):
+            return self.respond(404, {"message": "Not Found"}, {})
+        status, body = self.server.stand_in.handle_oauth(parts.path[len(OAUTH_PREFIX):], form)
+        self.respond(status, body, {})
+
+    def respond(self, status, body, headers):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in ("content-length", "transfer-encoding", "connection", "content-encoding"):
+                self.send_header(name, value)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    """Serve the stand-in until interrupted"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Strava API")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--activities", type=int, default=1000, help="Synthetic activities to serve")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic data and faults")
+    parser.add_argument("--record", metavar="FILE", help="Proxy to the real API and save responses to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="Serve responses recorded with --record")
+    parser.add_argument("--short-limit", type=int, default=100, help="Requests per 15 minutes")
+    parser.add_argument("--daily-limit", type=int, default=1000, help="Requests per day")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency per request")
+    for status in (401, 403, 429, 500):
+        parser.add_argument(f"--fault-{status}", type=float, default=0.0, help=f"Probability of an injected {status}")
+    args = parser.parse_args()
+
+    if args.record:
+        source = RecordingProxy(args.record)
+    elif args.replay:
+        source = RecordedStrava(args.replay)
+    else:
+        source = SyntheticStrava(activity_count=args.activities, seed=args.seed)
+    rates = {status: getattr(args, f"fault_{status}") for status in (401, 403, 429, 500)
+             if getattr(args, f"fault_{status}")}
+    faults = Faults(rates, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+
+    stand_in = StravaStandIn(source, faults, short_limit=args.short_limit, daily_limit=args.daily_limit,
+                             port=args.port)
+    print(f"Strava stand-in listening on {stand_in.url}")
+    print(f"  STRAVA_API_BASE_URL={stand_in.base_url}")
+    if not args.record:
+        print(f"  STRAVA_OAUTH_URL={stand_in.oauth_url}")
+        print(f"  STRAVA_CLIENT_ID={stand_in.client_id} STRAVA_CLIENT_SECRET={stand_in.client_secret}")
+        print(f"  STRAVA_ACCESS_TOKEN={stand_in.access_token} STRAVA_REFRESH_TOKEN={stand_in.refresh_token}")
+        print("  STRAVA_TOKEN_FILE=data/stand_in_tokens.json")
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping")
+    finally:
+        stand_in.server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Token Manager - Keep a valid Strava access token without rewriting .env
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_TOKEN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.strava_tokens.json')
+# Refresh this long before the token expires
+REFRESH_MARGIN_SECONDS = 5 * 60
+
+class TokenStore:
+    """OAuth tokens persisted atomically in their own JSON file"""
+
+    def __init__(self, path=None):
+        # STRAVA_TOKEN_FILE keeps e.g. stand-in or test tokens apart from the real ones
+        self.path = path or os.getenv('STRAVA_TOKEN_FILE') or DEFAULT_TOKEN_FILE
+
+    def load(self):
+        """Return the stored tokens, or None if nothing has been saved yet"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, tokens):
+        """Write to a temp file and rename, so readers never see a partial file"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tokens, f, indent=2)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+class TokenManager:
+    """Hands out access tokens, refreshing them shortly before they expire
+
+    Tokens start from the store, falling back to the ones StravaAuth read
+    from .env. Concurrent callers that find the token expiring (or get a
+    401) share a single refresh: whoever takes the lock first refreshes and
+    the others reuse the new token.
+    """
+
+    def __init__(self, auth, store=None, refresh_margin=REFRESH_MARGIN_SECONDS, clock=time.time):
+        self.auth = auth
+        self.store = store or TokenStore()
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.expires_at = None
+        self._lock = threading.Lock()
+        self._adopt(self.store.load())
+
+    def _adopt(self, tokens):
+        if not tokens or not tokens.get('access_token'):
+            return False
+        self.auth.access_token = tokens['access_token']
+        self.auth.refresh_token = tokens.get('refresh_token', self.auth.refresh_token)
+        self.expires_at = tokens.get('expires_at')
+        return True
+
+    def _expiring(self):
+        # Unknown expiry (tokens only from .env) is left to the 401 handler
+        return self.expires_at is not None and self.clock() >= self.expires_at - self.refresh_margin
+
+    def access_token(self):
+        """A token valid for at least ``refresh_margin`` seconds where expiry is known"""
+        token = self.auth.access_token
+        if self._expiring():
+            self.refresh(stale_token=token)
+        return self.auth.access_token
+
+    def get_headers(self):
+        """Headers for API requests with a fresh token"""
+        self.access_token()
+        return self.auth.get_headers()
+
+    def refresh(self, stale_token=None):
+        """Refresh the access token unless someone else already replaced ``stale_token``"""
+        with self._lock:
+            if stale_token is not None and self.auth.access_token != stale_token:
+                return self.auth.access_token
+
+            # Another process may have refreshed already, rotating the refresh token
+            stored = self.store.load()
+            if stored and stored.get('access_token') not in (None, stale_token):
+                self._adopt(stored)
+                if not self._expiring():
+                    return self.auth.access_token
+
+            token_data = self.auth.refresh_access_token()
+            self.save(token_data)
+            print("Access token refreshed")
+            return self.auth.access_token
+
+    def save(self, token_data):
+        """Persist an OAuth token response (from a refresh or code exchange)"""
+        self.expires_at = token_data.get('expires_at')
+        self.store.save({
+            'access_token': token_data['access_token'],
+            'refresh_token': token_data['refresh_token'],
+            'expires_at': self.expires_at
+        })
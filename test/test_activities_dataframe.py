@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Test the columnar activities_to_dataframe conversion"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.strava_data_fetcher import StravaDataFetcher
+
+def test_activities_to_dataframe():
+    # The conversion needs no API access, so skip the credential check in __init__
+    fetcher = StravaDataFetcher.__new__(StravaDataFetcher)
+
+    activities = [
+        {'id': 1, 'type': 'Ride', 'start_date': '2024-03-04T07:30:00Z', 'distance': 20000.0,
+         'moving_time': 3600, 'kudos_count': 5, 'total_photo_count': 2},
+        # Manual entry with no distance and no moving time
+        {'id': 2, 'type': 'Workout', 'start_date': '2024-03-10T18:00:00Z', 'distance': 0.0,
+         'moving_time': 0},
+    ]
+    df = fetcher.activities_to_dataframe(activities)
+
+    assert len(df) == 2
+    assert df['has_photos'].tolist() == [True, False]
+    assert df['kudos_count'].tolist() == [5, 0], "Missing counts should default to 0"
+    print("✓ Fields and defaults extracted")
+
+    assert str(df['start_date_parsed'].dt.tz) == 'UTC'
+    assert df['day_of_week'].tolist() == [0, 6]
+    assert df['hour_of_day'].tolist() == [7, 18]
+    print("✓ start_date parsed in one pass with day/hour derived")
+
+    assert df.loc[0, 'speed_kmh'] == 20.0
+    assert df.loc[0, 'pace_min_per_km'] == 3.0
+    assert pd.isna(df.loc[1, 'pace_min_per_km']) and pd.isna(df.loc[1, 'speed_kmh'])
+    print("✓ Zero distance/time gives NaN pace and speed instead of inf")
+
+    assert fetcher.activities_to_dataframe([]).empty
+
+if __name__ == "__main__":
+    test_activities_to_dataframe()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Test the athlete registry and per-athlete slices of the shared quota"""
+
+import sys
+import os
+import json
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.club_collector import AthleteRegistry, AthleteRateBudget, ClubCollector
+from src.strava_data_fetcher import RateLimiter, RateBudgetExhausted
+from src.strava_stand_in import StravaStandIn, SyntheticStrava
+from src.storage import open_store
+
+def test_club_collector():
+    registry_file = os.path.join(tempfile.mkdtemp(), 'athletes.json')
+    with open(registry_file, 'w') as f:
+        json.dump({"athletes": [
+            {"name": "alice", "refresh_token": "r-a", "daily_budget": 100},
+            {"name": "bob", "refresh_token": "r-b"},
+            {"name": "carol", "refresh_token": "r-c", "data_dir": "/tmp/carol"},
+        ]}, f)
+    registry = AthleteRegistry(registry_file)
+    assert [a.name for a in registry.athletes] == ["alice", "bob", "carol"]
+    assert registry.athletes[1].data_dir == os.path.join("data", "athletes", "bob")
+    assert registry.athletes[2].token_file == "/tmp/carol/tokens.json"
+    print("✓ Registry loads athletes with default data directories")
+
+    shared = RateLimiter(short_limit=100, daily_limit=1000, clock=lambda: 1700000000.0)
+    club = ClubCollector(registry, rate_limiter=shared)
+    budgets = club.budgets()
+    assert budgets == {"alice": 100, "bob": 450, "carol": 450}, budgets
+    print(f"✓ Unbudgeted athletes split the remaining quota: {budgets}")
+
+    alice = AthleteRateBudget(shared, 3)
+    bob = AthleteRateBudget(shared, 500)
+    for _ in range(3):
+        alice.acquire()
+    bob.acquire()
+    assert alice.remaining()["daily"] == 0
+    assert bob.remaining()["daily"] == 499
+    assert shared.remaining()["daily"] == 996
+    print("✓ Athlete budgets count their own requests against the shared limiter")
+
+    try:
+        alice.acquire()
+        assert False, "A spent budget should not hand out another request"
+    except RateBudgetExhausted:
+        pass
+    assert shared.remaining()["daily"] == 996
+    print("✓ A spent athlete budget refuses further requests")
+
+def test_club_collect():
+    with StravaStandIn(SyntheticStrava(activity_count=120)) as stand_in:
+        root = tempfile.mkdtemp()
+        registry_file = os.path.join(root, 'athletes.json')
+        with open(registry_file, 'w') as f:
+            json.dump({"athletes": [
+                {"name": name, "refresh_token": stand_in.refresh_token, "access_token": stand_in.access_token,
+                 "data_dir": os.path.join(root, name), "daily_budget": budget}
+                for name, budget in (("alice", 40), ("bob", 2))
+            ]}, f)
+        env = {'STRAVA_CLIENT_ID': stand_in.client_id, 'STRAVA_CLIENT_SECRET': stand_in.client_secret,
+               'STRAVA_API_BASE_URL': stand_in.base_url, 'STRAVA_OAUTH_URL': stand_in.oauth_url}
+        shared = RateLimiter(daily_limit=1000)
+        with mock.patch.dict(os.environ, env):
+            results = ClubCollector(AthleteRegistry(registry_file), rate_limiter=shared, workers=2).collect()
+
+        assert set(results) == {"alice", "bob"}, results
+        assert not any(isinstance(used, Exception) for used in results.values()), results
+        assert results["bob"] <= 2 and results["alice"] <= 40, results
+        assert sum(results.values()) == stand_in.requests_served == 1000 - shared.remaining()["daily"]
+        assert open_store(os.path.join(root, "alice")).count_activities() == 120
+        print(f"✓ Club run collected both athletes within their budgets: {results}")
+
+if __name__ == "__main__":
+    test_club_collector()
+    test_club_collect()
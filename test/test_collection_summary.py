@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Test the materialized status summary"""
+
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.collect_strava_data import StravaDataCollector
+
+# Collectors built here get a throwaway token file and rate-limit database, never the developer's real ones
+TEST_ENV = {'STRAVA_CLIENT_ID': 'test', 'STRAVA_CLIENT_SECRET': 'test', 'STRAVA_ACCESS_TOKEN': 'test',
+            'STRAVA_TOKEN_FILE': os.path.join(tempfile.mkdtemp(), 'tokens.json'),
+            'STRAVA_RATE_LIMIT_DB': os.path.join(tempfile.mkdtemp(), 'rate_limit.sqlite')}
+
+def make_collector(data_dir):
+    with mock.patch.dict(os.environ, TEST_ENV):
+        return StravaDataCollector(data_dir=data_dir)
+
+def activities(ids, types, dates, kudos):
+    return pd.DataFrame({'id': ids, 'type': types, 'start_date': dates, 'kudos_count': kudos})
+
+def test_collection_summary():
+    data_dir = tempfile.mkdtemp()
+    collector = make_collector(data_dir)
+    assert collector.summary_current
+    collector._append_activities(activities([1, 2], ['Run', 'Ride'], ['2024-01-02T00:00:00Z',
+                                                                      '2024-01-01T00:00:00Z'], [2, 1]))
+    # A refreshed listing of activity 2 plus a new activity 3
+    collector._append_activities(activities([2, 3], ['Ride', 'Run'], ['2024-01-01T00:00:00Z',
+                                                                      '2024-01-05T00:00:00Z'], [3, 0]))
+    with open(collector.kudos_journal_file, 'w') as journal:
+        collector._journal_kudos(journal, 1, [{'activity_id': 1, 'athlete_firstname': 'A', 'athlete_lastname': 'B'},
+                                              {'activity_id': 1, 'athlete_firstname': 'C', 'athlete_lastname': 'D'}])
+        collector._journal_kudos(journal, 2, [{'activity_id': 2, 'athlete_firstname': 'A', 'athlete_lastname': 'B'}])
+    collector.replay_kudos_journal()
+    # Activity 1 refetched with one kudos fewer
+    with open(collector.kudos_journal_file, 'w') as journal:
+        collector._journal_kudos(journal, 1, [{'activity_id': 1, 'athlete_firstname': 'A', 'athlete_lastname': 'B'}])
+    collector.replay_kudos_journal()
+
+    assert "activities_with_kudos" not in collector.metadata, "Membership comes from the summary, not an ID list"
+    # Per-activity state lives in the store; the metadata keeps only aggregates
+    assert "kudos_fetch_log" not in collector.metadata and "kudos_per_activity" not in collector.summary.state
+    assert collector.store.kudos_counts([1, 2, 3]) == {1: 1, 2: 1, 3: 0}
+    assert set(collector.store.load_kudos_fetches()) == {"1", "2"}
+    expected = {"total_activities": 3, "activities_with_kudos": 2, "total_kudos": 2}
+    with mock.patch.object(collector.store, 'load_activities') as load_activities, \
+            mock.patch.object(collector.store, 'load_kudos') as load_kudos:
+        status = collector.get_collection_status()
+        assert not load_activities.called and not load_kudos.called, "Status should not read the datasets"
+    assert {key: status[key] for key in expected} == expected, status
+    summary = collector.summary.state
+    assert (summary['first_start_date'], summary['last_start_date']) == ('2024-01-01T00:00:00Z',
+                                                                         '2024-01-05T00:00:00Z')
+    assert summary['activity_types'] == {'Run': 2, 'Ride': 1}
+    print("✓ Summary kept current by writes; status reads no datasets")
+
+    # A new process trusts the saved summary while the files match it
+    assert make_collector(data_dir).summary_current
+
+    # Data written without a metadata save (e.g. a crash) invalidates it until rebuilt
+    collector.store.append_activities(activities([4], ['Swim'], ['2024-01-06T00:00:00Z'], [0]))
+    collector = make_collector(data_dir)
+    assert not collector.summary_current
+    collector.ensure_summary()
+    assert collector.get_collection_status()["total_activities"] == 4
+    assert make_collector(data_dir).summary_current
+    print("✓ Summary rebuilt once after the datasets changed behind its back")
+
+def test_legacy_fetch_log():
+    data_dir = tempfile.mkdtemp()
+    collector = make_collector(data_dir)
+    collector.metadata["kudos_fetch_log"] = {"7": {"fetched_at": "2024-01-01T00:00:00+00:00", "kudos_count": 3}}
+    collector.summary.state["kudos_per_activity"] = {"7": 3}
+    collector.save_metadata()
+
+    collector = make_collector(data_dir)
+    assert "kudos_per_activity" not in collector.summary.state
+    collector.replay_kudos_journal()
+    assert "kudos_fetch_log" not in collector.metadata
+    assert make_collector(data_dir).store.load_kudos_fetches() == {
+        "7": {"fetched_at": "2024-01-01T00:00:00+00:00", "kudos_count": 3}}
+    print("✓ A fetch log kept in the metadata moves to the store once")
+
+if __name__ == "__main__":
+    test_collection_summary()
+    test_legacy_fetch_log()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Test collector runs end to end against the local Strava stand-in"""
+
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.strava_stand_in import StravaStandIn, SyntheticStrava, Faults
+from src.collect_strava_data import StravaDataCollector, run_collection, DEFAULT_KUDOS_BATCH_SIZE
+from src.club_collector import AthleteRateBudget
+from src.strava_data_fetcher import RateBudgetExhausted
+from test_strava_stand_in import make_fetcher
+
+def listing_queries(handle):
+    """Query dicts of the /athlete/activities requests a wrapped source answered"""
+    return [call.args[2] for call in handle.call_args_list if call.args[1] == "/athlete/activities"]
+
+def test_incremental_sync():
+    with StravaStandIn(SyntheticStrava(activity_count=120)) as stand_in:
+        collector = StravaDataCollector(data_dir=tempfile.mkdtemp(), fetcher=make_fetcher(stand_in))
+        assert collector.fetch_new_activities() == 120
+
+        cursor = collector.get_incremental_cursor()
+        served = stand_in.requests_served
+        with mock.patch.object(stand_in.source, 'handle', wraps=stand_in.source.handle) as handle, \
+                mock.patch.object(collector.store, 'compact_activities') as compact:
+            assert collector.fetch_new_activities() == 0
+        queries = listing_queries(handle)
+        assert len(queries) == 1 and int(queries[0]["after"]) == cursor, queries
+        assert stand_in.requests_served - served == 1
+        print("✓ Incremental sync sends the after cursor; nothing new costs one request")
+
+        # The re-listed overlap is appended, not folded in with a rewrite
+        assert not compact.called
+        refreshed = collector.metadata["duplicate_activity_rows"]
+        assert refreshed > 0 and collector.store.count_activities() == 120
+        with mock.patch('src.collect_strava_data.AUTO_COMPACT_DUPLICATE_ROWS', 2 * refreshed):
+            collector.fetch_new_activities()
+        assert collector.metadata["duplicate_activity_rows"] == 0
+        assert len(collector.store.load_activities()) == len(open(collector.activities_file).readlines()) - 1 == 120
+        assert not os.path.exists(collector.activities_file + ".tmp")
+        print(f"✓ Refreshed rows ({refreshed} per sync) are compacted only once enough pile up")
+
+def test_backfill_resume():
+    source = SyntheticStrava(activity_count=450)
+    # Activities 199 and 200 start in the same second but land on different pages
+    boundary = source.activities[200]
+    boundary['start_date'] = source.activities[199]['start_date']
+    source.start_ts[boundary['id']] = source.start_ts[source.activities[199]['id']]
+
+    with StravaStandIn(source) as stand_in:
+        data_dir = tempfile.mkdtemp()
+        collector = StravaDataCollector(data_dir=data_dir, fetcher=make_fetcher(stand_in))
+        append = collector._append_activities
+        pages_stored = []
+
+        def crash_after_first_page(df):
+            if pages_stored:
+                raise KeyboardInterrupt
+            append(df)
+            pages_stored.append(len(df))
+
+        with mock.patch.object(collector, '_append_activities', side_effect=crash_after_first_page), \
+                mock.patch.object(stand_in.source, 'handle', wraps=stand_in.source.handle) as handle:
+            try:
+                collector.backfill_history()
+                assert False, "The backfill should have been interrupted"
+            except KeyboardInterrupt:
+                pass
+        assert pages_stored == [200]
+        assert all(query['per_page'] == '200' for query in listing_queries(handle))
+        print("✓ Backfill interrupted after storing its first page of 200")
+
+        # A new process picks the saved cursor up and finishes the history
+        resumed = StravaDataCollector(data_dir=data_dir, fetcher=make_fetcher(stand_in))
+        assert resumed.metadata["backfill"]["pages_fetched"] == 1
+        assert resumed.backfill_history() == 250
+        ids = resumed.load_existing_activity_ids()
+        assert len(ids) == 450 and boundary['id'] in ids
+        assert resumed.metadata["backfill"]["completed"]
+        print("✓ Resumed backfill found the activity sharing the cursor's second and stored no duplicates")
+
+def test_details_permanent_failures():
+    for storage in ("csv", "sqlite"):
+        with StravaStandIn(SyntheticStrava(activity_count=40)) as stand_in:
+            collector = StravaDataCollector(data_dir=tempfile.mkdtemp(), fetcher=make_fetcher(stand_in),
+                                            storage=storage)
+            collector.fetch_new_activities()
+
+            # Some activities turn out private from here on
+            stand_in.faults = Faults({403: 0.25}, seed=1)
+            collector.enrich_activity_details(max_activities=None)
+            forbidden = stand_in.faults.injected[403]
+            assert 0 < forbidden < 40
+
+            activities = collector.load_existing_activities(columns=['details_fetched_at', 'details_error'])
+            assert activities['details_fetched_at'].notna().all()
+            assert (activities['details_error'] == 403).sum() == forbidden
+            print(f"✓ {storage}: {forbidden} forbidden activities marked with details_error")
+
+            stand_in.faults = Faults()
+            served = stand_in.requests_served
+            collector.enrich_activity_details(max_activities=None)
+            assert stand_in.requests_served == served, "Marked activities should not be requested again"
+            print(f"✓ {storage}: the next run requests no details for them")
+
+def test_details_budget_exhausted_mid_chunk():
+    with StravaStandIn(SyntheticStrava(activity_count=40)) as stand_in:
+        fetcher = make_fetcher(stand_in)
+        # One listing request plus 11 of a 25-activity details chunk
+        fetcher.rate_limiter = AthleteRateBudget(fetcher.rate_limiter, 12)
+        collector = StravaDataCollector(data_dir=tempfile.mkdtemp(), fetcher=fetcher)
+        collector.fetch_new_activities()
+        try:
+            collector.enrich_activity_details(max_activities=None, concurrency=4, chunk_size=25)
+            assert False, "The capped budget should have run out"
+        except RateBudgetExhausted:
+            pass
+
+        assert stand_in.requests_served == 12
+        activities = collector.load_existing_activities(columns=['details_fetched_at'])
+        assert activities['details_fetched_at'].notna().sum() == 11
+        print("✓ Details fetched before the budget ran out mid-chunk were stored")
+
+def test_run_fetches_planned_kudos():
+    with StravaStandIn(SyntheticStrava(activity_count=60)) as stand_in:
+        collector = StravaDataCollector(data_dir=tempfile.mkdtemp(), fetcher=make_fetcher(stand_in))
+        fetch = collector.fetcher.fetch_kudos_givers
+        with mock.patch.object(collector.fetcher, 'fetch_kudos_givers', wraps=fetch) as fetch_kudos:
+            plan = run_collection(collector)
+        fetched = fetch_kudos.call_args.args[0]
+        assert fetched == plan.kudos_activity_ids and len(fetched) == DEFAULT_KUDOS_BATCH_SIZE
+        print(f"✓ Default run fetches the {len(fetched)} activities its plan lists")
+
+        with mock.patch.object(collector.fetcher, 'fetch_kudos_givers', wraps=fetch) as fetch_kudos:
+            plan = run_collection(collector, activities=False, kudos_batch_size=0)
+        assert fetch_kudos.call_args.args[0] == plan.kudos_activity_ids
+        assert len(plan.kudos_activity_ids) > DEFAULT_KUDOS_BATCH_SIZE
+        print(f"✓ --kudos-batch-size 0 lets the quota bound the batch ({len(plan.kudos_activity_ids)} activities)")
+
+def test_run_parses_each_dataset_once():
+    for storage in ("csv", "parquet", "sqlite"):
+        with StravaStandIn(SyntheticStrava(activity_count=60)) as stand_in:
+            data_dir = tempfile.mkdtemp()
+            for run in ("first", "second"):
+                collector = StravaDataCollector(data_dir=data_dir, fetcher=make_fetcher(stand_in), storage=storage)
+                run_collection(collector, details=True, details_batch_size=10)
+                assert collector.store.misses == {"activities": 1, "kudos": 1}, (storage, run, collector.store.misses)
+            print(f"✓ {storage}: a full run parses activities and kudos once each")
+
+if __name__ == "__main__":
+    test_incremental_sync()
+    test_backfill_resume()
+    test_details_permanent_failures()
+    test_details_budget_exhausted_mid_chunk()
+    test_run_fetches_planned_kudos()
+    test_run_parses_each_dataset_once()
@@ -3,15 +3,17 @@ Test script to debug kudos API issues
 """
 import sys
 import os
+import tempfile
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.strava_data_fetcher import StravaDataFetcher
+from src.response_cache import ResponseCache
 import pandas as pd
 
 def test_kudos_api():
     print("Testing Strava kudos API...")
     
     try:
-        fetcher = StravaDataFetcher()
+        fetcher = StravaDataFetcher(cache=ResponseCache(tempfile.mkdtemp()))
         
         # Get a few recent activities first
         print("Fetching recent activities...")
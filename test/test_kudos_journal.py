@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Test that kudos fetched before a crash are recovered from the journal"""
+
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.collect_strava_data import StravaDataCollector
+
+# Collectors built here get a throwaway token file and rate-limit database, never the developer's real ones
+TEST_ENV = {'STRAVA_CLIENT_ID': 'test', 'STRAVA_CLIENT_SECRET': 'test', 'STRAVA_ACCESS_TOKEN': 'test',
+            'STRAVA_TOKEN_FILE': os.path.join(tempfile.mkdtemp(), 'tokens.json'),
+            'STRAVA_RATE_LIMIT_DB': os.path.join(tempfile.mkdtemp(), 'rate_limit.sqlite')}
+
+def make_collector(data_dir):
+    with mock.patch.dict(os.environ, TEST_ENV):
+        return StravaDataCollector(data_dir=data_dir)
+
+def test_kudos_journal():
+    data_dir = tempfile.mkdtemp()
+    collector = make_collector(data_dir)
+    pd.DataFrame({
+        'id': [1, 2, 3],
+        'kudos_count': [2, 1, 4],
+        'start_date': ['2024-01-03T00:00:00Z', '2024-01-02T00:00:00Z', '2024-01-01T00:00:00Z'],
+    }).to_csv(collector.activities_file, index=False)
+
+    def crashing_kudos(activity_id, expected_count=None):
+        if activity_id == 2:
+            raise KeyboardInterrupt  # Ctrl-C after activities 3 and 1 were fetched
+        return [{'firstname': f'Giver{i}', 'lastname': 'X.'} for i in range(expected_count)]
+
+    collector.fetcher.get_activity_kudos = crashing_kudos
+    try:
+        collector.fetch_kudos_for_activities(batch_size=10)
+        assert False, "Expected the interrupted batch to raise"
+    except KeyboardInterrupt:
+        pass
+
+    assert not os.path.exists(collector.kudos_file), "kudos.csv should only be written on compaction"
+    assert sorted(collector.read_kudos_journal()) == [1, 3]
+    print("✓ Kudos fetched before the crash survive in the journal")
+
+    # The next run replays the journal before fetching anything new
+    collector = make_collector(data_dir)
+    collector.fetcher.get_activity_kudos = lambda activity_id, expected_count=None: [{'firstname': 'Solo', 'lastname': 'Y.'}]
+    kudos_df = collector.fetch_kudos_for_activities(batch_size=10)
+
+    assert sorted(kudos_df['activity_id'].unique().tolist()) == [1, 2, 3]
+    assert len(kudos_df[kudos_df['activity_id'] == 3]) == 4, "Journaled rows should be kept, not refetched"
+    assert not os.path.exists(collector.kudos_journal_file), "Journal should be compacted away"
+    print("✓ Journal replayed and compacted into kudos.csv on the next run")
+
+if __name__ == "__main__":
+    test_kudos_journal()
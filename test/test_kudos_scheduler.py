@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Test the staleness-aware kudos refresh scheduler"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.kudos_scheduler import KudosRefreshScheduler
+
+def test_kudos_scheduler():
+    activities_df = pd.DataFrame({
+        'id': [1, 2, 3, 4, 5, 6],
+        'kudos_count': [10, 3, 3, 0, 5, 450],
+        'start_date': ['2024-01-01T00:00:00Z', '2024-02-01T00:00:00Z', '2024-03-01T00:00:00Z',
+                       '2024-04-01T00:00:00Z', '2024-05-01T00:00:00Z', '2023-01-01T00:00:00Z'],
+    })
+    # Activity 1 has 4 of 10 stored, 5 is complete, 6 has 300 of 450
+    kudos_df = pd.DataFrame({'activity_id': [1] * 4 + [5] * 5 + [6] * 300})
+    fetch_log = {
+        # Fetched at today's kudos_count already - nothing more to get
+        '2': {'fetched_at': '2024-06-01T00:00:00+00:00', 'kudos_count': 3},
+        # Fetched when it had 400 kudos; 50 more arrived since
+        '6': {'fetched_at': '2024-06-01T00:00:00+00:00', 'kudos_count': 400},
+    }
+
+    scheduler = KudosRefreshScheduler(activities_df, kudos_df, fetch_log)
+
+    stale_ids = sorted(scheduler.stale_activities()['id'].tolist())
+    assert stale_ids == [1, 3, 6], stale_ids
+    print("✓ Only activities with missing kudos and a changed kudos_count are stale")
+
+    assert scheduler.next_batch() == [6, 1, 3], scheduler.next_batch()
+    print("✓ Ordered by missing-kudos delta")
+
+    assert scheduler.next_batch(max_activities=2) == [6, 1]
+    # Activity 6 needs 3 pages of 200; with a 2-request budget it is skipped
+    assert scheduler.next_batch(max_requests=2) == [1, 3]
+    print("✓ Batches respect activity and request budgets")
+
+if __name__ == "__main__":
+    test_kudos_scheduler()
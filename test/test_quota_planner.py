@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Test that the quota planner splits the daily budget across stages"""
+
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.collect_strava_data import StravaDataCollector, DEFAULT_KUDOS_BATCH_SIZE
+from src.quota_planner import QuotaPlanner
+
+# Collectors built here get a throwaway token file and rate-limit database, never the developer's real ones
+TEST_ENV = {'STRAVA_CLIENT_ID': 'test', 'STRAVA_CLIENT_SECRET': 'test', 'STRAVA_ACCESS_TOKEN': 'test',
+            'STRAVA_TOKEN_FILE': os.path.join(tempfile.mkdtemp(), 'tokens.json'),
+            'STRAVA_RATE_LIMIT_DB': os.path.join(tempfile.mkdtemp(), 'rate_limit.sqlite')}
+
+def test_quota_planner():
+    with mock.patch.dict(os.environ, TEST_ENV):
+        collector = StravaDataCollector(data_dir=tempfile.mkdtemp())
+
+    # 300 activities with 5 kudos each, none fetched, no details
+    pd.DataFrame({
+        'id': range(1, 301),
+        'kudos_count': [5] * 300,
+        'start_date': pd.date_range('2020-01-01', periods=300, freq='D', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }).to_csv(collector.activities_file, index=False)
+
+    # 900 of today's 1000 requests already spent
+    collector.fetcher.rate_limiter.update_from_headers({'X-RateLimit-Limit': '100,1000',
+                                                        'X-RateLimit-Usage': '10,900'})
+
+    plan = QuotaPlanner(collector, include_details=True).build_plan()
+    plan.describe()
+
+    assert plan.budget == 95, plan.budget  # 100 left minus the reserve
+    assert plan.listing_requests == 1
+    assert plan.kudos_requests == 94 and len(plan.kudos_activity_ids) == 94
+    assert plan.detail_activities == 0, "Kudos should use the budget before details"
+    assert plan.planned_requests <= plan.budget
+    print("✓ Plan fits the remaining daily budget, listing and kudos first")
+
+    assert plan.pending == {"listing": 1, "kudos": 300, "details": 300}
+    assert plan.runs_to_complete() == 2, plan.runs_to_complete()
+    print("✓ Backfill estimate: 601 outstanding requests take 2 daily runs")
+
+    # With a fresh day's quota the default kudos batch, not the quota, is what bounds a run
+    with mock.patch.object(collector.fetcher.rate_limiter, 'remaining', return_value={"short": 100, "daily": 1000}):
+        plan = QuotaPlanner(collector, kudos_batch_size=DEFAULT_KUDOS_BATCH_SIZE).build_plan()
+        plan.describe()
+        assert len(plan.kudos_activity_ids) == DEFAULT_KUDOS_BATCH_SIZE and plan.total_pending <= plan.budget
+        assert plan.runs_to_complete() == 300 // DEFAULT_KUDOS_BATCH_SIZE, plan.runs_to_complete()
+        plan = QuotaPlanner(collector, include_kudos=False, include_details=True, details_batch_size=50).build_plan()
+        assert plan.runs_to_complete() == 6, plan.runs_to_complete()
+    print(f"✓ Batch sizes bound the estimate: 300 stale activities take {300 // DEFAULT_KUDOS_BATCH_SIZE} runs "
+          f"of {DEFAULT_KUDOS_BATCH_SIZE}")
+
+if __name__ == "__main__":
+    test_quota_planner()
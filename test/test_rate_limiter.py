@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test the header-driven rate limiter without touching the API"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.strava_data_fetcher import RateLimiter
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def test_rate_limiter():
+    # 10:05 UTC on some day - the 15-minute window resets at 10:15
+    clock = FakeClock(1700000000 - (1700000000 % 900) + 300)
+    limiter = RateLimiter(short_limit=3, daily_limit=1000, clock=clock.time, sleep=clock.sleep)
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == [], f"Slept inside the budget: {clock.sleeps}"
+    print("✓ No sleeps while budget remains")
+
+    limiter.acquire()
+    assert len(clock.sleeps) == 1, "Expected one sleep once the budget was spent"
+    assert clock.sleeps[0] == 600 + 1, f"Should sleep until the window boundary, slept {clock.sleeps[0]}"
+    print(f"✓ Slept {clock.sleeps[0]:.0f}s until the next 15-minute boundary")
+
+    # Headers from Strava override local counts and limits
+    limiter.update_from_headers({'X-RateLimit-Limit': '100,1000', 'X-RateLimit-Usage': '40,990'})
+    assert limiter.remaining() == {"short": 60, "daily": 10}, limiter.remaining()
+    print("✓ Usage synchronised from X-RateLimit headers")
+
+    # A 429 without headers marks the short window as spent
+    limiter.record_rate_limited({})
+    assert limiter.remaining()["short"] == 0
+    print("✓ 429 exhausts the short window")
+
+if __name__ == "__main__":
+    test_rate_limiter()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Test the on-disk API response cache and ETag revalidation"""
+
+import sys
+import os
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from unittest import mock
+import requests
+from src.response_cache import ResponseCache
+from src.strava_data_fetcher import StravaDataFetcher
+
+class Clock:
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def __call__(self):
+        return self.now
+
+class RecordingSession:
+    """Answers every GET with the next canned (status, body, headers) response"""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.urls = []
+
+    def get(self, url, headers=None, params=None):
+        self.urls.append(url)
+        self.requests.append(headers or {})
+        status, body, extra_headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(extra_headers)
+        response._content = json.dumps(body).encode() if body is not None else b''
+        return response
+
+def test_response_cache():
+    clock = Clock()
+    cache_dir = tempfile.mkdtemp()
+    cache = ResponseCache(cache_dir, clock=clock)
+    url = "https://www.strava.com/api/v3/activities/42/kudos"
+
+    session = RecordingSession([
+        (200, {"id": 7}, {}),
+        (200, [{"firstname": "Jane", "lastname": "D."}], {"ETag": '"v1"'}),
+        (304, None, {}),
+    ])
+    test_env = {'STRAVA_CLIENT_ID': 'test', 'STRAVA_CLIENT_SECRET': 'test', 'STRAVA_ACCESS_TOKEN': 'test',
+                'STRAVA_TOKEN_FILE': os.path.join(tempfile.mkdtemp(), 'tokens.json'),
+                'STRAVA_RATE_LIMIT_DB': os.path.join(tempfile.mkdtemp(), 'rate_limit.sqlite')}
+    with mock.patch.dict(os.environ, test_env):
+        fetcher = StravaDataFetcher(session=session, cache=cache)
+
+    first = fetcher.get_activity_kudos(42)
+    second = fetcher.get_activity_kudos(42)
+    assert first == second
+    assert session.urls == ["https://www.strava.com/api/v3/athlete", url], session.urls
+    print("✓ Fresh cache entry served without a request (after one athlete lookup)")
+
+    clock.now += cache.ttl_for(url) + 1
+    third = fetcher.get_activity_kudos(42)
+    assert third == first
+    assert session.requests[-1].get('If-None-Match') == '"v1"', session.requests[-1]
+    print("✓ Stale entry revalidated with If-None-Match and reused on 304")
+
+    # Another athlete sharing the directory misses instead of reading athlete 7's kudos
+    other_session = RecordingSession([(200, [], {"ETag": '"v9"'})])
+    with mock.patch.dict(os.environ, test_env):
+        other = StravaDataFetcher(session=other_session, cache=cache, athlete_id=8)
+    assert other.get_activity_kudos(42) == []
+    assert other_session.urls == [url] and fetcher.get_activity_kudos(42) == first
+    print("✓ Entries are scoped to the athlete that fetched them")
+
+    # Size-bounded eviction drops the least recently used entries
+    small_cache = ResponseCache(tempfile.mkdtemp(), max_bytes=3000, clock=clock)
+    with mock.patch.object(small_cache, '_scan', wraps=small_cache._scan) as scan:
+        for i in range(60):
+            small_cache.put(f"https://www.strava.com/api/v3/activities/{i}", None, {"pad": "x" * 100})
+    remaining = [name for name in os.listdir(small_cache.cache_dir) if name.endswith('.json')]
+    assert 0 < len(remaining) < 60, f"Expected eviction, found {len(remaining)} entries"
+    on_disk = sum(os.path.getsize(os.path.join(small_cache.cache_dir, name)) for name in remaining)
+    assert small_cache._total_bytes == on_disk <= 3000
+    assert scan.call_count < 20, f"Writes should not each scan the directory ({scan.call_count} scans)"
+    print(f"✓ Eviction kept cache under its size limit ({len(remaining)} entries left, {scan.call_count} scans)")
+
+    # Concurrent workers reading and writing while entries are evicted under them
+    shared = ResponseCache(tempfile.mkdtemp(), max_bytes=3000, clock=clock)
+    urls = [f"https://www.strava.com/api/v3/activities/{i}/kudos" for i in range(40)]
+
+    def worker(offset):
+        for i in range(200):
+            url = urls[(offset + i) % len(urls)]
+            if shared.get(url) is None:
+                shared.put(url, None, {"pad": "x" * 100})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(worker, range(8)))
+    remaining = [name for name in os.listdir(shared.cache_dir) if name.endswith('.json')]
+    on_disk = sum(os.path.getsize(os.path.join(shared.cache_dir, name)) for name in remaining)
+    assert shared._total_bytes == on_disk <= 3000, (shared._total_bytes, on_disk)
+    assert shared.hits + shared.misses == 8 * 200
+    print(f"✓ Eight threads shared the cache without races ({shared.hits} hits, {shared.misses} misses)")
+
+if __name__ == "__main__":
+    test_response_cache()
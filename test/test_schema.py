@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Test the shared activity schema on stored loads"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.strava_data_fetcher import StravaDataFetcher
+from src.storage import CsvStore, SqliteStore
+from src.schema import ANALYSIS_COLUMNS
+
+def test_schema():
+    fetcher = StravaDataFetcher.__new__(StravaDataFetcher)
+    df = fetcher.activities_to_dataframe([
+        {'id': 1, 'type': 'Ride', 'visibility': 'everyone', 'start_date': '2024-03-04T07:30:00Z',
+         'distance': 20000.0, 'moving_time': 3600, 'kudos_count': 5, 'total_photo_count': 2, 'commute': True},
+        {'id': 2, 'type': 'Run', 'start_date': '2024-03-10T18:00:00Z', 'distance': 5000.0, 'moving_time': 1500},
+    ])
+    expected = {'type': 'category', 'visibility': 'category', 'kudos_count': 'Int32', 'pr_count': 'Int16',
+                'distance_km': 'float32', 'has_photos': 'boolean', 'commute': 'boolean', 'hour_of_day': 'Int8'}
+    assert {column: str(df[column].dtype) for column in expected} == expected, df.dtypes
+    print("✓ Fetched activities come out with the schema's dtypes")
+
+    for store in (CsvStore(tempfile.mkdtemp()), SqliteStore(tempfile.mkdtemp())):
+        store.append_activities(df)
+        # A details-only refresh row merges into the stored row
+        store.append_activities(pd.DataFrame({'id': [2], 'start_date_parsed': df['start_date_parsed'][1:].tolist(),
+                                              'calories': [410.5]}))
+        loaded = store.load_activities().set_index('id')
+        assert {column: str(loaded[column].dtype) for column in expected} == expected, loaded.dtypes
+        assert isinstance(loaded['start_date_parsed'].dtype, pd.DatetimeTZDtype)
+        assert loaded.loc[2, 'calories'] == 410.5 and loaded.loc[2, 'type'] == 'Run'
+        print(f"✓ {store.name}: loads typed by the schema, refreshed rows merged")
+
+        projected = store.load_activities(columns=ANALYSIS_COLUMNS)
+        assert set(projected.columns) <= set(ANALYSIS_COLUMNS) and 'name' not in projected.columns
+        assert projected.set_index('id').loc[1, 'kudos_count'] == 5
+        print(f"✓ {store.name}: projected load reads only the requested columns")
+
+if __name__ == "__main__":
+    test_schema()
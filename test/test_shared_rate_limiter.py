@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Test the cross-process rate budget and the single-instance collector lock"""
+
+import sys
+import os
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.shared_rate_limiter import SharedRateLimiter
+from src.process_lock import CollectorLock, CollectorLockedError
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_shared_rate_limiter():
+    db_path = os.path.join(tempfile.mkdtemp(), 'rate_limit.sqlite')
+    now = 1700000000.0
+    first = SharedRateLimiter(db_path, short_limit=10, clock=lambda: now)
+    second = SharedRateLimiter(db_path, short_limit=10, clock=lambda: now)
+
+    for _ in range(3):
+        first.acquire()
+    second.acquire()
+    assert first.remaining()["short"] == 6, first.remaining()
+    assert second.remaining()["short"] == 6
+    print("✓ Two limiters on one database draw from the same budget")
+
+    # Another process spending requests is visible here too
+    script = (f"import sys; sys.path.insert(0, {PROJECT_ROOT!r});"
+              "from src.shared_rate_limiter import SharedRateLimiter;"
+              f"limiter = SharedRateLimiter({db_path!r}, short_limit=10, clock=lambda: {now});"
+              "[limiter.acquire() for _ in range(4)]")
+    subprocess.run([sys.executable, "-c", script], check=True)
+    assert first.remaining()["short"] == 2, first.remaining()
+    print("✓ Requests made by another process count against the shared budget")
+
+    # A 429 seen by one process makes the others wait
+    second.record_rate_limited({'X-RateLimit-Limit': '10,1000', 'X-RateLimit-Usage': '10,50'})
+    assert first.remaining() == {"short": 0, "daily": 950}, first.remaining()
+    print("✓ Header usage is merged into the shared budget")
+
+    data_dir = tempfile.mkdtemp()
+    with CollectorLock(data_dir):
+        try:
+            CollectorLock(data_dir).acquire()
+            assert False, "Second collector lock should fail"
+        except CollectorLockedError as e:
+            print(f"✓ Second collector refused: {e}")
+    CollectorLock(data_dir).acquire().release()
+    print("✓ Lock is free again once released")
+
+if __name__ == "__main__":
+    test_shared_rate_limiter()
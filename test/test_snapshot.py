@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test publishing and memory-mapping the analysis snapshot"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from src.strava_data_fetcher import StravaDataFetcher
+from src.storage import CsvStore, SqliteStore
+from src.snapshot import publish_snapshot, open_snapshot, pa
+
+def test_snapshot():
+    if pa is None:
+        print("pyarrow not installed - skipping snapshot test")
+        return
+
+    fetcher = StravaDataFetcher.__new__(StravaDataFetcher)
+    activities = fetcher.activities_to_dataframe([
+        {'id': 1, 'type': 'Ride', 'start_date': '2024-03-04T07:30:00Z', 'distance': 20000.0, 'kudos_count': 2},
+        {'id': 2, 'type': 'Run', 'start_date': '2024-03-10T18:00:00Z', 'distance': 5000.0, 'kudos_count': 1},
+    ])
+    for store in (CsvStore(tempfile.mkdtemp()), SqliteStore(tempfile.mkdtemp())):
+        store.append_activities(activities)
+        codes = store.intern_givers(['Ana', 'Ben'], ['B.', 'C.'])
+        store.replace_kudos([1, 2], pd.DataFrame({'activity_id': [1, 1, 2], 'giver_code': codes + codes[:1]}))
+
+        assert open_snapshot(store) is None
+        manifest = publish_snapshot(store)
+        assert manifest['rows'] == {'activities': 2, 'kudos': 3, 'givers': 2}, manifest
+        snapshot = open_snapshot(store)
+        assert snapshot is not None
+
+        df = snapshot.to_pandas("activities", ['kudos_count', 'type'])
+        assert sorted(df.columns) == ['id', 'kudos_count', 'start_date_parsed', 'type'], df.columns
+        assert str(df['type'].dtype) == 'category' and str(df['kudos_count'].dtype) == 'Int32'
+        assert isinstance(df['start_date_parsed'].dtype, pd.DatetimeTZDtype)
+        assert len(snapshot.table("kudos")) == 3
+        print(f"✓ {store.name}: snapshot published and memory-mapped with schema dtypes")
+
+        # Any later write to the datasets makes the snapshot stale
+        store.replace_kudos([2], pd.DataFrame({'activity_id': [2], 'giver_code': [codes[1]]}))
+        assert open_snapshot(store) is None
+        print(f"✓ {store.name}: snapshot ignored once the datasets change")
+
+if __name__ == "__main__":
+    test_snapshot()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Test the partitioned Parquet store and the CSV migration"""
+
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+import src.storage
+from src.storage import (CachedStore, CsvStore, ParquetStore, SqliteStore, migrate_store, open_store,
+                         upgrade_kudos_givers, pq)
+from src.kudos_scheduler import KudosRefreshScheduler
+
+def activities(ids, dates, kudos):
+    df = pd.DataFrame({'id': ids, 'start_date': dates, 'kudos_count': kudos})
+    df['start_date_parsed'] = pd.to_datetime(df['start_date'], utc=True)
+    return df
+
+def test_storage():
+    if pq is None:
+        print("pyarrow not installed - skipping Parquet storage test")
+        return
+
+    data_dir = tempfile.mkdtemp()
+    csv_store = CsvStore(data_dir)
+    csv_store.write_activities(activities([1, 2, 3], ['2024-03-01T08:00:00Z', '2023-06-01T08:00:00Z',
+                                                      '2022-01-01T08:00:00Z'], [5, 0, 2]))
+    csv_store.write_kudos(pd.DataFrame({'activity_id': [1, 1, 3], 'giver_code': [10, 11, 10]}))
+
+    store = ParquetStore(data_dir)
+    assert migrate_store(csv_store, store) == (3, 3)
+    assert not csv_store.has_activities() and os.path.exists(csv_store.activities_path + ".migrated")
+    years = sorted(os.listdir(store.activities_path))
+    assert years == ['year=2022', 'year=2023', 'year=2024'], years
+    print(f"✓ CSV migrated into year partitions {years}")
+
+    # Appends add a part to the touched partition only; later rows win on read
+    store.append_activities(activities([1, 4], ['2024-03-01T08:00:00Z', '2024-03-02T08:00:00Z'], [7, 1]))
+    assert len(os.listdir(os.path.join(store.activities_path, 'year=2024'))) == 2
+    df = store.load_activities()
+    assert len(df) == 4 and df.set_index('id').loc[1, 'kudos_count'] == 7
+    assert isinstance(df['start_date_parsed'].dtype, pd.DatetimeTZDtype), df['start_date_parsed'].dtype
+    assert store.load_activity_ids() == {1, 2, 3, 4}
+    print("✓ Appended part merged on read with typed timestamps")
+
+    store.compact_activities()
+    assert len(os.listdir(os.path.join(store.activities_path, 'year=2024'))) == 1
+    assert len(store.load_activities()) == 4
+    print("✓ Compaction rewrote only the partition with several parts")
+
+    # A newer kudos part replaces the covered activities, including emptying one
+    store.replace_kudos([1, 3], pd.DataFrame({'activity_id': [1], 'giver_code': [12]}))
+    kudos = store.load_kudos()
+    assert sorted(kudos['giver_code'].tolist()) == [12], kudos
+    print("✓ Kudos parts replace earlier rows of the activities they cover")
+
+    assert open_store(data_dir, 'parquet').load_activity_ids() == {1, 2, 3, 4}
+
+def test_csv_kudos_append_only():
+    store = CsvStore(tempfile.mkdtemp())
+    # A kudos.csv from before append-only writes, without fetched_at
+    store.write_kudos(pd.DataFrame({'activity_id': [1, 1, 2, 3], 'giver_code': [10, 11, 10, 10]}))
+    store.replace_kudos([1], pd.DataFrame({'activity_id': [1, 1, 1], 'giver_code': [10, 11, 12]}),
+                        fetched_at='2024-03-01T00:00:00+00:00')
+    size = os.path.getsize(store.kudos_path)
+    store.replace_kudos([2, 3], pd.DataFrame({'activity_id': [2, 2], 'giver_code': [10, 13]}),
+                        fetched_at='2024-03-02T00:00:00+00:00')
+    with open(store.kudos_path) as f:
+        f.seek(size)
+        appended = f.read().splitlines()
+    assert len(appended) == 3, appended  # two kudos rows and a marker for activity 3
+    print("✓ Later batches append only their own rows")
+
+    kudos = store.load_kudos()
+    assert sorted(zip(kudos['activity_id'], kudos['giver_code'])) == [(1, 10), (1, 11), (1, 12), (2, 10), (2, 13)]
+    assert kudos['giver_code'].dtype == 'int64'
+    store.compact_kudos()
+    assert len(pd.read_csv(store.kudos_path)) == 5
+    assert len(store.load_kudos()) == 5
+    print("✓ Reads keep each activity's latest fetch; compaction drops the rest")
+
+    store.record_kudos_fetches({1: {'fetched_at': '2024-03-01T00:00:00+00:00', 'kudos_count': 3}})
+    store.record_kudos_fetches({1: {'fetched_at': '2024-03-02T00:00:00+00:00', 'kudos_count': 4},
+                                2: {'fetched_at': '2024-03-02T00:00:00+00:00', 'kudos_count': None}})
+    assert store.load_kudos_fetches() == {'1': {'fetched_at': '2024-03-02T00:00:00+00:00', 'kudos_count': 4},
+                                          '2': {'fetched_at': '2024-03-02T00:00:00+00:00', 'kudos_count': None}}
+    store.compact_kudos()
+    assert len(pd.read_csv(store.kudos_fetches_path)) == 2
+    assert store.kudos_counts([1, 2, 4]) == {1: 3, 2: 2, 4: 0}
+    print("✓ The kudos fetch log appends per fetch and keeps the latest row per activity")
+
+def test_sqlite_store():
+    store = SqliteStore(tempfile.mkdtemp())
+    store.append_activities(activities([1, 2, 3], ['2024-03-01T08:00:00Z', '2024-02-01T08:00:00Z',
+                                                   '2024-01-01T08:00:00Z'], [3, 2, 1]))
+    # Refresh of activity 1 plus a details-only row: upserts, NULLs keep stored values
+    store.append_activities(activities([1], ['2024-03-01T08:00:00Z'], [4]))
+    store.append_activities(pd.DataFrame({'id': [2], 'calories': [512.0], 'kudos_count': [None]}))
+    df = store.load_activities().set_index('id')
+    assert len(df) == 3 and df.loc[1, 'kudos_count'] == 4 and df.loc[2, 'kudos_count'] == 2
+    assert df.loc[2, 'calories'] == 512.0
+    assert isinstance(df['start_date_parsed'].dtype, pd.DatetimeTZDtype), df['start_date_parsed'].dtype
+    assert store.known_activity_ids([2, 5]) == {2} and store.count_activities() == 3
+    print("✓ SQLite upserts merge refreshed and partial rows by primary key")
+
+    kudos = pd.DataFrame({'activity_id': [1, 1, 2], 'giver_code': [10, 11, 10]})
+    store.replace_kudos([1, 2], kudos)
+    store.replace_kudos([2], kudos[kudos['activity_id'] == 2])
+    fetch_log = {3: {'fetched_at': '2024-03-05T00:00:00+00:00', 'kudos_count': 1}}
+    store.record_kudos_fetches(fetch_log)
+
+    stale = store.stale_kudos_activities()
+    expected = KudosRefreshScheduler(store.load_activities(), store.load_kudos(),
+                                     {str(k): v for k, v in fetch_log.items()}).stale_activities()
+    assert sorted(stale['id']) == sorted(expected['id']) == [1, 2], (stale, expected)
+    assert dict(zip(stale['id'], stale['missing_kudos'])) == {1: 2, 2: 1}
+    assert store.kudos_counts([1, 2, 3]) == {1: 2, 2: 1, 3: 0}
+    assert store.load_kudos_fetches() == {'3': fetch_log[3]}
+    print("✓ Indexed stale-kudos query matches the pandas scheduler")
+
+def test_givers_table():
+    for store_class in (CsvStore, SqliteStore):
+        store = store_class(tempfile.mkdtemp())
+        # Kudos from before the givers table, with hash(fullname) IDs and names on every row
+        legacy = pd.DataFrame({'activity_id': [1, 1, 2], 'athlete_id': [57, 91, 33],
+                               'athlete_firstname': ['Ana', 'NA', 'Ana'], 'athlete_lastname': ['B.', 'C.', 'B.'],
+                               'athlete_fullname': ['Ana B.', 'NA C.', 'Ana B.']})
+        if store_class is SqliteStore:
+            with store.connection:
+                store.connection.execute("DROP TABLE kudos")
+                store.connection.execute("CREATE TABLE kudos (activity_id INTEGER NOT NULL, athlete_id INTEGER NOT "
+                                         "NULL, PRIMARY KEY (activity_id, athlete_id))")
+                store._upsert("kudos", legacy, ["activity_id", "athlete_id"], coalesce=False)
+        else:
+            store.write_kudos(legacy)
+        assert upgrade_kudos_givers(store) == 3
+        assert upgrade_kudos_givers(store) == 0
+        kudos = store.load_kudos()
+        assert sorted(kudos.columns) == ['activity_id', 'giver_code'], kudos.columns
+        assert sorted(zip(kudos['activity_id'], kudos['giver_code'])) == [(1, 1), (1, 2), (2, 1)]
+        print(f"✓ {store.name}: legacy kudos re-encoded as (activity_id, giver_code) pairs")
+
+        # Codes are stable: known givers keep theirs, new ones get the next code
+        assert store.intern_givers(['Dee', 'NA', 'Dee'], ['E.', 'C.', 'E.']) == [3, 2, 3]
+        store = store_class(store.data_dir)
+        assert store.intern_givers(['Ana'], ['B.']) == [1]
+        givers = store.load_givers()
+        assert givers['fullname'].tolist() == ['Ana B.', 'NA C.', 'Dee E.'], givers
+        print(f"✓ {store.name}: givers interned once with stable codes across reopen")
+
+def test_cached_store():
+    for store_class in (CsvStore, SqliteStore):
+        store = CachedStore(store_class(tempfile.mkdtemp()))
+        store.append_activities(activities([1, 2], ['2024-03-01T08:00:00Z', '2024-02-01T08:00:00Z'], [3, 2]))
+        store.replace_kudos([1], pd.DataFrame({'activity_id': [1, 1], 'giver_code': [1, 2]}))
+        store.load_activities()
+        store.load_kudos()
+
+        # Writes through the wrapper update the cached frames instead of invalidating them
+        store.append_activities(activities([2, 3], ['2024-02-01T08:00:00Z', '2024-01-01T08:00:00Z'], [5, 1]))
+        store.replace_kudos([1, 2], pd.DataFrame({'activity_id': [1, 2], 'giver_code': [2, 3]}))
+        df = store.load_activities(columns=['kudos_count']).set_index('id')
+        assert dict(df['kudos_count']) == {1: 3, 2: 5, 3: 1}, df
+        assert sorted(zip(store.load_kudos()['activity_id'], store.load_kudos()['giver_code'])) == [(1, 2), (2, 3)]
+        assert store.misses == {"activities": 1, "kudos": 1}, store.misses
+        assert store.hits == {"activities": 1, "kudos": 2}, store.hits
+        print(f"✓ {store.name}: each dataset parsed once, writes applied in place")
+
+        # A write the wrapper doesn't see changes the fingerprint, so the next load parses again
+        store.store.append_activities(activities([4], ['2023-12-01T08:00:00Z'], [0]))
+        assert len(store.load_activities()) == 4 and store.misses["activities"] == 2
+        print(f"✓ {store.name}: outside writes invalidate the cached frame")
+
+        # A projection is read as a projection and serves narrower loads; wider ones widen it
+        store = CachedStore(store_class(tempfile.mkdtemp()))
+        store.append_activities(activities([1, 2], ['2024-03-01T08:00:00Z', '2024-02-01T08:00:00Z'], [3, 2]))
+        with mock.patch.object(store.store, 'load_activities', wraps=store.store.load_activities) as load:
+            store.load_activities(columns=['kudos_count', 'start_date'])
+            store.load_activities(columns=['kudos_count'])
+            # Key columns come with every projection
+            store.load_activities(columns=['start_date_parsed'])
+            store.load_activities(columns=['kudos_count', 'name'])
+            store.load_activities()
+        assert [call.args[0] for call in load.call_args_list] == [
+            ['kudos_count', 'start_date'], ['id', 'kudos_count', 'name', 'start_date', 'start_date_parsed'], None]
+        print(f"✓ {store.name}: projected loads pass their columns to the store on a miss")
+
+        # Appended pages are queued and merged into the cached frame once, on the next load
+        with mock.patch('src.storage.merge_duplicate_activities', wraps=src.storage.merge_duplicate_activities) \
+                as merge:
+            for activity_id in range(3, 13):
+                store.append_activities(activities([activity_id, 1], ['2024-01-01T08:00:00Z',
+                                                                      '2024-03-01T08:00:00Z'], [0, activity_id]))
+            assert not merge.called
+            df = store.load_activities(columns=['kudos_count']).set_index('id')
+        assert merge.call_count == 1 and store.misses["activities"] == 3
+        assert len(df) == 12 and df.loc[1, 'kudos_count'] == 12
+        print(f"✓ {store.name}: ten appended pages merged into the cache in one pass")
+
+        # A long sync without loads holds at most MAX_PENDING_ACTIVITY_ROWS queued rows
+        with mock.patch('src.storage.MAX_PENDING_ACTIVITY_ROWS', 5):
+            for activity_id in range(13, 25):
+                store.append_activities(activities([activity_id], ['2023-01-01T08:00:00Z'], [1]))
+                assert store._pending_rows < 5
+        assert len(store.load_activities()) == 24 and store.misses["activities"] == 3
+        print(f"✓ {store.name}: queued pages are merged once the row threshold is reached")
+
+if __name__ == "__main__":
+    test_storage()
+    test_csv_kudos_append_only()
+    test_sqlite_store()
+    test_givers_table()
+    test_cached_store()
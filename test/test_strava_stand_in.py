@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Test the fetcher end to end against the local Strava stand-in"""
+
+import sys
+import os
+import math
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.strava_stand_in import StravaStandIn, SyntheticStrava, Faults
+from src.strava_auth import StravaAuth
+from src.strava_data_fetcher import StravaDataFetcher, RateLimiter
+from src.http_session import create_session
+from src.token_manager import TokenManager, TokenStore
+
+def make_fetcher(stand_in, daily_limit=1000):
+    session = create_session()
+    auth = StravaAuth(session=session, client_id=stand_in.client_id, client_secret=stand_in.client_secret,
+                      access_token=stand_in.access_token, refresh_token=stand_in.refresh_token,
+                      oauth_url=stand_in.oauth_url)
+    store = TokenStore(os.path.join(tempfile.mkdtemp(), 'tokens.json'))
+    return StravaDataFetcher(rate_limiter=RateLimiter(daily_limit=daily_limit), session=session, auth=auth,
+                             token_manager=TokenManager(auth, store=store), base_url=stand_in.base_url)
+
+def test_strava_stand_in():
+    with StravaStandIn(SyntheticStrava(activity_count=450)) as stand_in:
+        fetcher = make_fetcher(stand_in)
+        activities = fetcher.fetch_all_activities()
+        assert len(activities) == 450
+        # Pages of 200, 200 and a short last page of 50
+        assert fetcher.rate_limiter.remaining()["daily"] == 1000 - 3
+        print("✓ Listing pages through synthetic activities with rate-limit headers")
+
+        busiest = max(activities, key=lambda a: a['kudos_count'])
+        kudos = fetcher.get_activity_kudos(busiest['id'], expected_count=busiest['kudos_count'])
+        assert len(kudos) == busiest['kudos_count']
+        print(f"✓ Kudos paging returned all {len(kudos)} kudos")
+
+        # Revoke the token: the next request gets a 401, refreshes and retries
+        stand_in.access_token = None
+        detail = fetcher.get_activity_details(activities[0]['id'])
+        assert detail['id'] == activities[0]['id']
+        assert fetcher.auth.access_token == stand_in.access_token
+        print("✓ 401 triggers a token refresh against the stand-in OAuth endpoint")
+
+    with StravaStandIn(SyntheticStrava(activity_count=10), Faults({403: 1.0})) as stand_in:
+        fetcher = make_fetcher(stand_in)
+        assert fetcher._fetch_activity_kudos_rows(10_000_000_000) is None
+        assert stand_in.faults.injected[403] == 1
+        print("✓ Injected 403 is skipped like a private activity")
+
+def test_kudos_paging():
+    with StravaStandIn(SyntheticStrava(activity_count=3)) as stand_in:
+        fetcher = make_fetcher(stand_in)
+        big, exact, none = (activity['id'] for activity in stand_in.source.activities)
+        for activity_id, kudos_count in ((big, 450), (exact, 200), (none, 0)):
+            stand_in.source.by_id[activity_id]['kudos_count'] = kudos_count
+
+        def kudos_requests(activity_id, expected_count):
+            with mock.patch.object(stand_in.source, 'handle', wraps=stand_in.source.handle) as handle:
+                kudos = fetcher.get_activity_kudos(activity_id, expected_count=expected_count)
+            queries = [call.args[2] for call in handle.call_args_list]
+            assert all(query['per_page'] == '200' for query in queries), queries
+            return kudos, len(queries)
+
+        kudos, requests_made = kudos_requests(big, 450)
+        assert len(kudos) == 450 and requests_made == 3
+        print("✓ 450 kudos fetched in three pages of 200")
+
+        kudos, requests_made = kudos_requests(exact, 200)
+        assert len(kudos) == 200 and requests_made == 1
+        assert kudos_requests(exact, None)[1] == 2, "Without a count a full page needs a follow-up request"
+        print("✓ Paging stops at the listing's kudos_count instead of requesting an empty page")
+
+        assert kudos_requests(none, 0) == ([], 0)
+        print("✓ Activities with no kudos cost no request")
+
+def test_concurrent_fetching():
+    # Jittered latency makes workers finish out of order
+    with StravaStandIn(SyntheticStrava(activity_count=30), Faults(latency_ms=2, jitter_ms=20)) as stand_in:
+        fetcher = make_fetcher(stand_in)
+        activities = stand_in.source.activities
+        ids = [activity['id'] for activity in activities][::-1]
+        counts = {activity['id']: activity['kudos_count'] for activity in activities}
+
+        kudos = fetcher.fetch_kudos_givers(ids, max_activities_for_kudos=len(ids), concurrency=6, kudos_counts=counts)
+        order = list(dict.fromkeys(row['activity_id'] for row in kudos))
+        assert order == [activity_id for activity_id in ids if counts[activity_id]], "Kudos should keep input order"
+        assert len(kudos) == sum(counts.values())
+        expected_requests = sum(math.ceil(count / 200) for count in counts.values())
+        assert stand_in.requests_served == expected_requests, (stand_in.requests_served, expected_requests)
+        print(f"✓ 6 kudos workers kept input order in {expected_requests} requests")
+
+        details = fetcher.fetch_detailed_activities(ids, concurrency=6)
+        assert [detail['id'] for detail in details] == ids
+        assert stand_in.requests_served == expected_requests + len(ids)
+        print("✓ 6 detail workers kept input order, one request per activity")
+
+        # Every request went through the limiter, and none ran past the server's windows
+        assert fetcher.rate_limiter.remaining()["daily"] == 1000 - stand_in.requests_served
+        assert set(stand_in.status_counts) == {200}, stand_in.status_counts
+
+if __name__ == "__main__":
+    test_strava_stand_in()
+    test_kudos_paging()
+    test_concurrent_fetching()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Test proactive, single-flight access token refresh"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.token_manager import TokenManager, TokenStore
+
+class FakeAuth:
+    """Stands in for StravaAuth, counting calls to the token endpoint"""
+    def __init__(self, clock):
+        self.clock = clock
+        self.access_token = 'token-0'
+        self.refresh_token = 'refresh-0'
+        self.refreshes = 0
+
+    def refresh_access_token(self):
+        self.refreshes += 1
+        time.sleep(0.05)  # let concurrent callers pile up on the lock
+        self.access_token = f'token-{self.refreshes}'
+        self.refresh_token = f'refresh-{self.refreshes}'
+        return {'access_token': self.access_token, 'refresh_token': self.refresh_token,
+                'expires_at': self.clock() + 6 * 3600}
+
+    def get_headers(self):
+        return {'Authorization': f'Bearer {self.access_token}'}
+
+def test_token_manager():
+    now = [1700000000.0]
+    clock = lambda: now[0]
+    store = TokenStore(os.path.join(tempfile.mkdtemp(), 'tokens.json'))
+    store.save({'access_token': 'token-0', 'refresh_token': 'refresh-0', 'expires_at': now[0] + 3600})
+
+    auth = FakeAuth(clock)
+    manager = TokenManager(auth, store=store, clock=clock)
+    assert manager.access_token() == 'token-0'
+    assert auth.refreshes == 0
+    print("✓ Token valid outside the refresh margin is used as is")
+
+    # Inside the margin: eight threads ask at once, one refresh happens
+    now[0] += 3600 - 60
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(manager.access_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert auth.refreshes == 1, f"Expected one refresh, got {auth.refreshes}"
+    assert set(tokens) == {'token-1'}, tokens
+    assert store.load()['refresh_token'] == 'refresh-1'
+    print("✓ Concurrent callers near expiry share a single refresh")
+
+    # A 401 carrying an already-replaced token doesn't refresh again
+    manager.refresh(stale_token='token-0')
+    assert auth.refreshes == 1
+    print("✓ Late 401 for a replaced token reuses the new one")
+
+    # A second manager (another process) picks up the stored rotation
+    other_auth = FakeAuth(clock)
+    other = TokenManager(other_auth, store=store, clock=clock)
+    assert other.access_token() == 'token-1' and other_auth.refresh_token == 'refresh-1'
+    print("✓ Stored tokens are shared across managers")
+
+if __name__ == "__main__":
+    test_token_manager()